@@ -0,0 +1,54 @@
+"""
+Compares two benchmark reports written by `run.py`.
+
+Usage:
+
+```bash
+python benchmarks/compare.py baseline.json candidate.json [--threshold 1.1]
+```
+
+Prints the ratio of the candidate to the baseline minimum time and peak memory of every benchmark found in both
+reports. Exits with status 1 if any ratio is above `--threshold`.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def _results_by_key(report:dict) -> dict:
+    return {
+        # reports from before `--threads` have no `n_threads`; 0 stands for a run without threads
+        (result["benchmark"], result["n_rows"], result["n_variables"], result.get("n_threads") or 0): result
+        for result in report["results"]
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline" , type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=1.1,
+                        help="ratio of candidate to baseline above which a benchmark is reported as slower")
+    args = parser.parse_args(argv)
+
+    baseline_report  = json.loads(args.baseline .read_text())
+    candidate_report = json.loads(args.candidate.read_text())
+    baseline         = _results_by_key(baseline_report)
+    candidate        = _results_by_key(candidate_report)
+
+    print(f"{'benchmark':<20} {'rows':>10} {'vars':>4} {'thrd':>4} {'time':>8} {'memory':>8}   "
+          f"({baseline_report['commit']} -> {candidate_report['commit']})")
+    regressed = False
+    for key in sorted(baseline.keys() & candidate.keys()):
+        time_ratio   = candidate[key]["min_seconds"] / max(baseline[key]["min_seconds"], 1e-12)
+        memory_ratio = candidate[key]["peak_memory_bytes"] / max(baseline[key]["peak_memory_bytes"], 1)
+        is_regression = time_ratio > args.threshold or memory_ratio > args.threshold
+        regressed |= is_regression
+        print(f"{key[0]:<20} {key[1]:>10} {key[2]:>4} {key[3] or '-':>4} {time_ratio:>7.2f}x {memory_ratio:>7.2f}x"
+              + ("   <-- regression" if is_regression else ""))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+Times, and records the peak memory of, the segmentation methods on synthetic pavement data.
+
+Usage:
+
+```bash
+python benchmarks/run.py                                   # every size and number of variables
+python benchmarks/run.py --sizes 1e3 1e5 --variables 1 5   # a subset
+python benchmarks/run.py --benchmarks shs mcv --threads 1 2 4 8   # thread scaling of the numba engine
+python benchmarks/compare.py baseline.json benchmark_results/<commit>.json
+```
+
+The report is written as JSON to `benchmark_results/<commit>.json` unless `--output` is given. Each result records
+every repeat in seconds, and the peak memory allocated by the benchmark as traced by `tracemalloc` in a separate run,
+so that tracing does not slow down the timed runs.
+
+`--threads` also runs the `shs` and `mcv` benchmarks once per number of threads, with `engine="numba"`,
+`backend="threads"` and `n_jobs` set to the number of threads, so that their scaling across cores can be measured.
+Results without threads have `n_threads` of `null`.
+"""
+import argparse
+import datetime
+import importlib.metadata
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from homogeneous_segmentation import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+)
+from homogeneous_segmentation._optimal_bisections import batched_optimal_bisections
+from homogeneous_segmentation._prefix_sums import PrefixSums
+
+sys.path.insert(0, str(Path(__file__).parent))
+from synthetic_pavement import synthetic_pavement_data, variable_column_names  # pylint: disable=wrong-import-position
+
+ALLOWED_SEGMENT_LENGTH_RANGE = (0.1, 1.0)
+
+
+def _threaded(n_threads:Optional[int]) -> dict:
+    """ The arguments which segment with the numba engine in `n_threads` threads, or none for the defaults. """
+    if n_threads is None:
+        return {}
+    return dict(engine="numba", backend="threads", n_jobs=n_threads)
+
+
+def _benchmark_shs(data:pd.DataFrame, n_variables:int, n_threads:Optional[int] = None) -> Callable[[], object]:
+    return lambda: segment_ids_to_maximize_spatial_heterogeneity(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = variable_column_names(n_variables),
+        allowed_segment_length_range = ALLOWED_SEGMENT_LENGTH_RANGE,
+        group_by                     = ["road"],
+        **_threaded(n_threads),
+    )
+
+
+def _benchmark_mcv(data:pd.DataFrame, n_variables:int, n_threads:Optional[int] = None) -> Callable[[], object]:
+    return lambda: segment_ids_to_minimize_coefficient_of_variation(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = variable_column_names(n_variables),
+        allowed_segment_length_range = ALLOWED_SEGMENT_LENGTH_RANGE,
+        group_by                     = ["road"],
+        **_threaded(n_threads),
+    )
+
+
+def _road_index(data:pd.DataFrame, n_variables:int) -> tuple[PrefixSums, npt.NDArray[np.int64]]:
+    """ The prefix sums of the variables, and the boundaries between roads, as at the root of the split tree. """
+    road_boundaries = np.append(np.flatnonzero(np.diff(data["road"].to_numpy(), prepend=-1)), len(data))
+    prefix_sums     = PrefixSums(
+        values           = data[variable_column_names(n_variables)].to_numpy(),
+        length           = (data["slk_to"] - data["slk_from"]).to_numpy(),
+        group_boundaries = road_boundaries,
+    )
+    return prefix_sums, road_boundaries
+
+
+def _benchmark_batched_optimal_bisections(data:pd.DataFrame, n_variables:int) -> Callable[[], object]:
+    # a single bisection of every road, as at the root of the split tree
+    prefix_sums, road_boundaries = _road_index(data, n_variables)
+    return lambda: batched_optimal_bisections(
+        prefix_sums            = prefix_sums,
+        starts                 = road_boundaries[:-1],
+        ends                   = road_boundaries[1:],
+        minimum_segment_length = ALLOWED_SEGMENT_LENGTH_RANGE[0],
+        split_statistic        = PrefixSums.q_statistic,
+        goal                   = "max",
+    )
+
+
+def _benchmark_split_statistic(split_statistic:Callable) -> Callable:
+    def benchmark(data:pd.DataFrame, n_variables:int) -> Callable[[], object]:
+        # every candidate split index of every road
+        prefix_sums, road_boundaries = _road_index(data, n_variables)
+        road_n_rows = np.diff(road_boundaries)
+        start       = np.repeat(road_boundaries[:-1], road_n_rows)
+        end         = np.repeat(road_boundaries[1:] , road_n_rows)
+        split       = np.arange(len(data))
+        is_split    = split > start
+        split, start, end = split[is_split], start[is_split], end[is_split]
+        return lambda: split_statistic(prefix_sums, split, start, end)
+    return benchmark
+
+
+BENCHMARKS = {
+    "shs"                : _benchmark_shs,
+    "mcv"                : _benchmark_mcv,
+    "batched_bisections" : _benchmark_batched_optimal_bisections,
+    "q_statistic"        : _benchmark_split_statistic(PrefixSums.q_statistic),
+    "p_statistic"        : _benchmark_split_statistic(PrefixSums.p_statistic),
+}
+
+# benchmarks which also take `n_threads`, and are repeated for each number of `--threads`
+THREADED_BENCHMARKS = ("shs", "mcv")
+
+
+def _peak_memory(function:Callable[[], object]) -> int:
+    """ Peak memory, in bytes, allocated while running `function` once. """
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output = True,
+            text           = True,
+            check          = True,
+            cwd            = Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(
+        benchmarks  : list[str],
+        sizes       : list[int],
+        variables   : list[int],
+        repeat      : int,
+        max_values  : int,
+        threads     : Optional[list[int]] = None,
+    ) -> dict:
+    """ Runs every combination of benchmark, size, number of variables and, for `THREADED_BENCHMARKS`, number of
+    threads, and returns the report. """
+    results = []
+    for n_rows in sizes:
+        for n_variables in variables:
+            if n_rows * n_variables > max_values:
+                print(f"skipping {n_rows} rows x {n_variables} variables (more than --max-values)", file=sys.stderr)
+                continue
+            data = synthetic_pavement_data(n_rows=n_rows, n_variables=n_variables)
+            for name in benchmarks:
+                for n_threads in (threads if threads and name in THREADED_BENCHMARKS else [None]):
+                    if n_threads is None:
+                        function = BENCHMARKS[name](data, n_variables)
+                    else:
+                        function = BENCHMARKS[name](data, n_variables, n_threads)
+                        # the first run compiles the numba kernels
+                        function()
+                    seconds  = []
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        function()
+                        seconds.append(time.perf_counter() - start)
+                    result = {
+                        "benchmark"         : name,
+                        "n_rows"            : n_rows,
+                        "n_variables"       : n_variables,
+                        "n_threads"         : n_threads,
+                        "seconds"           : seconds,
+                        "min_seconds"       : min(seconds),
+                        "median_seconds"    : float(np.median(seconds)),
+                        "peak_memory_bytes" : _peak_memory(function),
+                    }
+                    results.append(result)
+                    print(
+                        f"{name:<20} {n_rows:>10} rows {n_variables:>3} variables {n_threads or '-':>3} threads "
+                        f"{result['min_seconds']:>10.4f} s {result['peak_memory_bytes'] / 2**20:>10.1f} MiB",
+                        file=sys.stderr,
+                    )
+    return {
+        "commit"      : _commit(),
+        "timestamp"   : datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "platform"    : platform.platform(),
+        "cpu_count"   : os.cpu_count(),
+        "python"      : platform.python_version(),
+        "versions"    : {
+            "homogeneous_segmentation" : importlib.metadata.version("homogeneous-segmentation"),
+            "numpy"                    : np.__version__,
+            "pandas"                   : pd.__version__,
+        },
+        "results"     : results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--benchmarks", nargs="+", default=list(BENCHMARKS), choices=list(BENCHMARKS))
+    parser.add_argument("--sizes"     , nargs="+", default=[1e3, 1e4, 1e5, 1e6, 1e7], type=float,
+                        help="numbers of rows, eg 1e3 1e5")
+    parser.add_argument("--variables" , nargs="+", default=[1, 5, 20], type=int, help="numbers of variables")
+    parser.add_argument("--repeat"    , default=3, type=int, help="number of timed runs of each benchmark")
+    parser.add_argument("--max-values", default=2e7, type=float,
+                        help="skip combinations with more than this many rows x variables")
+    parser.add_argument("--threads"   , nargs="+", type=int,
+                        help=f"also run {' and '.join(THREADED_BENCHMARKS)} with numba in each number of threads")
+    parser.add_argument("--output"    , type=Path, help="defaults to benchmark_results/<commit>.json")
+    args = parser.parse_args(argv)
+
+    report = run(
+        benchmarks = args.benchmarks,
+        sizes      = [int(size) for size in args.sizes],
+        variables  = args.variables,
+        repeat     = args.repeat,
+        max_values = int(args.max_values),
+        threads    = args.threads,
+    )
+    output = args.output or Path("benchmark_results") / f"{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"wrote {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Synthetic pavement condition data for the benchmarks.
+
+Each road is made of homogeneous sections of random length. Every variable steps to a new level at the start of each
+section and varies smoothly about that level within it, similar to network survey data at a constant 10 metre
+interval. Even numbered variables look like roughness (IRI, m/km) and odd numbered variables look like deflection
+(microns).
+"""
+import numpy as np
+import pandas as pd
+
+# (typical section level, spread of section levels, within section variation) of each kind of variable
+_VARIABLE_KINDS = {
+    "roughness"  : (2.5  , 0.35, 0.15),
+    "deflection" : (400.0, 0.45, 0.20),
+}
+
+
+def variable_column_names(n_variables:int) -> list[str]:
+    """ Column names of the variables generated by `synthetic_pavement_data`. """
+    kinds = list(_VARIABLE_KINDS)
+    return [f"{kinds[i % len(kinds)]}_{i}" for i in range(n_variables)]
+
+
+def synthetic_pavement_data(
+        n_rows                 : int,
+        n_variables            : int   = 1,
+        row_length             : float = 0.01,
+        road_length            : float = 50.0,
+        mean_section_length    : float = 0.5,
+        seed                   : int   = 0,
+    ) -> pd.DataFrame:
+    """
+    Generates `n_rows` rows of pavement condition data.
+
+    Args:
+        n_rows (int): Number of rows.
+        n_variables (int): Number of condition variables.
+        row_length (float): Length of each row in kilometres.
+        road_length (float): Length of each road in kilometres. Rows are spread over as many roads as needed.
+        mean_section_length (float): Mean length of the homogeneous sections in kilometres.
+        seed (int): Seed of the random number generator.
+
+    Returns:
+        A DataFrame with the columns `road`, `slk_from`, `slk_to` and `variable_column_names(n_variables)`, sorted by
+        road and `slk_from`.
+    """
+    rng           = np.random.default_rng(seed)
+    rows_per_road = max(1, round(road_length / row_length))
+    row           = np.arange(n_rows)
+    row_in_road   = row % rows_per_road
+
+    data = pd.DataFrame({
+        "road"     : row // rows_per_road,
+        "slk_from" : np.round(row_in_road       * row_length, 6),
+        "slk_to"   : np.round((row_in_road + 1) * row_length, 6),
+    })
+
+    # a new section starts at random, and at the start of every road
+    section_start = (rng.random(n_rows) < row_length / mean_section_length) | (row_in_road == 0)
+    section       = np.cumsum(section_start) - 1
+    n_sections    = section[-1] + 1 if n_rows else 0
+
+    kernel = np.ones(5) / 5
+    for column_name in variable_column_names(n_variables):
+        level, level_spread, variation = _VARIABLE_KINDS[column_name.rsplit("_", 1)[0]]
+        section_level = level * rng.lognormal(0, level_spread, n_sections)
+        # smoothed noise, so that neighbouring rows are correlated as they are in survey data
+        noise = np.convolve(rng.normal(0, variation * np.sqrt(len(kernel)), n_rows), kernel, mode="same")
+        data[column_name] = np.maximum(section_level[section] * (1 + noise), 0.0)
+    return data
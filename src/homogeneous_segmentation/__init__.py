@@ -1,2 +1,20 @@
-from ._seg_shs import segment_ids_to_maximize_spatial_heterogeneity
-from ._seg_mcv import segment_ids_to_minimize_coefficient_of_variation
\ No newline at end of file
+from ._seg_shs import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_shs_arrays,
+    segment_shs_sweep,
+    segment_shs_file,
+)
+from ._seg_mcv import (
+    segment_ids_to_minimize_coefficient_of_variation,
+    segment_mcv_arrays,
+    segment_mcv_sweep,
+    segment_mcv_file,
+)
+from ._seg_optimal import segment_ids_by_optimal_partition, segment_optimal_partition_arrays
+from ._seg_cda import segment_ids_by_cumulative_difference, segment_cda_arrays
+from ._seg_merge import segment_ids_by_agglomerative_merge, segment_agglomerative_merge_arrays
+from ._segmentation_hierarchy import SegmentationHierarchy
+from ._profiling import SegmentationProfile, IterationStats
+from ._cache import SegmentationCache
+from ._incremental_segmentation import IncrementalSegmentation
+from ._async_segmentation import AsyncSegmenter
\ No newline at end of file
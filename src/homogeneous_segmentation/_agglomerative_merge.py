@@ -0,0 +1,204 @@
+"""
+This is a private module containing the agglomerative merge engine, a bottom-up alternative to recursive bisection.
+
+Every row starts as a segment of its own. The pair of adjacent segments whose merge increases the total cost the
+least is merged, and the increase of the merged segment's pairs with its two neighbours is pushed onto a heap, until
+no pair remains which may be merged. Each cost is found in constant time from the prefix sums, and stale pairs are
+discarded as they are popped, so the whole group takes `O(n log n)` time rather than a scan of every oversized
+segment at every level of a split tree.
+
+The `"numpy"` engine in this module, named for uniformity with the other entry points and also accepted as
+`"python"`, makes the merges with Python's `heapq`, one interpreted step at a time. It is meant as a readable
+reference for the Numba kernel in `homogeneous_segmentation._numba_kernels`, which gives the same result about ten
+times faster; on 200,000 rows it takes about 5 seconds with one variable and 6 with five. The prefix sums of the
+group are copied into nested lists of Python floats, and each row also has a Python object for its cost and its heap
+entries, so its peak memory is about 600 bytes per row with one variable and 900 with five, several times that of the
+kernel.
+
+The cost of a segment is as in `homogeneous_segmentation._optimal_partition`; either its share of the variance of
+the group, so that the increase of a merge is Ward's criterion, or its row weighted coefficient of variation. Pairs
+are merged in three tiers, each in order of increasing cost;
+
+0. pairs with a segment shorter than the minimum allowed segment length, whose merge is within the maximum,
+1. pairs with a segment shorter than the minimum, whose merge is longer than the maximum; a short segment is merged
+   even so, just as a single row may be longer than the maximum,
+2. any other pair whose merge is within the maximum, and increases the cost by less than the segment penalty.
+
+With no segment penalty every segment is therefore either too long to merge with either neighbour, or a whole group.
+"""
+import heapq
+from typing import Literal, Optional
+import numpy as np
+import numpy.typing as npt
+from ._prefix_sums import PrefixSums
+from ._optimal_bisections import validate_variable_weights
+from ._optimal_partition import variable_scale
+
+_costs = ("variance", "cv")
+
+
+def _round_length(length:float) -> float:
+    """ `np.round(length, decimals=10)`, without the overhead of a NumPy call for each pair. """
+    return round(length * 1e10) / 1e10
+
+
+def _merge_group(
+        prefix_sums            : PrefixSums,
+        start                  : int,
+        end                    : int,
+        minimum_segment_length : float,
+        maximum_segment_length : float,
+        cost                   : Literal["variance", "cv"],
+        scale                  : npt.NDArray[np.float64],
+        segment_penalty        : float,
+    ) -> npt.NDArray[np.int64]:
+    """ The split boundaries of rows `[start, end)` once every allowed merge has been made. """
+    n_rows            = end - start
+    cumulative_length = prefix_sums.length[start : end + 1].tolist()
+    total             = prefix_sums.sum[start : end + 1].tolist()
+    total_of_squares  = prefix_sums.sum_of_squares[start : end + 1].tolist()
+    scale             = scale.tolist()
+    is_variance_cost  = cost == "variance"
+
+    def segment_cost(first:int, last:int) -> float:
+        n          = last - first
+        total_cost = 0.0
+        for variable, weight in enumerate(scale):
+            segment_sum = total[last][variable] - total[first][variable]
+            deviation   = max(
+                total_of_squares[last][variable] - total_of_squares[first][variable] - segment_sum * segment_sum / n,
+                0.0,
+            )
+            if is_variance_cost:
+                total_cost += deviation * weight
+            else:
+                standard_deviation = (deviation / max(n - 1, 1))**0.5
+                if standard_deviation > 0:
+                    # infinite for a segment with a mean of zero
+                    coefficient_of_variation = n * standard_deviation / abs(segment_sum) if segment_sum else np.inf
+                    total_cost += n * coefficient_of_variation * weight
+        return total_cost
+
+    # segments are identified by their first row; `segment_end` is -1 for a row which no longer starts a segment
+    segment_end = list(range(1, n_rows + 1))
+    previous    = list(range(-1, n_rows - 1))
+    cost_of     = [segment_cost(row, row + 1) for row in range(n_rows)]
+
+    def merge_of(left:int, right:int, right_end:int) -> Optional[tuple[int, float, int, int, int]]:
+        """ The heap entry of merging the segments `[left, right)` and `[right, right_end)`, or `None`. """
+        is_short = (
+               _round_length(cumulative_length[right    ] - cumulative_length[left ]) < minimum_segment_length
+            or _round_length(cumulative_length[right_end] - cumulative_length[right]) < minimum_segment_length
+        )
+        is_within = (
+            _round_length(cumulative_length[right_end] - cumulative_length[left]) <= maximum_segment_length
+        )
+        if is_short:
+            tier = 0 if is_within else 1
+        elif is_within:
+            tier = 2
+        else:
+            return None
+        increase = segment_cost(left, right_end) - cost_of[left] - cost_of[right]
+        if increase != increase:
+            # a NaN would break the order of the heap
+            increase = np.inf
+        if tier == 2 and not increase < segment_penalty:
+            return None
+        return tier, increase, left, right, right_end
+
+    heap = [merge_of(row - 1, row, row + 1) for row in range(1, n_rows)]
+    heap = [entry for entry in heap if entry is not None]
+    heapq.heapify(heap)
+    while heap:
+        _, _, left, right, right_end = heapq.heappop(heap)
+        if segment_end[left] != right or segment_end[right] != right_end:
+            continue
+        segment_end[left]  = right_end
+        segment_end[right] = -1
+        cost_of[left]      = segment_cost(left, right_end)
+        neighbours = []
+        if previous[left] >= 0:
+            neighbours.append(merge_of(previous[left], left, right_end))
+        if right_end < n_rows:
+            previous[right_end] = left
+            neighbours.append(merge_of(left, right_end, segment_end[right_end]))
+        for entry in neighbours:
+            if entry is not None:
+                heapq.heappush(heap, entry)
+
+    segment_start = np.flatnonzero(np.array(segment_end) >= 0)
+    return start + np.append(segment_start, n_rows).astype(np.int64)
+
+
+def agglomerative_merge(
+        values                       : npt.NDArray[np.float64],
+        length                       : npt.NDArray[np.float64],
+        allowed_segment_length_range : tuple[float, float],
+        cost                         : Literal["variance", "cv"],
+        initial_split_boundaries     : Optional[npt.NDArray[np.int64]] = None,
+        engine                       : Literal["numpy", "numba"]       = "numpy",
+        variable_weights             : Optional[npt.ArrayLike]         = None,
+        segment_penalty              : Optional[float]                 = None,
+    ) -> npt.NDArray[np.int64]:
+    """
+    Merges the rows of each initial segment, bottom-up, into segments within the allowed segment length range.
+
+    Args:
+        values (npt.NDArray[np.float64]): A `(n_rows, n_variables)` array of the segmentation variables, sorted by
+            the linear measure.
+        length (npt.NDArray[np.float64]): A `(n_rows,)` array containing the length of each row.
+        allowed_segment_length_range (tuple[float, float]): Minimum and maximum allowed segment lengths.
+        cost: `"variance"` or `"cv"`, as described in `homogeneous_segmentation._optimal_partition`.
+        initial_split_boundaries (Optional[npt.NDArray[np.int64]]): Boundaries between groups, such as roads or
+            carriageways, which are merged independently. Defaults to `[0, n_rows]`.
+        engine: `"numpy"`, or its alias `"python"`, merges with Python's `heapq`, which is slow and uses several hundred
+            bytes per row; see above. `"numba"` runs the merges of each group in a JIT-compiled kernel, which is about
+            ten times faster and requires the optional dependency numba. Both give the same result.
+        variable_weights (Optional[npt.ArrayLike]): One weight per variable. The costs of the variables are
+            averaged with these weights instead of equally.
+        segment_penalty (Optional[float]): Segments which are already within the allowed range are merged only
+            while the increase in cost is less than this. `None` merges them until no pair fits within the maximum
+            segment length.
+
+    Returns:
+        A sorted array of split boundaries starting with `0` and ending with `n_rows`.
+    """
+    if cost not in _costs:
+        raise ValueError(f"cost must be one of {list(_costs)}")
+    if engine not in ("numpy", "python", "numba"):
+        raise ValueError('engine must be one of ["numpy", "numba"]')
+    min_allowed_length, max_allowed_length = allowed_segment_length_range
+    n_rows = len(length)
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+    variable_weights = validate_variable_weights(variable_weights, values.shape[1])
+    if initial_split_boundaries is None:
+        group_boundaries = np.array([0, n_rows], dtype=np.int64)
+    else:
+        group_boundaries = np.asarray(initial_split_boundaries, dtype=np.int64)
+
+    if engine == "numba":
+        from ._numba_kernels import numba_merge_group  # pylint: disable=import-outside-toplevel
+        merge_group = numba_merge_group
+    else:
+        merge_group = _merge_group
+
+    split_boundaries = [group_boundaries]
+    for start, end in zip(group_boundaries[:-1], group_boundaries[1:]):
+        if end - start < 2:
+            continue
+        # each group has prefix sums of its own, so that it is merged the same way whatever else is in the data
+        prefix_sums = PrefixSums(values[start:end], length[start:end])
+        split_boundaries.append(start + merge_group(
+            prefix_sums            = prefix_sums,
+            start                  = 0,
+            end                    = int(end - start),
+            minimum_segment_length = float(min_allowed_length),
+            maximum_segment_length = float(max_allowed_length),
+            cost                   = cost,
+            scale                  = variable_scale(prefix_sums, 0, end - start, cost, variable_weights),
+            segment_penalty        = np.inf if segment_penalty is None else float(segment_penalty),
+        ))
+    return np.unique(np.concatenate(split_boundaries))
@@ -0,0 +1,273 @@
+"""
+This is a private module containing `AsyncSegmenter`, which runs the SHS and MCV methods from asyncio code without
+blocking the event loop.
+
+Segmentation runs on an executor, and at most `max_concurrency` runs are in progress at once. Requests with the same
+segmentation parameters which arrive within `batch_window` seconds of each other are coalesced into a single run, in
+which each request's groups are separate groups of one `segment_arrays` call. Many small single-road requests then
+share the fixed cost of a run, instead of each paying it and queueing behind each other.
+"""
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Hashable, Literal, Optional
+import numpy as np
+import numpy.typing as npt
+from ._prefix_sums import PrefixSums
+from ._segment_arrays import segment_arrays
+from ._segment_data_frame import extract_arrays, to_output
+from ._frame_interchange import DataFrameLike, SeriesLike, n_rows
+
+
+@dataclass
+class _Request:
+    data                         : DataFrameLike
+    measure                      : tuple[str, str]
+    variable_column_names        : list[str]
+    allowed_segment_length_range : Optional[tuple[float, float]]
+    group_by                     : Optional[list[str]]
+    split_statistic              : Callable[..., npt.NDArray[np.float64]]
+    goal                         : Literal["min", "max"]
+    engine                       : Literal["numpy", "numba"]
+    variable_weights             : Optional[npt.ArrayLike]
+
+    def batch_key(self) -> Optional[Hashable]:
+        """ Requests with equal keys can be segmented in the same run. `None` if the request must run on its own,
+        because its default allowed segment length range depends on its own rows. """
+        if self.allowed_segment_length_range is None:
+            return None
+        return (
+            self.split_statistic,
+            self.goal,
+            tuple(float(length) for length in self.allowed_segment_length_range),
+            self.engine,
+            None if self.variable_weights is None else tuple(np.asarray(self.variable_weights, dtype=np.float64)),
+            len(self.variable_column_names),
+        )
+
+
+def _segment_batch(requests:list[_Request]) -> list[SeriesLike]:
+    """
+    Segments every request in a single call to `segment_arrays`, and returns the segment ids of each. Runs on the
+    executor.
+
+    The groups of each request are offset past those of the requests before it, so that no group spans two requests.
+    The segment ids of a request are then consecutive, and are shifted to start from `1`, as if it had been segmented
+    on its own.
+    """
+    extracted = [
+        extract_arrays(request.data, request.measure, request.variable_column_names, request.group_by)
+        for request in requests
+    ]
+    groups   = []
+    n_groups = 0
+    for start, _, _, group, _ in extracted:
+        if group is None:
+            group = np.zeros(len(start), dtype=np.int64)
+        groups.append(group + n_groups)
+        n_groups += int(group.max()) + 1 if len(group) else 0
+
+    first      = requests[0]
+    segment_id = segment_arrays(
+        start                        = np.concatenate([start  for start, _, _, _, _ in extracted]),
+        end                          = np.concatenate([end    for _, end, _, _, _ in extracted]),
+        values                       = np.concatenate([values for _, _, values, _, _ in extracted]),
+        allowed_segment_length_range = first.allowed_segment_length_range,
+        group                        = np.concatenate(groups),
+        split_statistic              = first.split_statistic,
+        goal                         = first.goal,
+        engine                       = first.engine,
+        variable_weights             = first.variable_weights,
+    )
+
+    results   = []
+    first_row = 0
+    for request, (start, _, _, _, is_complete) in zip(requests, extracted):
+        request_segment_id = segment_id[first_row : first_row + len(start)]
+        first_row         += len(start)
+        if len(request_segment_id):
+            request_segment_id = request_segment_id - (request_segment_id.min() - 1)
+        results.append(to_output(request_segment_id, is_complete, request.data))
+    return results
+
+
+class AsyncSegmenter:
+    """ Segments DataFrames by the SHS or MCV method from asyncio code, without blocking the event loop.
+
+    Each call of `maximize_spatial_heterogeneity` or `minimize_coefficient_of_variation` is awaited, and runs on an
+    executor. At most `max_concurrency` runs are in progress at once; further calls wait their turn on the event loop.
+    Calls with the same parameters made within `batch_window` seconds of the first are coalesced into a single run,
+    up to `max_batch_rows` rows, which is quicker than segmenting them one at a time. Each call still receives the
+    segment ids of its own data, starting from `1`, exactly as returned by
+    `segment_ids_to_maximize_spatial_heterogeneity` or `segment_ids_to_minimize_coefficient_of_variation`, except
+    that a segment with two split indices which differ only by floating point rounding may be split at either of
+    them. If a coalesced run fails, its calls are run again one at a time, so that each error is raised by the call
+    that caused it.
+
+    Calls without an `allowed_segment_length_range` are never coalesced, as their default range depends on their
+    own rows.
+
+    Use it as an async context manager, or call `aclose` once finished, to shut down an executor it created.
+
+    eg
+
+        async with AsyncSegmenter(max_concurrency=4) as segmenter:
+            segment_ids = await segmenter.maximize_spatial_heterogeneity(
+                data                         = road,
+                measure                      = ("slk_from", "slk_to"),
+                variable_column_names        = ["deflection"],
+                allowed_segment_length_range = (0.100, 1.000),
+            )
+
+    Args:
+        executor (Optional[Executor]): The executor to segment on. A `ProcessPoolExecutor` is also accepted, in
+            which case the data of each run is pickled to it. It is not shut down by `aclose`. Defaults to a
+            `ThreadPoolExecutor` of `max_concurrency` threads, owned by the segmenter.
+        max_concurrency (int): The maximum number of runs in progress at once.
+        batch_window (float): Seconds to wait after a call for others to coalesce with it. `0` still coalesces the
+            calls made before the event loop next runs.
+        max_batch_rows (int): A batch is started without waiting for the rest of `batch_window` once it has this many
+            rows.
+    """
+
+    def __init__(
+            self,
+            executor        : Optional[Executor] = None,
+            max_concurrency : int                = 4,
+            batch_window    : float              = 0.005,
+            max_batch_rows  : int                = 1_000_000,
+        ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if batch_window < 0:
+            raise ValueError("batch_window must not be negative")
+        self._own_executor    = executor is None
+        self._executor        = ThreadPoolExecutor(max_workers=max_concurrency) if executor is None else executor
+        self._max_concurrency = max_concurrency
+        self._batch_window    = batch_window
+        self._max_batch_rows  = max_batch_rows
+        # created on first use, so that it belongs to the running event loop
+        self._semaphore       = None
+        self._pending         = {}
+        self._tasks           = set()
+
+    async def __aenter__(self) -> "AsyncSegmenter":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """ Waits for every call in progress, then shuts down the executor if it was created by the segmenter. """
+        for key in list(self._pending):
+            self._start_batch(key, self._pending[key])
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+    async def maximize_spatial_heterogeneity(
+            self,
+            data                         : DataFrameLike,
+            measure                      : tuple[str, str],
+            variable_column_names        : list[str],
+            allowed_segment_length_range : Optional[tuple[float, float]] = None,
+            group_by                     : Optional[list[str]]           = None,
+            engine                       : Literal["numpy", "numba"]     = "numpy",
+            variable_weights             : Optional[npt.ArrayLike]       = None,
+        ) -> SeriesLike:
+        """ Awaitable `segment_ids_to_maximize_spatial_heterogeneity`, which takes the same arguments. """
+        return await self._submit(_Request(
+            data                         = data,
+            measure                      = measure,
+            variable_column_names        = list(variable_column_names),
+            allowed_segment_length_range = allowed_segment_length_range,
+            group_by                     = group_by,
+            split_statistic              = PrefixSums.q_statistic,
+            goal                         = "max",
+            engine                       = engine,
+            variable_weights             = variable_weights,
+        ))
+
+    async def minimize_coefficient_of_variation(
+            self,
+            data                         : DataFrameLike,
+            measure                      : tuple[str, str],
+            variable_column_names        : list[str],
+            allowed_segment_length_range : Optional[tuple[float, float]] = None,
+            group_by                     : Optional[list[str]]           = None,
+            engine                       : Literal["numpy", "numba"]     = "numpy",
+            variable_weights             : Optional[npt.ArrayLike]       = None,
+        ) -> SeriesLike:
+        """ Awaitable `segment_ids_to_minimize_coefficient_of_variation`, which takes the same arguments. """
+        return await self._submit(_Request(
+            data                         = data,
+            measure                      = measure,
+            variable_column_names        = list(variable_column_names),
+            allowed_segment_length_range = allowed_segment_length_range,
+            group_by                     = group_by,
+            split_statistic              = PrefixSums.p_statistic,
+            goal                         = "min",
+            engine                       = engine,
+            variable_weights             = variable_weights,
+        ))
+
+    async def _submit(self, request:_Request) -> SeriesLike:
+        loop   = asyncio.get_running_loop()
+        future = loop.create_future()
+        key    = request.batch_key()
+        if key is None:
+            self._track(self._run_batch([(request, future)]))
+            return await future
+
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            loop.call_later(self._batch_window, self._start_batch, key, batch)
+        batch.append((request, future))
+        if sum(n_rows(queued.data) for queued, _ in batch) >= self._max_batch_rows:
+            self._start_batch(key, batch)
+        return await future
+
+    def _start_batch(self, key:Hashable, batch:list):
+        # the timer of a batch which was already started by `max_batch_rows` finds a newer batch, or none
+        if self._pending.get(key) is not batch:
+            return
+        del self._pending[key]
+        self._track(self._run_batch(batch))
+
+    def _track(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch:list):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        loop = asyncio.get_running_loop()
+        # calls which were cancelled while queued are not segmented
+        batch = [(request, future) for request, future in batch if not future.done()]
+        if not batch:
+            return
+        async with self._semaphore:
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, _segment_batch, [request for request, _ in batch]
+                )
+            except Exception as error:  # pylint: disable=broad-except
+                if len(batch) == 1:
+                    _set_exception(batch[0][1], error)
+                    return
+                results = None
+        if results is None:
+            # find the calls which caused the error by running them separately
+            await asyncio.gather(*(self._run_batch([item]) for item in batch))
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def _set_exception(future:asyncio.Future, error:BaseException):
+    if not future.done():
+        future.set_exception(error)
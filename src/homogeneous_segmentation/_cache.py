@@ -0,0 +1,207 @@
+"""
+This is a private module containing `SegmentationCache`, an opt-in on-disk cache of the split boundaries of each group
+(such as each road and carriageway) of a segmentation.
+
+The split boundaries of a group depend only on the lengths and variables of its sorted rows and the parameters of
+the segmentation. Each group is therefore keyed by a hash of exactly those, and groups whose data has not changed
+since a previous run are not segmented again.
+"""
+import hashlib
+import os
+import tempfile
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Callable, Literal, Optional, Union
+import numpy as np
+import numpy.typing as npt
+from ._parallel import parallel_recursive_bisection
+from ._profiling import SegmentationProfile
+
+# Changing how split boundaries are computed or stored must change this, so that old entries are never used
+_CACHE_FORMAT_VERSION = 2
+
+
+class SegmentationCache:
+    """ A directory of cached split boundaries, one file per group, with least recently used eviction.
+
+    Pass an instance as the `cache` argument of a segmentation function. It may be shared by many runs, and by the SHS
+    and MCV methods.
+
+    Args:
+        directory (Union[str, os.PathLike]): Directory to store the cached split boundaries in. It is created if it
+            does not exist.
+        max_bytes (Optional[int]): Once the files in `directory` are larger than this in total, the least recently
+            used are deleted at the end of each segmentation run, whether or not it found every group in the cache.
+            Defaults to no limit.
+    """
+
+    def __init__(self, directory:Union[str, os.PathLike], max_bytes:Optional[int] = None):
+        self.directory = Path(directory).expanduser()
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.hits      = 0
+        self.misses    = 0
+
+    def __repr__(self):
+        return f"SegmentationCache({str(self.directory)!r}, max_bytes={self.max_bytes})"
+
+    def _path(self, key:str) -> Path:
+        return self.directory / f"{key}.npy"
+
+    def get(self, key:str) -> Optional[npt.NDArray[np.int64]]:
+        """ The split boundaries stored under `key`, or `None`. Marks the entry as recently used. """
+        path = self._path(key)
+        try:
+            split_boundaries = np.load(path, allow_pickle=False)
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        return split_boundaries
+
+    def put(self, key:str, split_boundaries:npt.NDArray[np.int64]):
+        """ Stores `split_boundaries` under `key`. The file is written to a temporary name first, so that concurrent
+        runs never read a partially written entry. """
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                np.save(file, np.asarray(split_boundaries, dtype=np.int64), allow_pickle=False)
+            os.replace(temporary_path, self._path(key))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def evict(self):
+        """ Deletes the least recently used entries until the cache is no larger than `max_bytes`. """
+        if self.max_bytes is None:
+            return
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+    def clear(self):
+        """ Deletes every entry. """
+        for path in self.directory.glob("*.npy"):
+            path.unlink(missing_ok=True)
+
+
+def group_keys(
+        values                       : npt.NDArray[np.float64],
+        length                       : npt.NDArray[np.float64],
+        group_boundaries             : npt.NDArray[np.int64],
+        allowed_segment_length_range : tuple[float, float],
+        split_statistic              : Callable[..., npt.NDArray[np.float64]],
+        goal                         : Literal["min", "max"],
+        engine                       : Literal["numpy", "numba"],
+        variable_weights             : Optional[npt.ArrayLike],
+    ) -> list[str]:
+    """
+    A key for each group, made by hashing the group's sorted rows together with every parameter which affects its
+    split boundaries.
+    """
+    parameters = hashlib.blake2b(digest_size=16)
+    parameters.update(
+        f"{_CACHE_FORMAT_VERSION}:{split_statistic.__name__}:{goal}:{engine}:{values.shape[1]}".encode()
+    )
+    if values.dtype != np.float64:
+        # float32 mode rounds differently, so it must not share entries with float64 runs
+        parameters.update(values.dtype.str.encode())
+    parameters.update(np.asarray(allowed_segment_length_range, dtype=np.float64).tobytes())
+    if variable_weights is not None:
+        parameters.update(np.asarray(variable_weights, dtype=np.float64).tobytes())
+
+    values = np.ascontiguousarray(values)
+    length = np.ascontiguousarray(length)
+    keys   = []
+    for start, end in zip(group_boundaries[:-1], group_boundaries[1:]):
+        key = parameters.copy()
+        key.update(length[start:end].data)
+        key.update(values[start:end].data)
+        keys.append(key.hexdigest())
+    return keys
+
+
+def cached_recursive_bisection(
+        cache                        : SegmentationCache,
+        values                       : npt.NDArray[np.float64],
+        length                       : npt.NDArray[np.float64],
+        allowed_segment_length_range : tuple[float, float],
+        split_statistic              : Callable[..., npt.NDArray[np.float64]],
+        goal                         : Literal["min", "max"],
+        initial_split_boundaries     : npt.NDArray[np.int64],
+        n_jobs                       : Optional[int]                   = None,
+        executor                     : Optional[Executor]              = None,
+        engine                       : Literal["numpy", "numba"]       = "numpy",
+        variable_weights             : Optional[npt.ArrayLike]         = None,
+        profiler                     : Optional[SegmentationProfile]   = None,
+        backend                      : Literal["processes", "threads"] = "processes",
+    ) -> npt.NDArray[np.int64]:
+    """
+    Equivalent to `parallel_recursive_bisection`, but the split boundaries of each group described by
+    `initial_split_boundaries` are read from `cache` where possible. The rows of the remaining groups are gathered
+    together and segmented in a single call to `parallel_recursive_bisection`, and their split boundaries are stored
+    in `cache`.
+    """
+    group_boundaries = np.asarray(initial_split_boundaries, dtype=np.int64)
+    group_start      = group_boundaries[:-1]
+    group_n_rows     = np.diff(group_boundaries)
+    keys             = group_keys(
+        values, length, group_boundaries, allowed_segment_length_range, split_statistic, goal, engine, variable_weights
+    )
+
+    split_boundaries = [group_boundaries]
+    missed           = []
+    for group, key in enumerate(keys):
+        cached = cache.get(key)
+        if cached is None:
+            missed.append(group)
+        else:
+            split_boundaries.append(cached + group_start[group])
+    cache.hits   += len(keys) - len(missed)
+    cache.misses += len(missed)
+
+    if missed:
+        missed        = np.array(missed, dtype=np.int64)
+        missed_n_rows = group_n_rows[missed]
+        # row index of every row of every missed group, so that they can be segmented together
+        missed_rows = (
+              np.arange(int(np.sum(missed_n_rows)))
+            - np.repeat(np.cumsum(missed_n_rows) - missed_n_rows, missed_n_rows)
+            + np.repeat(group_start[missed], missed_n_rows)
+        )
+        missed_boundaries = np.concatenate([[0], np.cumsum(missed_n_rows)]).astype(np.int64)
+        missed_split_boundaries = parallel_recursive_bisection(
+            values                       = values[missed_rows],
+            length                       = length[missed_rows],
+            allowed_segment_length_range = allowed_segment_length_range,
+            split_statistic              = split_statistic,
+            goal                         = goal,
+            initial_split_boundaries     = missed_boundaries,
+            n_jobs                       = n_jobs,
+            executor                     = executor,
+            engine                       = engine,
+            variable_weights             = variable_weights,
+            profiler                     = profiler,
+            backend                      = backend,
+        )
+        for i, group in enumerate(missed):
+            start, end = missed_boundaries[i], missed_boundaries[i + 1]
+            group_split_boundaries = missed_split_boundaries[
+                np.searchsorted(missed_split_boundaries, start) : np.searchsorted(missed_split_boundaries, end) + 1
+            ] - start
+            cache.put(keys[group], group_split_boundaries)
+            split_boundaries.append(group_split_boundaries + group_start[group])
+
+    # entries are marked as used on a hit too, so the cache is trimmed after every run and not only after a miss
+    cache.evict()
+    return np.unique(np.concatenate(split_boundaries))
@@ -0,0 +1,115 @@
+"""
+This is a private module containing the `homogeneous-segmentation` command, which segments a CSV or Parquet file of a
+whole network with `segment_file`.
+
+eg
+
+    homogeneous-segmentation network.csv network_segmented.csv --measure slk_from slk_to --variables deflection
+        --group-by road cwy --length-range 0.1 1.0 --jobs -1
+"""
+import argparse
+import time
+from typing import Optional, Sequence
+import numpy as np
+from ._prefix_sums import PrefixSums
+from ._segment_file import segment_file
+
+_METHODS = {
+    "shs": (PrefixSums.q_statistic, "max"),
+    "mcv": (PrefixSums.p_statistic, "min"),
+}
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog        = "homogeneous-segmentation",
+        description = (
+            "Segment a CSV or Parquet file into homogeneous sections, one road at a time. Files ending in .parquet "
+            "or .pq are read and written as Parquet, and any other file as CSV."
+        ),
+    )
+    parser.add_argument("input", help="file to segment; the rows of each group must be contiguous")
+    parser.add_argument("output", help="file to write the input rows to, with an added column of segment ids")
+    parser.add_argument(
+        "--measure", nargs=2, required=True, metavar=("START", "END"),
+        help="columns containing the start and end of each row",
+    )
+    parser.add_argument(
+        "--variables", nargs="+", required=True, metavar="COLUMN",
+        help="columns to segment by",
+    )
+    parser.add_argument(
+        "--group-by", nargs="+", required=True, metavar="COLUMN",
+        help="columns identifying each group, eg road and carriageway",
+    )
+    parser.add_argument(
+        "--length-range", nargs=2, type=float, required=True, metavar=("MIN", "MAX"),
+        help="minimum and maximum allowed segment length",
+    )
+    parser.add_argument("--method", choices=sorted(_METHODS), default="shs", help="segmentation method (default shs)")
+    parser.add_argument("--segments", metavar="PATH", help="also write a table summarising each segment to PATH")
+    parser.add_argument(
+        "--jobs", type=int, default=None, metavar="N",
+        help="number of worker processes, or of threads with --threads; -1 uses every CPU (default: no pool)",
+    )
+    parser.add_argument(
+        "--threads", action="store_true",
+        help="run --jobs threads in this process instead of worker processes; best with --engine numba",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=100_000, metavar="ROWS",
+        help="number of rows read at a time (default 100000)",
+    )
+    parser.add_argument("--engine", choices=["numpy", "numba"], default="numpy", help="default numpy")
+    parser.add_argument(
+        "--weights", nargs="+", type=float, default=None, metavar="WEIGHT",
+        help="one weight per variable",
+    )
+    parser.add_argument(
+        "--cv-threshold", type=float, default=0.25,
+        help="coefficient of variation above which a segment is flagged in the segment table (default 0.25)",
+    )
+    parser.add_argument("--segment-id-column", default="segment_id", help="default segment_id")
+    parser.add_argument(
+        "--float32", action="store_true",
+        help="segment in float32, halving the memory used by the variables and their sums; requires --engine numpy",
+    )
+    return parser
+
+
+def main(argv:Optional[Sequence[str]] = None) -> int:
+    """ Runs the command with `argv`, or `sys.argv[1:]`, and returns the exit status. """
+    parser    = _parser()
+    arguments = parser.parse_args(argv)
+    split_statistic, goal = _METHODS[arguments.method]
+
+    start = time.perf_counter()
+    try:
+        n_rows, n_groups, n_segments = segment_file(
+            input_path                   = arguments.input,
+            output_path                  = arguments.output,
+            measure                      = tuple(arguments.measure),
+            variable_column_names        = arguments.variables,
+            allowed_segment_length_range = tuple(arguments.length_range),
+            group_by                     = arguments.group_by,
+            split_statistic              = split_statistic,
+            goal                         = goal,
+            segments_path                = arguments.segments,
+            chunk_size                   = arguments.chunk_size,
+            segment_id_column_name       = arguments.segment_id_column,
+            engine                       = arguments.engine,
+            variable_weights             = arguments.weights,
+            cv_threshold                 = arguments.cv_threshold,
+            n_jobs                       = arguments.jobs,
+            dtype                        = np.float32 if arguments.float32 else np.float64,
+            backend                      = "threads" if arguments.threads else "processes",
+        )
+    except (OSError, ImportError, KeyError, ValueError) as error:
+        parser.exit(1, f"{parser.prog}: error: {error}\n")
+    seconds = time.perf_counter() - start
+
+    print(
+        f"Segmented {n_rows} rows of {n_groups} groups into {n_segments} segments in {seconds:.2f} s "
+        f"({n_rows / seconds:,.0f} rows/s, {n_groups / seconds:,.1f} roads/s)"
+    )
+    return 0
@@ -0,0 +1,256 @@
+"""
+This is a private module containing the Cumulative Difference Approach (CDA) of AGPT05-19 Appendix D.
+
+The cumulative difference of a segment at measure `x` is
+
+    Z(x) = (area under the variable from the start of the segment to x) - (mean of the segment) * (length to x)
+
+where the mean is weighted by row length. `Z` rises over rows above the mean and falls over rows below it, so the
+boundaries between homogeneous sections are its turning points. With several variables, each is standardised by the
+mean and standard deviation of the segment, and `Z` is that of the weighted sum of the standardised variables.
+
+Noise makes the variable cross the mean, and `Z` turn, at almost every row, so only significant turning points are
+used. Each segment is split at the extremum of `Z` which is largest relative to the standard deviation `Z` would have
+there if the segment had no change in mean, among the split indices allowed by the minimum segment length rule of
+the SHS and MCV methods (see `is_allowed_split`). The split is kept if that ratio is above the universal threshold
+`sqrt(2 log n)` of binary segmentation, scaled by `threshold_constant` and by the noise of the segment, estimated
+robustly from the median absolute difference between neighbouring rows. A segment longer than the maximum allowed
+segment length is split at its most significant turning point whether or not it passes the threshold. Both halves
+are then considered again, so a segment with several sections is split at each of them in turn, level by level, with
+every segment of a level evaluated in one vectorised pass over all of its rows.
+
+This is not a single pass over the rows. Splitting every group at each turning point of one cumulative difference
+splits it at every noise crossing, and whether a turning point is significant depends on the mean of the segment it
+lies in, which changes with every split. Each level is one `O(n)` pass over the rows still being split, and a level
+splits every segment which has a significant turning point, so the number of levels is the depth of the split tree;
+about `log2` of the number of sections of the longest group.
+
+The noise is assumed to be independent from row to row. Noise which is smoothed or correlated along the road is
+underestimated, and gives more boundaries.
+"""
+from typing import Optional
+import numpy as np
+import numpy.typing as npt
+from ._optimal_bisections import validate_variable_weights
+
+# the median absolute difference between neighbouring rows of normally distributed noise, per standard deviation
+_MEDIAN_ABSOLUTE_DIFFERENCE = 0.6745 * np.sqrt(2.0)
+
+
+def _segment_rows(
+        starts : npt.NDArray[np.int64],
+        ends   : npt.NDArray[np.int64],
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """ The row index of every row of every segment `[starts[j], ends[j])`, and the segment `j` it belongs to. """
+    n_rows  = ends - starts
+    segment = np.repeat(np.arange(len(starts)), n_rows)
+    row     = np.arange(len(segment)) - np.repeat(np.cumsum(n_rows) - n_rows, n_rows) + starts[segment]
+    return row, segment
+
+
+def _segment_medians(values:npt.NDArray[np.float64], segment:npt.NDArray[np.int64], n_segments:int) -> npt.NDArray:
+    """ The median of the `values` of each segment, or NaN for a segment with none. """
+    count  = np.bincount(segment, minlength=n_segments)
+    median = np.full(n_segments, np.nan)
+    if len(values) == 0:
+        return median
+    values = values[np.lexsort((values, segment))]
+    first  = np.cumsum(count) - count
+    k      = np.flatnonzero(count)
+    median[k] = (values[first[k] + (count[k] - 1) // 2] + values[first[k] + count[k] // 2]) / 2.0
+    return median
+
+
+def is_allowed_split(
+        length_before          : npt.NDArray[np.float64],
+        length_after           : npt.NDArray[np.float64],
+        row_length             : npt.NDArray[np.float64],
+        is_last_row            : npt.NDArray[np.bool_],
+        minimum_segment_length : float,
+    ) -> npt.NDArray[np.bool_]:
+    """
+    Whether a segment may be split before a row, by the rule of `homogeneous_segmentation._optimal_bisections`; the
+    rows before the split must be longer than the minimum segment length, and so must the rows after the split less
+    the first of them, unless it is the last row of the segment.
+
+    Args:
+        length_before, length_after: The length of the rows of the segment before the row, and from the row on.
+        row_length: The length of the row.
+        is_last_row: Whether the row is the last of its segment.
+        minimum_segment_length (float): Minimum allowed segment length.
+    """
+    length_after_next = np.where(is_last_row, length_after, length_after - row_length)
+    return (
+          (np.round(length_before    , decimals=10) > minimum_segment_length)
+        & (np.round(length_after_next, decimals=10) > minimum_segment_length)
+    )
+
+
+def cumulative_difference_boundaries(
+        values                 : npt.NDArray[np.float64],
+        cumulative_length      : npt.NDArray[np.float64],
+        starts                 : npt.NDArray[np.int64],
+        ends                   : npt.NDArray[np.int64],
+        minimum_segment_length : float,
+        maximum_segment_length : float,
+        variable_weights       : Optional[npt.NDArray[np.float64]] = None,
+        threshold_constant     : float                             = 1.3,
+    ) -> npt.NDArray[np.int64]:
+    """
+    One level of the approach; the most significant turning point of each segment `[starts[j], ends[j])`, if it is
+    significant or the segment is longer than the maximum allowed segment length.
+
+    Args:
+        values (npt.NDArray[np.float64]): A `(n_rows, n_variables)` array of the segmentation variables.
+        cumulative_length (npt.NDArray[np.float64]): A `(n_rows + 1,)` array; the total length of rows `[0, i)`.
+        starts, ends: The segments to split, each of at least one row. They must be sorted and must not overlap.
+        minimum_segment_length (float): Minimum allowed segment length.
+        maximum_segment_length (float): Maximum allowed segment length.
+        variable_weights (Optional[npt.NDArray[np.float64]]): One weight per variable.
+        threshold_constant (float): Multiplies the universal threshold; see the module docstring.
+
+    Returns:
+        The sorted new split boundaries, at most one inside each segment.
+    """
+    row, segment = _segment_rows(starts, ends)
+    if len(row) == 0:
+        return np.array([], dtype=np.int64)
+    n_segments = len(starts)
+    row_length = (cumulative_length[row + 1] - cumulative_length[row])[:, np.newaxis]
+    row_values = values[row]
+
+    # length weighted mean and standard deviation of each variable in each segment
+    first_row      = np.cumsum(ends - starts) - (ends - starts)
+    segment_length = np.add.reduceat(row_length[:, 0], first_row)
+    mean           = np.add.reduceat(row_values * row_length, first_row) / segment_length[:, np.newaxis]
+    deviation      = row_values - mean[segment]
+    if values.shape[1] == 1 and variable_weights is None:
+        combined_deviation = deviation[:, 0]
+        # the size of the rounding error of the deviations, below which they are not noise
+        rounding_scale     = np.abs(mean[:, 0])
+    else:
+        variance = np.add.reduceat(deviation**2.0 * row_length, first_row)
+        standard_deviation = np.sqrt(variance / segment_length[:, np.newaxis])
+        standard_deviation[standard_deviation == 0] = 1.0
+        if variable_weights is None:
+            variable_weights = np.ones(values.shape[1])
+        combined_deviation = (deviation / standard_deviation[segment]) @ variable_weights
+        rounding_scale     = (np.abs(mean) / standard_deviation) @ variable_weights
+
+    # Z before each row; the first row of each segment is never a split index
+    area = combined_deviation * row_length[:, 0]
+    z    = np.cumsum(area) - area
+    z   -= z[first_row][segment]
+
+    # the standard deviation of Z before each row, in units of the noise, if the segment had no change in mean
+    length_before = cumulative_length[row] - cumulative_length[starts[segment]]
+    length_after  = segment_length[segment] - length_before
+    mean_length   = segment_length / (ends - starts)
+    spread        = np.sqrt(mean_length[segment] * length_before * length_after / segment_length[segment])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        significance = np.abs(z) / spread
+    is_candidate = (
+          (row > starts[segment])
+        & is_allowed_split(
+            length_before, length_after, row_length[:, 0], row == ends[segment] - 1, minimum_segment_length
+        )
+        & ~np.isnan(significance)
+    )
+    if not is_candidate.any():
+        return np.array([], dtype=np.int64)
+    significance = np.where(is_candidate, significance, -1.0)
+
+    # the first most significant candidate of each segment
+    best_significance = np.maximum.reduceat(significance, first_row)
+    is_best           = is_candidate & (significance == best_significance[segment])
+    best_segment, first_best = np.unique(segment[is_best], return_index=True)
+    best_row          = row[is_best][first_best]
+
+    # the noise of each segment, from the differences between neighbouring rows
+    is_neighbour = segment[1:] == segment[:-1]
+    noise        = _segment_medians(
+        np.abs(np.diff(combined_deviation))[is_neighbour],
+        segment[1:][is_neighbour],
+        n_segments,
+    ) / _MEDIAN_ABSOLUTE_DIFFERENCE
+    noise        = np.maximum(noise, 1e-9 * rounding_scale)[best_segment]
+    threshold    = threshold_constant * np.sqrt(2.0 * np.log(ends - starts))[best_segment] * noise
+    is_too_long  = np.round(segment_length[best_segment], decimals=10) > maximum_segment_length
+    return best_row[(best_significance[best_segment] > threshold) | is_too_long]
+
+
+def cumulative_difference_approach(
+        values                       : npt.NDArray[np.float64],
+        length                       : npt.NDArray[np.float64],
+        allowed_segment_length_range : tuple[float, float],
+        initial_split_boundaries     : Optional[npt.NDArray[np.int64]] = None,
+        variable_weights             : Optional[npt.ArrayLike]         = None,
+        threshold_constant           : float                           = 1.3,
+    ) -> npt.NDArray[np.int64]:
+    """
+    Splits every initial segment at its most significant turning point, then repeats the approach on both sides of
+    every split, until no segment has a significant turning point and none is longer than the maximum allowed segment
+    length.
+
+    Args:
+        values (npt.NDArray[np.float64]): A `(n_rows, n_variables)` array of the segmentation variables, sorted by
+            the linear measure.
+        length (npt.NDArray[np.float64]): A `(n_rows,)` array containing the length of each row.
+        allowed_segment_length_range (tuple[float, float]): Minimum and maximum allowed segment lengths.
+        initial_split_boundaries (Optional[npt.NDArray[np.int64]]): Boundaries between groups, such as roads or
+            carriageways, which are segmented independently but in the same pass. Defaults to `[0, n_rows]`.
+        variable_weights (Optional[npt.ArrayLike]): One weight per variable, used when combining the standardised
+            variables.
+        threshold_constant (float): Multiplies the universal threshold `sqrt(2 log n)` times the noise which a
+            turning point must exceed. Defaults to `1.3`, as recommended by Fryzlewicz (2014), Wild Binary
+            Segmentation for Multiple Change-Point Detection. Larger values give fewer segments.
+
+    Returns:
+        A sorted array of split boundaries starting with `0` and ending with `n_rows`.
+    """
+    min_allowed_length, max_allowed_length = allowed_segment_length_range
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+    n_rows            = len(length)
+    variable_weights  = validate_variable_weights(variable_weights, values.shape[1])
+    cumulative_length = np.zeros(n_rows + 1)
+    np.cumsum(length, out=cumulative_length[1:])
+
+    if initial_split_boundaries is None:
+        split_boundaries = np.array([0, n_rows], dtype=np.int64)
+    else:
+        split_boundaries = np.asarray(initial_split_boundaries, dtype=np.int64)
+
+    # every initial segment is considered, then both sides of each split
+    starts = split_boundaries[:-1]
+    ends   = split_boundaries[1:]
+    k      = np.flatnonzero(ends - starts > 1)
+    starts = starts[k]
+    ends   = ends  [k]
+    while len(starts):
+        new_split_boundaries = cumulative_difference_boundaries(
+            values                 = values,
+            cumulative_length      = cumulative_length,
+            starts                 = starts,
+            ends                   = ends,
+            minimum_segment_length = min_allowed_length,
+            maximum_segment_length = max_allowed_length,
+            variable_weights       = variable_weights,
+            threshold_constant     = threshold_constant,
+        )
+        if len(new_split_boundaries) == 0:
+            break
+        split_boundaries = np.union1d(split_boundaries, new_split_boundaries)
+
+        # the two sides of each segment split at this level
+        parent = np.searchsorted(starts, new_split_boundaries, side="right") - 1
+        starts = np.concatenate([starts[parent], new_split_boundaries])
+        ends   = np.concatenate([new_split_boundaries, ends[parent]])
+        order  = np.argsort(starts, kind="stable")
+        starts = starts[order]
+        ends   = ends  [order]
+        k      = np.flatnonzero(ends - starts > 1)
+        starts = starts[k]
+        ends   = ends  [k]
+    return split_boundaries
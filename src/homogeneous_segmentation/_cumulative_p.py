@@ -7,15 +7,20 @@ import numpy.typing as npt
 
 def cumulative_p(data:npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
     """ Computes the cumulative P-statistic for each potential split index in an array.
+
+    A 2-D `(n_rows, n_variables)` array computes the P values of every variable (column) in one pass, and the result
+    has one column per variable.
     """
-    cum_n                = np.arange(1, len(data))  # 1:(n - 1)         # Used as denominator later ∴ Must start from 1.
+    data                 = np.asarray(data)
+    # 1:(n - 1)  Used as denominator later ∴ Must start from 1. Shaped to broadcast along the columns of 2-D data.
+    cum_n                = np.arange(1, len(data)).reshape((-1,) + (1,) * (data.ndim - 1))
     cum_n_rev            = cum_n[:  :-1]
     data_left            = data [:-1   ]            # drops last
     data_right           = data [:0 :-1]            # reverses and then drops last
-    cum_data_left        = np.cumsum(data_left      )
-    cum_data_right       = np.cumsum(data_right     )[::-1]
-    cum_datasquare_left  = np.cumsum(data_left  ** 2)
-    cum_datasquare_right = np.cumsum(data_right ** 2)[::-1]
+    cum_data_left        = np.cumsum(data_left      , axis=0)
+    cum_data_right       = np.cumsum(data_right     , axis=0)[::-1]
+    cum_datasquare_left  = np.cumsum(data_left  ** 2, axis=0)
+    cum_datasquare_right = np.cumsum(data_right ** 2, axis=0)[::-1]
     # ignore errors caused by NaN values, the original implementation does not handle them either
     with np.errstate(invalid='ignore', divide='ignore'):
         result = (
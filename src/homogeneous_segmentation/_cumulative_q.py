@@ -6,6 +6,12 @@ import numpy as np
 import numpy.typing as npt
 
 
+def _column_sums(data:npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """ `np.sum(data, axis=0)`, but summed in the same (pairwise) order as `np.sum` of each column on its own, so that
+    2-D input gives exactly the same result as 1-D input. """
+    return np.sum(np.ascontiguousarray(np.moveaxis(data, 0, -1)), axis=-1)
+
+
 def cumulative_q (data:npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
     """ Computes the cumulative Q-statistic for each potential split index in an array.
 
@@ -29,13 +35,15 @@ def cumulative_q (data:npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
 
     Args:
         data (npt.ArrayLike): An array-like object containing the data points for which the Q values are to be computed.
+            A 2-D `(n_rows, n_variables)` array computes the Q values of every variable (column) in one pass.
 
     Returns:
-        npt.ArrayLike: An array of the same length as 'data', containing the computed Q values for each potential split
-        point.
+        npt.ArrayLike: An array one row shorter than 'data', containing the computed Q values for each potential split
+        point. If 'data' is 2-D the result has one column per variable.
     """
-
-    cum_n                = np.arange(1, len(data))  # 1:(n - 1)         # Used as denominator later ∴ Must start from 1.
+    data                 = np.asarray(data)
+    # 1:(n - 1)  Used as denominator later ∴ Must start from 1. Shaped to broadcast along the columns of 2-D data.
+    cum_n                = np.arange(1, len(data)).reshape((-1,) + (1,) * (data.ndim - 1))
     # This next line ensures that we have preserved the original functionality; that cum_n is 1 item shorter than data
     # (Possibly it is an error, or maybe it is intended that part of the math )
     assert len(cum_n) == len(data) - 1
@@ -43,18 +51,18 @@ def cumulative_q (data:npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
     data_left            = data[:-1]     # drops last
     data_right           = data [:0 :-1] # reverses and then drops last
 
-    cum_data_left        = np.cumsum(data_left      )
-    cum_data_right       = np.cumsum(data_right     )[::-1]
-    sumd                 = np.sum   (data           )
-    cum_datasquare_left  = np.cumsum(data_left  ** 2)
-    cum_datasquare_right = np.cumsum(data_right ** 2)[::-1]
+    cum_data_left        = np.cumsum(data_left      , axis=0)
+    cum_data_right       = np.cumsum(data_right     , axis=0)[::-1]
+    sumd                 = _column_sums(data        )
+    cum_datasquare_left  = np.cumsum(data_left  ** 2, axis=0)
+    cum_datasquare_right = np.cumsum(data_right ** 2, axis=0)[::-1]
     #with np.errstate(invalid='ignore', divide='ignore'):
     result = (
         1 - (
             ( cum_datasquare_left - cum_data_left  * cum_data_left  / cum_n      ) 
             + (cum_datasquare_right - cum_data_right * cum_data_right / cum_n[::-1])
         ) / (
-            np.sum(np.power(data, 2)) - sumd**2.0 / len(data)
+            _column_sums(np.power(data, 2)) - sumd**2.0 / len(data)
         )
     )
     return result
@@ -0,0 +1,105 @@
+"""
+This is a private module containing the column access used by the DataFrame entry points, so that they accept a
+`pyarrow.Table` or a `polars.DataFrame` as well as a `pd.DataFrame`.
+
+Neither pyarrow nor polars is imported unless a table or DataFrame of that library is passed in, which means that it is
+already installed. pandas is only imported by the functions which build pandas objects, so that the array-level
+functions load NumPy alone. Numeric columns are read as NumPy views of their Arrow buffers where the column is a single
+chunk of float64 without missing values, and are otherwise converted. Results are returned in the library of the input.
+"""
+from typing import TYPE_CHECKING, Literal, Union
+import numpy as np
+import numpy.typing as npt
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow
+    import polars
+
+DataFrameLike = Union["pd.DataFrame", "pyarrow.Table", "polars.DataFrame"]
+SeriesLike    = Union["pd.Series", "pyarrow.Array", "polars.Series"]
+
+
+def frame_kind(data:DataFrameLike) -> Literal["pandas", "arrow", "polars"]:
+    """ The library `data` belongs to, found without importing pyarrow or polars. """
+    library = type(data).__module__.partition(".")[0]
+    if library == "pyarrow":
+        return "arrow"
+    if library == "polars":
+        return "polars"
+    return "pandas"
+
+
+def column_to_numpy(data:DataFrameLike, column_name:str) -> npt.NDArray:
+    """ A column of `data` as a NumPy array. Missing values of numeric columns are NaN, and of others are `None`. """
+    kind = frame_kind(data)
+    if kind == "arrow":
+        column = data.column(column_name)
+        # a single chunk is converted without concatenating, which is a view if it is numeric with no missing values
+        array  = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+        return array.to_numpy(zero_copy_only=False)
+    if kind == "polars":
+        return data.get_column(column_name).to_numpy()
+    return data[column_name].to_numpy()
+
+
+def variable_matrix(
+        data                  : DataFrameLike,
+        variable_column_names : list[str],
+        dtype                 : npt.DTypeLike = np.float64,
+    ) -> npt.NDArray[np.float64]:
+    """ The `(n_rows, n_variables)` matrix of the variable columns. A single variable of a pyarrow or polars input
+    which is already of `dtype` is a view of its buffer. """
+    if frame_kind(data) == "pandas":
+        return data.loc[:, variable_column_names].to_numpy(dtype=dtype)
+    columns = [
+        np.asarray(column_to_numpy(data, column_name), dtype=dtype)
+        for column_name in variable_column_names
+    ]
+    if len(columns) == 1:
+        return columns[0][:, np.newaxis]
+    return np.column_stack(columns)
+
+
+def group_codes(data:DataFrameLike, group_by:list[str]) -> npt.NDArray[np.int64]:
+    """ The index of the group of each row, in sorted order of the `group_by` columns. Missing values form a group. """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    if frame_kind(data) != "pandas":
+        # only the group columns are converted to pandas
+        data = pd.DataFrame({column_name: column_to_numpy(data, column_name) for column_name in group_by})
+    return data.groupby(list(group_by), sort=True, dropna=False).ngroup().to_numpy()
+
+
+def n_rows(data:DataFrameLike) -> int:
+    return data.num_rows if frame_kind(data) == "arrow" else len(data)
+
+
+def segment_ids_like(
+        data        : DataFrameLike,
+        segment_id  : npt.NDArray[np.int64],
+        is_complete : npt.NDArray[np.bool_],
+    ) -> Union["pyarrow.Array", "polars.Series"]:
+    """ An int64 Arrow array or polars series of `segment_id`, with a missing value for each incomplete row. """
+    if not is_complete.all():
+        full_segment_id = np.zeros(len(is_complete), dtype=np.int64)
+        full_segment_id[is_complete] = segment_id
+        segment_id = full_segment_id
+    if frame_kind(data) == "arrow":
+        import pyarrow  # pylint: disable=import-outside-toplevel
+        return pyarrow.array(segment_id, type=pyarrow.int64(), mask=None if is_complete.all() else ~is_complete)
+    import polars  # pylint: disable=import-outside-toplevel
+    segment_ids = polars.Series("segment_id", segment_id, dtype=polars.Int64)
+    if not is_complete.all():
+        segment_ids = polars.select(
+            polars.when(polars.Series(is_complete)).then(segment_ids).otherwise(None).alias("segment_id")
+        ).to_series()
+    return segment_ids
+
+
+def frame_like(data:DataFrameLike, columns:dict[str, npt.NDArray]) -> Union["pyarrow.Table", "polars.DataFrame"]:
+    """ A pyarrow table or polars DataFrame, the same library as `data`, of `columns`. """
+    if frame_kind(data) == "arrow":
+        import pyarrow  # pylint: disable=import-outside-toplevel
+        return pyarrow.table(columns)
+    import polars  # pylint: disable=import-outside-toplevel
+    return polars.DataFrame(columns)
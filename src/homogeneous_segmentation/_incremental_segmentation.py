@@ -0,0 +1,230 @@
+"""
+This is a private module containing `IncrementalSegmentation`, a segmentation which can be updated in place when the
+values of some rows change, such as after a new survey of part of a road.
+
+The split statistic of a segment depends only on the rows inside it. A segment of the split tree which contains no
+changed row is therefore split exactly as before, and only segments containing a changed row are bisected again.
+"""
+from typing import TYPE_CHECKING, Callable, Literal, Optional, Union
+import numpy as np
+import numpy.typing as npt
+from ._prefix_sums import PrefixSums
+from ._recursive_bisection import bisection_engine, bisection_tree, segment_ids_from_split_boundaries
+from ._segment_arrays import prepare_arrays, restore_order
+from ._segment_data_frame import extract_arrays, to_series
+from ._shared_bisections import SharedBisections
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class IncrementalSegmentation:
+    """ A segmentation by the SHS or MCV method which keeps its prefix sums and split tree, so that it can be updated
+    when the values of some rows change.
+
+    Use `maximize_spatial_heterogeneity` or `minimize_coefficient_of_variation` to segment the data, `segment_ids` to
+    read the segmentation, and `update` to change the values of some rows and re-segment. Each update recomputes the
+    prefix sums from the first changed row onwards, and bisects only the segments of the split tree which contain a
+    changed row; the split indices of every other segment are re-used.
+
+    The result of an update is the same as segmenting the updated data from scratch, except that a segment with two
+    split indices which differ only by floating point rounding, in a group containing a changed row, may be split at
+    either of them. The prefix sums restart at every group, so groups without a changed row are unaffected.
+
+    Attributes:
+        split_boundaries (npt.NDArray[np.int64]): The split boundaries of the current segmentation, as row indices
+            into the sorted rows.
+    """
+
+    def __init__(
+            self,
+            values                       : npt.NDArray[np.float64],
+            length                       : npt.NDArray[np.float64],
+            group_boundaries             : npt.NDArray[np.int64],
+            allowed_segment_length_range : Optional[tuple[float, float]],
+            split_statistic              : Callable[..., npt.NDArray[np.float64]],
+            goal                         : Literal["min", "max"],
+            engine                       : Union[Literal["numpy", "numba"], Callable] = "numpy",
+            variable_weights             : Optional[npt.ArrayLike]                    = None,
+            order                        : Optional[npt.NDArray[np.int64]]            = None,
+        ):
+        if allowed_segment_length_range is None:
+            allowed_segment_length_range = (
+                length.min(),
+                length.sum()
+            )
+        # the values are updated in place, so they must not be shared with the caller
+        self._values                       = np.array(values, dtype=np.float64, order="C")
+        self._length                       = length
+        self._group_boundaries             = group_boundaries
+        self._allowed_segment_length_range = allowed_segment_length_range
+        self._split_statistic              = split_statistic
+        self._goal                         = goal
+        self._variable_weights             = variable_weights
+        self._order                        = order
+        self._is_complete                  = None
+        self._index                        = None
+        self._variable_column_names        = None
+        self._prefix_sums                  = PrefixSums(self._values, length, group_boundaries=group_boundaries)
+        self._bisect                       = SharedBisections(bisection_engine(engine))
+        self._segment()
+
+    def _segment(self):
+        self.split_boundaries, _ = bisection_tree(
+            values                       = self._values,
+            length                       = self._length,
+            allowed_segment_length_range = self._allowed_segment_length_range,
+            split_statistic              = self._split_statistic,
+            goal                         = self._goal,
+            initial_split_boundaries     = self._group_boundaries,
+            engine                       = self._bisect,
+            variable_weights             = self._variable_weights,
+            prefix_sums                  = self._prefix_sums,
+        )
+
+    @classmethod
+    def _build_from_data_frame(
+            cls,
+            data                         : "pd.DataFrame",
+            measure                      : tuple[str, str],
+            variable_column_names        : list[str],
+            allowed_segment_length_range : Optional[tuple[float, float]],
+            group_by                     : Optional[list[str]],
+            split_statistic              : Callable[..., npt.NDArray[np.float64]],
+            goal                         : Literal["min", "max"],
+            engine                       : Union[Literal["numpy", "numba"], Callable],
+            variable_weights             : Optional[npt.ArrayLike],
+        ) -> "IncrementalSegmentation":
+        start, end, values, group, is_complete = extract_arrays(data, measure, variable_column_names, group_by)
+        values, length, group_boundaries, order = prepare_arrays(start, end, values, group)
+        segmentation = cls(
+            values                       = values,
+            length                       = length,
+            group_boundaries             = group_boundaries,
+            allowed_segment_length_range = allowed_segment_length_range,
+            split_statistic              = split_statistic,
+            goal                         = goal,
+            engine                       = engine,
+            variable_weights             = variable_weights,
+            order                        = order,
+        )
+        segmentation._is_complete           = is_complete
+        segmentation._index                 = data.index
+        segmentation._variable_column_names = list(variable_column_names)
+        return segmentation
+
+    @classmethod
+    def maximize_spatial_heterogeneity(
+            cls,
+            data                         : "pd.DataFrame",
+            measure                      : tuple[str, str],
+            variable_column_names        : list[str],
+            allowed_segment_length_range : Optional[tuple[float, float]]              = None,
+            group_by                     : Optional[list[str]]                        = None,
+            engine                       : Union[Literal["numpy", "numba"], Callable] = "numpy",
+            variable_weights             : Optional[npt.ArrayLike]                    = None,
+        ) -> "IncrementalSegmentation":
+        """
+        Segments `data` by the Spatial Heterogeneity Segmentation (SHS) method. The arguments are the same as
+        `segment_ids_to_maximize_spatial_heterogeneity`.
+        """
+        return cls._build_from_data_frame(
+            data                         = data,
+            measure                      = measure,
+            variable_column_names        = variable_column_names,
+            allowed_segment_length_range = allowed_segment_length_range,
+            group_by                     = group_by,
+            split_statistic              = PrefixSums.q_statistic,
+            goal                         = "max",
+            engine                       = engine,
+            variable_weights             = variable_weights,
+        )
+
+    @classmethod
+    def minimize_coefficient_of_variation(
+            cls,
+            data                         : "pd.DataFrame",
+            measure                      : tuple[str, str],
+            variable_column_names        : list[str],
+            allowed_segment_length_range : Optional[tuple[float, float]]              = None,
+            group_by                     : Optional[list[str]]                        = None,
+            engine                       : Union[Literal["numpy", "numba"], Callable] = "numpy",
+            variable_weights             : Optional[npt.ArrayLike]                    = None,
+        ) -> "IncrementalSegmentation":
+        """
+        Segments `data` by the Minimize Coefficient of Variation (MCV) method. The arguments are the same as
+        `segment_ids_to_minimize_coefficient_of_variation`.
+        """
+        return cls._build_from_data_frame(
+            data                         = data,
+            measure                      = measure,
+            variable_column_names        = variable_column_names,
+            allowed_segment_length_range = allowed_segment_length_range,
+            group_by                     = group_by,
+            split_statistic              = PrefixSums.p_statistic,
+            goal                         = "min",
+            engine                       = engine,
+            variable_weights             = variable_weights,
+        )
+
+    def segment_ids(self) -> "pd.Series":
+        """
+        Segment ids of the current segmentation, identical to those of the SHS or MCV function called with the same
+        arguments on the updated data.
+
+        Returns:
+            A series aligned to the index of the original `data`.
+        """
+        segment_id = restore_order(segment_ids_from_split_boundaries(self.split_boundaries), self._order)
+        return to_series(segment_id, self._is_complete, self._index)
+
+    def _update_sorted_rows(self, rows:npt.ArrayLike, values:npt.ArrayLike):
+        """
+        Changes the values of some of the sorted rows, and re-segments.
+
+        Args:
+            rows (npt.ArrayLike): Indices of the changed rows, into the sorted rows.
+            values (npt.ArrayLike): A `(len(rows), n_variables)` array of their new values.
+        """
+        rows   = np.asarray(rows, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(rows), -1)
+        if len(rows) == 0:
+            return
+        if values.shape[1] != self._values.shape[1]:
+            raise ValueError("values must have one column per variable")
+        if np.isnan(values).any():
+            raise ValueError(
+                "values must not contain NaN; rows with missing values can only be removed by segmenting again"
+            )
+        self._values[rows] = values
+        self._prefix_sums.update(int(rows.min()), self._values)
+        self._bisect.forget(rows, self._prefix_sums.n_rows)
+        self._segment()
+
+    def update(self, changed:"pd.DataFrame") -> "pd.Series":
+        """
+        Changes the values of some rows of the original `data`, and re-segments.
+
+        Args:
+            changed (pd.DataFrame): The changed rows, with their labels in the index of the original `data` and their
+                new values in the `variable_column_names` columns. Other columns are ignored; the measure and groups
+                of a row cannot be changed by an update.
+
+        Returns:
+            The new segment ids, as returned by `segment_ids`.
+        """
+        position = self._index.get_indexer(changed.index)
+        if np.any(position < 0):
+            raise ValueError("every changed row must be in the index of the original data")
+        if not self._is_complete[position].all():
+            raise ValueError(
+                "rows which had missing values were not segmented; they can only be added by segmenting again"
+            )
+        # position among the rows which were segmented, then among the sorted rows
+        rows = np.cumsum(self._is_complete)[position] - 1
+        if self._order is not None:
+            sorted_row              = np.empty_like(self._order)
+            sorted_row[self._order] = np.arange(len(self._order))
+            rows                    = sorted_row[rows]
+        self._update_sorted_rows(rows, changed.loc[:, self._variable_column_names].to_numpy(dtype=np.float64))
+        return self.segment_ids()
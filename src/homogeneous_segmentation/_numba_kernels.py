@@ -0,0 +1,512 @@
+"""
+This is a private module containing optional JIT-compiled kernels, used when `engine="numba"` is selected.
+
+Numba is imported lazily, the first time a kernel is needed, so that it remains an optional dependency. The bisection
+kernel computes the split statistic of each candidate split index and picks the optimum in a single fused loop per
+segment, without allocating the temporary arrays used by `batched_optimal_bisections`. The partition kernel runs the
+whole dynamic program of `homogeneous_segmentation._optimal_partition` for one group, and the merge kernel makes every
+merge of `homogeneous_segmentation._agglomerative_merge` for one group.
+"""
+from functools import lru_cache
+from typing import Callable, Literal, Optional
+import numpy as np
+import numpy.typing as npt
+from ._prefix_sums import PrefixSums
+from ._optimal_partition import split_boundaries_from_best_start
+
+_STATISTIC_Q = 0
+_STATISTIC_P = 1
+
+_statistic_codes = {
+    PrefixSums.q_statistic: _STATISTIC_Q,
+    PrefixSums.p_statistic: _STATISTIC_P,
+}
+
+
+def _jit():
+    try:
+        import numba  # pylint: disable=import-outside-toplevel
+    except ImportError as error:
+        raise ImportError(
+            'engine="numba" requires the optional dependency numba. '
+            'Install it with `pip install homogeneous-segmentation[numba]`, or use the default engine.'
+        ) from error
+
+    # error_model="numpy" makes division by zero produce inf / nan like numpy, instead of raising
+    return numba.njit(cache=True, nogil=True, error_model="numpy")
+
+
+@lru_cache(maxsize=None)
+def _compile_kernels():
+    jit = _jit()
+
+    @jit
+    def is_outside_minimum_length(cumulative_length, start, start_length, end, row, minimum_segment_length):
+        # row `row` may be a split index only if the rows up to and including it, and the rows from it to the end,
+        # are both longer than the minimum segment length
+        left  = np.round(cumulative_length[row + 1] - start_length, 10)
+        right = np.round(cumulative_length[end] - (start_length if row == start else cumulative_length[row]), 10)
+        return left > minimum_segment_length and right > minimum_segment_length
+
+    @jit
+    def batched_optimal_bisections_kernel(
+            count, total, total_of_squares, cumulative_length, is_group_start,
+            starts, ends, minimum_segment_length, statistic, maximize, variable_weights, total_weight,
+            out_split_indices, out_is_split,
+        ):
+        n_variables         = total.shape[1]
+        n_split_indices     = 0
+        segment_denominator = np.empty(n_variables)
+        # the values to subtract at the start of the segment, which are zero at the first row of a group
+        start_total            = np.empty(n_variables)
+        start_total_of_squares = np.empty(n_variables)
+        for segment in range(len(starts)):
+            start = starts[segment]
+            end   = ends  [segment]
+            if end - start < 2:
+                continue
+            is_first_row_of_group = is_group_start[start]
+            start_length = 0.0 if is_first_row_of_group else cumulative_length[start]
+            for variable in range(n_variables):
+                start_total           [variable] = 0.0 if is_first_row_of_group else total           [start, variable]
+                start_total_of_squares[variable] = 0.0 if is_first_row_of_group else total_of_squares[start, variable]
+            if statistic == _STATISTIC_Q:
+                total_n = count[end] - count[start]
+                for variable in range(n_variables):
+                    total_sum = total[end, variable] - start_total[variable]
+                    segment_denominator[variable] = (
+                        (total_of_squares[end, variable] - start_total_of_squares[variable])
+                        - total_sum**2.0 / total_n
+                    )
+
+            first_split_index = n_split_indices
+            n_optimal         = 0
+            optimum           = np.nan
+            has_nan           = False
+            # sliding window over the minimum length mask, which is expanded by one row either side
+            mask_previous = is_outside_minimum_length(
+                cumulative_length, start, start_length, end, start, minimum_segment_length
+            )
+            mask_current  = is_outside_minimum_length(
+                cumulative_length, start, start_length, end, start + 1, minimum_segment_length
+            )
+            for split in range(start + 1, end):
+                if split + 1 < end:
+                    mask_next = is_outside_minimum_length(
+                        cumulative_length, start, start_length, end, split + 1, minimum_segment_length
+                    )
+                else:
+                    mask_next = True
+                is_candidate  = mask_previous and mask_current and mask_next
+                mask_previous = mask_current
+                mask_current  = mask_next
+                if not is_candidate:
+                    continue
+
+                n_left  = count[split] - count[start]
+                n_right = count[end  ] - count[split]
+                objective = 0.0
+                for variable in range(n_variables):
+                    sum_left             = total[split, variable] - start_total[variable]
+                    sum_right            = total[end  , variable] - total[split, variable]
+                    sum_of_squares_left  = total_of_squares[split, variable] - start_total_of_squares[variable]
+                    sum_of_squares_right = total_of_squares[end  , variable] - total_of_squares[split, variable]
+                    if statistic == _STATISTIC_Q:
+                        objective += variable_weights[variable] * (1 - (
+                              (sum_of_squares_left  - sum_left  * sum_left  / n_left )
+                            + (sum_of_squares_right - sum_right * sum_right / n_right)
+                        ) / segment_denominator[variable])
+                    else:
+                        n_left_less_one  = n_left  - 1 if n_left  > 1 else np.nan
+                        n_right_less_one = n_right - 1 if n_right > 1 else np.nan
+                        objective += variable_weights[variable] * (
+                                (
+                                    (n_left  * sum_of_squares_left  / (sum_left  * sum_left ) - 1)
+                                    * n_left
+                                    / n_left_less_one
+                                )**0.5
+                            +   (
+                                    (n_right * sum_of_squares_right / (sum_right * sum_right) - 1)
+                                    * n_right
+                                    / n_right_less_one
+                                )**0.5
+                        ) / 2
+                objective = objective / total_weight
+
+                if np.isnan(objective):
+                    # like np.max, a single NaN makes the optimum NaN, and the segment is not split
+                    has_nan = True
+                elif n_optimal == 0 or (objective > optimum if maximize else objective < optimum):
+                    optimum         = objective
+                    n_optimal       = 1
+                    n_split_indices = first_split_index
+                    out_split_indices[n_split_indices] = split
+                    n_split_indices += 1
+                elif objective == optimum:
+                    n_optimal += 1
+                    out_split_indices[n_split_indices] = split
+                    n_split_indices += 1
+
+            if has_nan or n_optimal == 0:
+                n_split_indices = first_split_index
+            else:
+                out_is_split[segment] = True
+        return n_split_indices
+
+    return batched_optimal_bisections_kernel
+
+
+def numba_batched_optimal_bisections(
+        prefix_sums:PrefixSums,
+        starts:npt.NDArray[np.int64],
+        ends:npt.NDArray[np.int64],
+        minimum_segment_length:float,
+        split_statistic:Callable[..., npt.NDArray[np.float64]],
+        goal:Literal["min", "max"] = "max",
+        variable_weights:Optional[npt.NDArray[np.float64]] = None,
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.bool_]]:
+    """
+    A drop-in replacement for `batched_optimal_bisections` backed by a JIT-compiled Numba kernel.
+
+    Results are the same as `batched_optimal_bisections` up to floating point rounding when averaging more than 8
+    variables. Raises `ImportError` if numba is not installed.
+    """
+    if goal not in ("min", "max"):
+        raise ValueError('goal must be one of ["min", "max"]')
+    if prefix_sums.dtype != np.float64:
+        raise ValueError('engine="numba" does not support dtype=np.float32; use engine="numpy"')
+    statistic = _statistic_codes.get(split_statistic)
+    if statistic is None:
+        raise ValueError("split_statistic must be either PrefixSums.q_statistic or PrefixSums.p_statistic")
+
+    kernel = _compile_kernels()
+    starts = np.ascontiguousarray(starts, dtype=np.int64)
+    ends   = np.ascontiguousarray(ends  , dtype=np.int64)
+    out_split_indices = np.empty(int(np.sum(ends - starts)), dtype=np.int64)
+    out_is_split      = np.zeros(len(starts), dtype=np.bool_)
+    if variable_weights is None:
+        # multiplying by one and dividing by the number of variables is exactly the unweighted mean
+        variable_weights = np.ones(prefix_sums.n_variables)
+    variable_weights  = np.ascontiguousarray(variable_weights, dtype=np.float64)
+    n_split_indices   = kernel(
+        prefix_sums.count,
+        prefix_sums.sum,
+        prefix_sums.sum_of_squares,
+        prefix_sums.length,
+        prefix_sums.is_group_start,
+        starts,
+        ends,
+        float(minimum_segment_length),
+        statistic,
+        goal == "max",
+        variable_weights,
+        float(np.sum(variable_weights)),
+        out_split_indices,
+        out_is_split,
+    )
+    return out_split_indices[:n_split_indices], out_is_split
+
+
+@lru_cache(maxsize=None)
+def _compile_partition_kernel():
+    jit = _jit()
+
+    @jit
+    def partition_group_kernel(
+            count, total, total_of_squares, cumulative_length, start, end,
+            minimum_segment_length, maximum_segment_length, is_variance_cost, scale, segment_penalty,
+            out_best_start,
+        ):
+        n_rows      = end - start
+        n_variables = total.shape[1]
+        best_cost   = np.full(n_rows + 1, np.inf)
+        best_cost[0] = 0.0
+        pruned_at   = np.full(n_rows + 1, -1, dtype=np.int64)
+        candidates  = np.empty(n_rows + 1, dtype=np.int64)
+        total_cost  = np.empty(n_rows + 1)
+        candidates[0] = 0
+        n_candidates  = 1
+
+        for e in range(1, n_rows + 1):
+            # discard candidates too far behind `e`, or pruned at a boundary which can now start an allowed segment
+            n_kept = 0
+            for i in range(n_candidates):
+                candidate      = candidates[i]
+                segment_length = np.round(cumulative_length[start + e] - cumulative_length[start + candidate], 10)
+                if segment_length > maximum_segment_length and candidate < e - 1:
+                    continue
+                if pruned_at[candidate] >= 0 and np.round(
+                    cumulative_length[start + e] - cumulative_length[start + pruned_at[candidate]], 10
+                ) >= minimum_segment_length:
+                    continue
+                candidates[n_kept] = candidate
+                n_kept += 1
+            n_candidates = n_kept
+
+            best      = -1
+            best_total = np.inf
+            for i in range(n_candidates):
+                candidate = candidates[i]
+                n         = count[start + e] - count[start + candidate]
+                cost      = 0.0
+                for variable in range(n_variables):
+                    segment_sum = total[start + e, variable] - total[start + candidate, variable]
+                    deviation   = max(
+                          total_of_squares[start + e, variable] - total_of_squares[start + candidate, variable]
+                        - segment_sum**2.0 / n,
+                        0.0,
+                    )
+                    if is_variance_cost:
+                        cost += deviation * scale[variable]
+                    else:
+                        standard_deviation = (deviation / max(n - 1, 1))**0.5
+                        if standard_deviation > 0:
+                            cost += n * standard_deviation * n / abs(segment_sum) * scale[variable]
+                total_cost[i] = best_cost[candidate] + cost
+
+                segment_length = np.round(cumulative_length[start + e] - cumulative_length[start + candidate], 10)
+                is_allowed     = segment_length >= minimum_segment_length or (e == n_rows and candidate == 0)
+                if is_allowed and total_cost[i] < best_total:
+                    best       = i
+                    best_total = total_cost[i]
+            if best < 0 or not np.isfinite(best_total):
+                continue
+            best_cost[e]      = best_total + segment_penalty
+            out_best_start[e] = candidates[best]
+
+            if is_variance_cost:
+                for i in range(n_candidates):
+                    if total_cost[i] >= best_cost[e] and pruned_at[candidates[i]] < 0:
+                        pruned_at[candidates[i]] = e
+            candidates[n_candidates] = e
+            n_candidates += 1
+        return np.isfinite(best_cost[n_rows])
+
+    return partition_group_kernel
+
+
+def numba_partition_group(
+        prefix_sums:PrefixSums,
+        start:int,
+        end:int,
+        minimum_segment_length:float,
+        maximum_segment_length:float,
+        cost:Literal["variance", "cv"],
+        scale:npt.NDArray[np.float64],
+        segment_penalty:float,
+    ) -> Optional[npt.NDArray[np.int64]]:
+    """
+    A drop-in replacement for `homogeneous_segmentation._optimal_partition._partition_group` backed by a
+    JIT-compiled Numba kernel. Raises `ImportError` if numba is not installed.
+    """
+    kernel     = _compile_partition_kernel()
+    best_start = np.zeros(end - start + 1, dtype=np.int64)
+    is_found   = kernel(
+        prefix_sums.count,
+        prefix_sums.sum,
+        prefix_sums.sum_of_squares,
+        prefix_sums.length,
+        start,
+        end,
+        minimum_segment_length,
+        maximum_segment_length,
+        cost == "variance",
+        np.ascontiguousarray(scale, dtype=np.float64),
+        segment_penalty,
+        best_start,
+    )
+    if not is_found:
+        return None
+    return split_boundaries_from_best_start(best_start, start)
+
+
+
+@lru_cache(maxsize=None)
+def _compile_merge_kernel():
+    jit = _jit()
+
+    @jit
+    def segment_cost(count, total, total_of_squares, first, last, is_variance_cost, scale):
+        n          = count[last] - count[first]
+        total_cost = 0.0
+        for variable in range(total.shape[1]):
+            segment_sum = total[last, variable] - total[first, variable]
+            deviation   = max(
+                total_of_squares[last, variable] - total_of_squares[first, variable] - segment_sum * segment_sum / n,
+                0.0,
+            )
+            if is_variance_cost:
+                total_cost += deviation * scale[variable]
+            else:
+                standard_deviation = (deviation / max(n - 1, 1))**0.5
+                if standard_deviation > 0:
+                    if segment_sum != 0:
+                        coefficient_of_variation = n * standard_deviation / abs(segment_sum)
+                    else:
+                        coefficient_of_variation = np.inf
+                    total_cost += n * coefficient_of_variation * scale[variable]
+        return total_cost
+
+    @jit
+    def is_before(heap_cost, heap_pair, i, j):
+        # the same order as `heapq` gives the tuples `(tier, cost, left, right, right_end)`
+        if heap_pair[i, 0] != heap_pair[j, 0]:
+            return heap_pair[i, 0] < heap_pair[j, 0]
+        if heap_cost[i] != heap_cost[j]:
+            return heap_cost[i] < heap_cost[j]
+        for column in range(1, 4):
+            if heap_pair[i, column] != heap_pair[j, column]:
+                return heap_pair[i, column] < heap_pair[j, column]
+        return False
+
+    @jit
+    def swap(heap_cost, heap_pair, i, j):
+        heap_cost[i], heap_cost[j] = heap_cost[j], heap_cost[i]
+        for column in range(4):
+            heap_pair[i, column], heap_pair[j, column] = heap_pair[j, column], heap_pair[i, column]
+
+    @jit
+    def pop(heap_cost, heap_pair, n_heap):
+        n_heap -= 1
+        swap(heap_cost, heap_pair, 0, n_heap)
+        i = 0
+        while True:
+            first = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n_heap and is_before(heap_cost, heap_pair, child, first):
+                    first = child
+            if first == i:
+                return n_heap
+            swap(heap_cost, heap_pair, i, first)
+            i = first
+
+    @jit
+    def push_merge(
+            count, total, total_of_squares, cumulative_length, start,
+            minimum_segment_length, maximum_segment_length, is_variance_cost, scale, segment_penalty,
+            cost_of, heap_cost, heap_pair, n_heap, left, right, right_end,
+        ):
+        # see `merge_of` in `homogeneous_segmentation._agglomerative_merge._merge_group`
+        is_short = (
+               np.round(cumulative_length[start + right    ] - cumulative_length[start + left ], 10)
+            <  minimum_segment_length
+        ) or (
+               np.round(cumulative_length[start + right_end] - cumulative_length[start + right], 10)
+            <  minimum_segment_length
+        )
+        is_within = (
+               np.round(cumulative_length[start + right_end] - cumulative_length[start + left], 10)
+            <= maximum_segment_length
+        )
+        if is_short:
+            tier = 0 if is_within else 1
+        elif is_within:
+            tier = 2
+        else:
+            return n_heap
+        increase = segment_cost(
+            count, total, total_of_squares, start + left, start + right_end, is_variance_cost, scale
+        ) - cost_of[left] - cost_of[right]
+        if np.isnan(increase):
+            increase = np.inf
+        if tier == 2 and not increase < segment_penalty:
+            return n_heap
+
+        i = n_heap
+        heap_cost[i]    = increase
+        heap_pair[i, 0] = tier
+        heap_pair[i, 1] = left
+        heap_pair[i, 2] = right
+        heap_pair[i, 3] = right_end
+        while i > 0 and is_before(heap_cost, heap_pair, i, (i - 1) // 2):
+            swap(heap_cost, heap_pair, i, (i - 1) // 2)
+            i = (i - 1) // 2
+        return n_heap + 1
+
+    @jit
+    def merge_group_kernel(
+            count, total, total_of_squares, cumulative_length, start, end,
+            minimum_segment_length, maximum_segment_length, is_variance_cost, scale, segment_penalty,
+            out_segment_end,
+        ):
+        n_rows   = end - start
+        previous = np.arange(-1, n_rows - 1)
+        cost_of  = np.empty(n_rows)
+        for row in range(n_rows):
+            out_segment_end[row] = row + 1
+            cost_of[row] = segment_cost(
+                count, total, total_of_squares, start + row, start + row + 1, is_variance_cost, scale
+            )
+
+        # a pair is pushed for each initial pair of rows, and at most two more for each merge
+        heap_cost = np.empty(3 * n_rows)
+        heap_pair = np.empty((3 * n_rows, 4), dtype=np.int64)
+        n_heap    = 0
+        for row in range(1, n_rows):
+            n_heap = push_merge(
+                count, total, total_of_squares, cumulative_length, start,
+                minimum_segment_length, maximum_segment_length, is_variance_cost, scale, segment_penalty,
+                cost_of, heap_cost, heap_pair, n_heap, row - 1, row, row + 1,
+            )
+
+        while n_heap > 0:
+            left      = heap_pair[0, 1]
+            right     = heap_pair[0, 2]
+            right_end = heap_pair[0, 3]
+            n_heap    = pop(heap_cost, heap_pair, n_heap)
+            if out_segment_end[left] != right or out_segment_end[right] != right_end:
+                continue
+            out_segment_end[left]  = right_end
+            out_segment_end[right] = -1
+            cost_of[left] = segment_cost(
+                count, total, total_of_squares, start + left, start + right_end, is_variance_cost, scale
+            )
+            if previous[left] >= 0:
+                n_heap = push_merge(
+                    count, total, total_of_squares, cumulative_length, start,
+                    minimum_segment_length, maximum_segment_length, is_variance_cost, scale, segment_penalty,
+                    cost_of, heap_cost, heap_pair, n_heap, previous[left], left, right_end,
+                )
+            if right_end < n_rows:
+                previous[right_end] = left
+                n_heap = push_merge(
+                    count, total, total_of_squares, cumulative_length, start,
+                    minimum_segment_length, maximum_segment_length, is_variance_cost, scale, segment_penalty,
+                    cost_of, heap_cost, heap_pair, n_heap, left, right_end, out_segment_end[right_end],
+                )
+
+    return merge_group_kernel
+
+
+def numba_merge_group(
+        prefix_sums:PrefixSums,
+        start:int,
+        end:int,
+        minimum_segment_length:float,
+        maximum_segment_length:float,
+        cost:Literal["variance", "cv"],
+        scale:npt.NDArray[np.float64],
+        segment_penalty:float,
+    ) -> npt.NDArray[np.int64]:
+    """
+    A drop-in replacement for `homogeneous_segmentation._agglomerative_merge._merge_group` backed by a JIT-compiled
+    Numba kernel. Raises `ImportError` if numba is not installed.
+    """
+    kernel      = _compile_merge_kernel()
+    segment_end = np.empty(end - start, dtype=np.int64)
+    kernel(
+        prefix_sums.count,
+        prefix_sums.sum,
+        prefix_sums.sum_of_squares,
+        prefix_sums.length,
+        start,
+        end,
+        minimum_segment_length,
+        maximum_segment_length,
+        cost == "variance",
+        np.ascontiguousarray(scale, dtype=np.float64),
+        segment_penalty,
+        segment_end,
+    )
+    segment_start = np.flatnonzero(segment_end >= 0)
+    return start + np.append(segment_start, end - start).astype(np.int64)
@@ -1,20 +1,58 @@
 
-import pandas
 import numpy as np
 import numpy.typing as npt
-from typing import Callable, Literal
+from typing import Callable, Literal, Optional, Union
+from ._prefix_sums import PrefixSums
 
 _goal_functions = {
     "min": np.min,
     "max": np.max
 }
 
+_goal_reductions = {
+    "min": np.minimum,
+    "max": np.maximum
+}
+
+def validate_variable_weights(
+        variable_weights:Optional[npt.ArrayLike],
+        n_variables:int,
+    ) -> Optional[npt.NDArray[np.float64]]:
+    """ Converts `variable_weights` to a float64 array, raising `ValueError` if they are not valid weights. """
+    if variable_weights is None:
+        return None
+    variable_weights = np.asarray(variable_weights, dtype=np.float64)
+    if variable_weights.shape != (n_variables,):
+        raise ValueError("variable_weights must have one weight per variable")
+    if np.any(variable_weights < 0) or not np.sum(variable_weights) > 0:
+        raise ValueError("variable_weights must not be negative, and must not all be zero")
+    return variable_weights
+
+
+def weighted_mean_objective(
+        objective:npt.NDArray[np.float64],
+        variable_weights:Optional[npt.NDArray[np.float64]],
+    ) -> npt.NDArray[np.float64]:
+    """
+    Reduces a `(n_candidates, n_variables)` array of split statistics to one objective per candidate split index.
+
+    Without weights this is the mean of the variables, as in the R package. With weights, `objective` is scaled in
+    place and summed along each row, so no further temporary arrays of the same size are allocated.
+    """
+    if variable_weights is None:
+        # qvalue = rowMeans(qvalue)
+        return np.mean(objective, axis=1)
+    objective *= variable_weights / np.sum(variable_weights)
+    return np.sum(objective, axis=1)
+
+
 def optimal_bisections (
-        variables:list[npt.NDArray[np.float64]],
+        variables:Union[list[npt.NDArray[np.float64]], npt.NDArray[np.float64]],
         length:npt.NDArray[np.float64],
         minimum_segment_length:float,
         cumulative_split_statistic:Callable[[npt.NDArray[np.float64]], npt.NDArray[np.float64]],
-        goal:Literal["min", "max"] = "max"
+        goal:Literal["min", "max"] = "max",
+        variable_weights:Optional[npt.ArrayLike] = None,
     ) -> npt.NDArray[np.int64]:
     """
     Bisects the given data at either the minimum and maximum of the
@@ -23,10 +61,15 @@ def optimal_bisections (
     This function enforces a minimum
 
     Args:
-        data (pandas.DataFrame): The DataFrame containing the data to be segmented.
-        var (list[str]): A list of column names in 'data' that are to be used for segmentation.
-        length_column (str): The name of the column that represents the length of each segment.
-        min_length (float): Minimum allowed lengths for each segment.
+        variables: A list of 1-D arrays, one per variable, or a `(n_variables, n_rows)` array. The variables are
+            stacked into a `(n_rows, n_variables)` matrix, and the split statistic of every variable is computed in a
+            single call to `cumulative_split_statistic`.
+        length (npt.NDArray[np.float64]): The length of each row.
+        minimum_segment_length (float): Minimum allowed lengths for each segment.
+        cumulative_split_statistic: Either `cumulative_q` or `cumulative_p`.
+        goal: Whether to split at the `"min"` or `"max"` of the mean split statistic.
+        variable_weights (Optional[npt.ArrayLike]): One weight per variable. The split statistics are averaged with
+            these weights instead of equally.
 
     Returns:
         list[int]: A list of indices in 'data' where the maximum Q values are found, indicating optimal split points.
@@ -73,15 +116,16 @@ def optimal_bisections (
         assert len(np.split(k_mask,np.flatnonzero(k_mask[:-1] != k_mask[1:])+1)) in {1,2}
 
 
-    objective_columns = []
-    for variable in variables:
-        # qvalue[, i] <- _cumq(data.var[[i]])[k - 1]
-        objective_columns.append(
-            cumulative_split_statistic(variable)[k_mask[1:]]
-        )
-    
-    # qvalue = rowMeans(qvalue)
-    mean_objective = np.mean(objective_columns, axis=0)
+    if isinstance(variables, np.ndarray) and variables.ndim == 2:
+        variable_matrix = variables.transpose()
+    else:
+        variable_matrix = np.column_stack(variables)
+    # qvalue[, i] <- _cumq(data.var[[i]])[k - 1]
+    objective = cumulative_split_statistic(variable_matrix)[k_mask[1:]]
+    mean_objective = weighted_mean_objective(
+        objective,
+        None if variable_weights is None else np.asarray(variable_weights, dtype=np.float64),
+    )
     
     # NOTE: This next line appears to retrieve the index of the global maximum (mean) Q value.
     #       It IS possible that it could return a list instead of a scalar
@@ -96,3 +140,133 @@ def optimal_bisections (
         mean_objective == goal_function(mean_objective)
     ) + k[0]
     return maxk
+
+
+def batched_optimal_bisections(
+        prefix_sums:PrefixSums,
+        starts:npt.NDArray[np.int64],
+        ends:npt.NDArray[np.int64],
+        minimum_segment_length:float,
+        split_statistic:Callable[[PrefixSums, npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64]],
+                                 npt.NDArray[np.float64]],
+        goal:Literal["min", "max"] = "max",
+        variable_weights:Optional[npt.NDArray[np.float64]] = None,
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.bool_]]:
+    """
+    Equivalent to calling `optimal_bisections` on each segment `[starts[i], ends[i])`, but every segment is evaluated
+    together in a single pass of array operations.
+
+    The split statistic of every candidate split index of every segment is computed at once from a `PrefixSums`
+    index. The optimum of each segment is then found with a segmented reduction (`np.maximum.reduceat` or
+    `np.minimum.reduceat`), rather than by looping over segments in Python.
+
+    Args:
+        prefix_sums (PrefixSums): Prefix-sum index of the variables and row lengths.
+        starts (npt.NDArray[np.int64]): Index of the first row of each segment to be bisected.
+        ends (npt.NDArray[np.int64]): Index one past the last row of each segment to be bisected.
+        minimum_segment_length (float): Minimum allowed lengths for each segment.
+        split_statistic: Either `PrefixSums.q_statistic` or `PrefixSums.p_statistic`.
+        goal: Whether to split at the `"min"` or `"max"` of the mean split statistic.
+        variable_weights (Optional[npt.NDArray[np.float64]]): One weight per variable, used to average the split
+            statistics of the variables. Defaults to equal weights.
+
+    Returns:
+        A tuple `(split_indices, is_split)`. `split_indices` is a sorted array of the row indices (relative to the
+        whole dataset) at which the segments should be split. `is_split` is a boolean array with one item per segment
+        which is `False` where the segment cannot be split without violating the minimum segment length.
+    """
+    goal_reduction = _goal_reductions.get(goal)
+    if goal_reduction is None:
+        raise ValueError(f"goal must be one of {list(_goal_reductions.keys())}")
+
+    starts         = np.asarray(starts, dtype=np.int64)
+    ends           = np.asarray(ends  , dtype=np.int64)
+    n_segments     = len(starts)
+    segment_n_rows = ends - starts
+
+    # row index, and index of the segment it belongs to, for every row of every segment
+    row_segment = np.repeat(np.arange(n_segments), segment_n_rows)
+    row_offset  = np.arange(len(row_segment)) - np.repeat(np.cumsum(segment_n_rows) - segment_n_rows, segment_n_rows)
+    row         = starts[row_segment] + row_offset
+    row_start   = starts[row_segment]
+    row_end     = ends  [row_segment]
+
+    length_at_row           = prefix_sums.start_value(prefix_sums.length, row)
+    cumulative_length_left  = np.round(
+        prefix_sums.length[row + 1] - prefix_sums.start_value(prefix_sums.length, row_start),
+        decimals = 10,
+    )
+    cumulative_length_right = np.round(prefix_sums.length[row_end] - length_at_row, decimals=10)
+    k_mask = ~ (
+          (cumulative_length_left  <= minimum_segment_length)
+        | (cumulative_length_right <= minimum_segment_length)
+    )
+
+    # expand the false values by one index either side to match the behaviour of the R script.
+    # see `optimal_bisections` above. Rows outside the segment are treated as true.
+    is_first_row      = row_offset == 0
+    is_last_row       = row_offset == segment_n_rows[row_segment] - 1
+    k_mask_previous   = np.roll(k_mask,  1) | is_first_row
+    k_mask_next       = np.roll(k_mask, -1) | is_last_row
+    # the first row of a segment can never be a split index
+    candidate_mask    = k_mask & k_mask_previous & k_mask_next & ~is_first_row
+
+    candidate_row     = row        [candidate_mask]
+    candidate_segment = row_segment[candidate_mask]
+    is_split          = np.zeros(n_segments, dtype=np.bool_)
+    if len(candidate_row) == 0:
+        return np.array([], dtype=np.int64), is_split
+
+    # qvalue = rowMeans(qvalue)
+    mean_objective = weighted_mean_objective(
+        split_statistic(prefix_sums, candidate_row, starts[candidate_segment], ends[candidate_segment]),
+        variable_weights,
+    )
+
+    # candidates are ordered by segment, so each segment's candidates form one contiguous run
+    _, first_candidate = np.unique(candidate_segment, return_index=True)
+    segment_optimum = goal_reduction.reduceat(mean_objective, first_candidate)
+    run_length      = np.diff(np.append(first_candidate, len(candidate_segment)))
+    with np.errstate(invalid='ignore'):
+        # a NaN optimum matches nothing, so the segment is not split
+        is_optimal  = mean_objective == np.repeat(segment_optimum, run_length)
+
+    split_indices = candidate_row[is_optimal]
+    is_split[candidate_segment[is_optimal]] = True
+    return split_indices, is_split
+
+
+def optimal_bisections_of_range(
+        prefix_sums:PrefixSums,
+        start:int,
+        end:int,
+        minimum_segment_length:float,
+        split_statistic:Callable[[PrefixSums, npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64]],
+                                 npt.NDArray[np.float64]],
+        goal:Literal["min", "max"] = "max"
+    ) -> npt.NDArray[np.int64]:
+    """
+    Equivalent to `optimal_bisections` applied to the rows `[start, end)`, but answered from a `PrefixSums` index
+    built once for the whole dataset instead of re-computing cumulative sums of the rows.
+
+    Args:
+        prefix_sums (PrefixSums): Prefix-sum index of the variables and row lengths.
+        start (int): Index of the first row of the segment to be bisected.
+        end (int): Index one past the last row of the segment to be bisected.
+        minimum_segment_length (float): Minimum allowed lengths for each segment.
+        split_statistic: Either `PrefixSums.q_statistic` or `PrefixSums.p_statistic`.
+        goal: Whether to split at the `"min"` or `"max"` of the mean split statistic.
+
+    Returns:
+        The indices of the rows (relative to the whole dataset, not to `start`) at which the segment should be split.
+        Empty if the segment cannot be split without violating the minimum segment length.
+    """
+    split_indices, _ = batched_optimal_bisections(
+        prefix_sums            = prefix_sums,
+        starts                 = np.array([start]),
+        ends                   = np.array([end]),
+        minimum_segment_length = minimum_segment_length,
+        split_statistic        = split_statistic,
+        goal                   = goal,
+    )
+    return split_indices
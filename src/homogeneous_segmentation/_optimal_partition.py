@@ -0,0 +1,277 @@
+"""
+This is a private module containing the optimal partition engine, an alternative to recursive bisection which finds
+the partition of each group with the least total cost subject to the allowed segment length range.
+
+The SHS and MCV methods split each oversized segment once at the best split index and never revisit that decision,
+so their segmentation is not in general the best one available. Here the best partition of rows `[0, e)` is found
+for every `e` by dynamic programming over the prefix sums,
+
+    F[e] = min(F[t] + cost(t, e) + segment_penalty) over every t such that rows [t, e) are an allowed segment,
+
+and the best partition of the group is recovered from the `t` chosen for each `e`. The cost is the weighted mean over
+variables of either
+
+- `"variance"`; the sum of squared deviations of the segment from its mean, divided by that of the whole group. The
+  total cost of a partition is then `1 - Q` where `Q` is the Q-statistic of the partition, as in the SHS method.
+- `"cv"`; the coefficient of variation of the segment, weighted by its share of the rows of the group. The total cost
+  of a partition is then the row weighted mean coefficient of variation of its segments, as in the MCV method.
+
+A candidate `t` which is too far behind `e` to ever start an allowed segment again is discarded. The variance cost
+can never increase when a segment is split, so for that cost the search is also pruned as in the PELT method of
+Killick, Fearnhead and Eckley (2012); once `F[t] + cost(t, e) >= F[e]`, `t` can never do better than `e` and is
+discarded as soon as rows `[e, ...)` can form an allowed segment. A coefficient of variation can increase when a
+segment is split, so the `"cv"` cost is not pruned and every candidate within the maximum segment length is searched.
+
+Without a penalty, splitting a segment never increases the variance cost, so the best partition is mostly segments of
+the minimum length. The default penalty of a group of `n` rows is therefore the BIC penalty for a change in mean,
+`2 * sigma**2 * log(n)` (as in the `changepoint` R package), in the units of the cost; `sigma**2` is the variance of
+the noise of each variable, estimated from the median absolute difference of adjacent rows so that the changes in
+level being searched for do not inflate it. For the `"cv"` cost the coefficient of variation of the noise, `sigma`
+over the absolute mean of the group, takes the place of `sigma**2`. Both are scaled as the costs are, so the default
+does not depend on the units of the variables.
+
+The `"numpy"` engine makes one interpreted step per row of a group, each a few NumPy operations over the remaining
+candidates. The candidates of a row lie within about the maximum segment length behind it, so with a maximum of `m`
+rows a group takes `O(n m)` time, but the interpreter overhead of about 60 microseconds per row dominates; 100,000
+rows with `m = 30` take about 6 seconds, against 0.07 with `"numba"`. The candidates of a row depend on the best cost
+of every row before it, so the steps cannot be vectorised across rows. The `"numba"` engine runs the same search
+compiled, and is the one to use on large networks.
+"""
+from typing import Literal, Optional
+import numpy as np
+import numpy.typing as npt
+from ._prefix_sums import PrefixSums
+from ._optimal_bisections import validate_variable_weights
+
+_costs = ("variance", "cv")
+
+
+def variable_scale(
+        prefix_sums      : PrefixSums,
+        start            : int,
+        end              : int,
+        cost             : Literal["variance", "cv"],
+        variable_weights : Optional[npt.NDArray[np.float64]],
+    ) -> npt.NDArray[np.float64]:
+    """
+    The factor each variable's cost is multiplied by, so that the cost of a partition of rows `[start, end)` is the
+    weighted mean described above. A variable which is constant over the whole group has a scale of zero.
+    """
+    n_variables = prefix_sums.n_variables
+    if variable_weights is None:
+        variable_weights = np.ones(n_variables)
+    scale = variable_weights / np.sum(variable_weights)
+    if cost == "variance":
+        total_sum            = prefix_sums.sum[end] - prefix_sums.sum[start]
+        total_sum_of_squares = prefix_sums.sum_of_squares[end] - prefix_sums.sum_of_squares[start]
+        total_deviation      = total_sum_of_squares - total_sum**2.0 / (end - start)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scale = np.where(total_deviation > 0, scale / total_deviation, 0.0)
+    else:
+        scale = scale / (end - start)
+    return scale
+
+
+def default_segment_penalty(
+        values : npt.NDArray[np.float64],
+        cost   : Literal["variance", "cv"],
+        scale  : npt.NDArray[np.float64],
+    ) -> float:
+    """ The BIC-style penalty of a group with rows `values`, as described in the module docstring. """
+    n_rows = len(values)
+    if n_rows < 3:
+        return 0.0
+    # the MAD of the differences of adjacent rows is sqrt(2) times that of the rows, and 0.6745 times their sigma
+    difference     = np.diff(values, axis=0)
+    noise_variance = (
+        np.median(np.abs(difference - np.median(difference, axis=0)), axis=0) / 0.6745
+    )**2.0 / 2.0
+    if cost == "variance":
+        noise = noise_variance
+    else:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean  = np.abs(np.mean(values, axis=0))
+            noise = np.where(mean > 0, np.sqrt(noise_variance) / mean, 0.0)
+    return float(2.0 * np.log(n_rows) * (noise @ scale))
+
+
+def segment_costs(
+        prefix_sums : PrefixSums,
+        starts      : npt.NDArray[np.int64],
+        end         : int,
+        cost        : Literal["variance", "cv"],
+        scale       : npt.NDArray[np.float64],
+    ) -> npt.NDArray[np.float64]:
+    """ The cost of each segment `[starts[j], end)`. """
+    n                  = (end - starts)[:, np.newaxis]
+    segment_sum        = prefix_sums.sum[end] - prefix_sums.sum[starts]
+    deviation          = np.maximum(
+        prefix_sums.sum_of_squares[end] - prefix_sums.sum_of_squares[starts] - segment_sum**2.0 / n,
+        0.0,
+    )
+    if cost == "variance":
+        return deviation @ scale
+    # sample standard deviation over the absolute mean, which is zero for a constant segment or a single row, and
+    # infinite for a segment with a mean of zero
+    with np.errstate(invalid='ignore', divide='ignore'):
+        standard_deviation       = np.sqrt(deviation / np.maximum(n - 1, 1))
+        coefficient_of_variation = np.where(
+            standard_deviation > 0,
+            standard_deviation * n / np.abs(segment_sum),
+            0.0,
+        )
+    return n[:, 0] * (coefficient_of_variation @ scale)
+
+
+def split_boundaries_from_best_start(best_start:npt.NDArray[np.int64], start:int) -> npt.NDArray[np.int64]:
+    """ Follows the start of the last segment of each best partition back from the end of the group. """
+    split_boundaries = [len(best_start) - 1]
+    while split_boundaries[-1] > 0:
+        split_boundaries.append(best_start[split_boundaries[-1]])
+    return start + np.array(split_boundaries[::-1], dtype=np.int64)
+
+
+def _partition_group(
+        prefix_sums            : PrefixSums,
+        start                  : int,
+        end                    : int,
+        minimum_segment_length : float,
+        maximum_segment_length : float,
+        cost                   : Literal["variance", "cv"],
+        scale                  : npt.NDArray[np.float64],
+        segment_penalty        : float,
+    ) -> Optional[npt.NDArray[np.int64]]:
+    """
+    The optimal split boundaries of rows `[start, end)`, or `None` if no partition satisfies the allowed segment
+    length range. A segment of a single row is allowed to be longer than the maximum, and the whole group is allowed
+    to be shorter than the minimum.
+    """
+    n_rows     = end - start
+    length     = prefix_sums.length
+    best_cost  = np.full(n_rows + 1, np.inf)
+    best_start = np.zeros(n_rows + 1, dtype=np.int64)
+    best_cost[0] = 0.0
+    # the boundary at which each candidate was pruned, or -1
+    pruned_at  = np.full(n_rows + 1, -1, dtype=np.int64)
+    candidates = np.array([0], dtype=np.int64)
+    is_pruned  = cost == "variance"
+
+    for e in range(1, n_rows + 1):
+        segment_length = np.round(length[start + e] - length[start + candidates], decimals=10)
+        # a candidate is discarded if it is too far behind `e` to start an allowed segment, or if it was pruned at a
+        # boundary which can now start an allowed segment
+        is_discarded = (segment_length > maximum_segment_length) & (candidates < e - 1)
+        pruned_at_candidate = pruned_at[candidates]
+        if np.any(pruned_at_candidate >= 0):
+            is_discarded |= (pruned_at_candidate >= 0) & (
+                np.round(length[start + e] - length[start + pruned_at_candidate], decimals=10)
+                >= minimum_segment_length
+            )
+        if np.any(is_discarded):
+            candidates     = candidates    [~is_discarded]
+            segment_length = segment_length[~is_discarded]
+
+        total_cost = best_cost[candidates] + segment_costs(prefix_sums, start + candidates, start + e, cost, scale)
+        is_allowed = segment_length >= minimum_segment_length
+        if e == n_rows:
+            is_allowed |= candidates == 0
+        if not np.any(is_allowed):
+            continue
+        best = np.argmin(np.where(is_allowed, total_cost, np.inf))
+        if not np.isfinite(total_cost[best]):
+            continue
+        best_cost [e] = total_cost[best] + segment_penalty
+        best_start[e] = candidates[best]
+
+        if is_pruned:
+            is_dominated = (total_cost >= best_cost[e]) & (pruned_at[candidates] < 0)
+            pruned_at[candidates[is_dominated]] = e
+        candidates = np.append(candidates, e)
+
+    if not np.isfinite(best_cost[n_rows]):
+        return None
+    return split_boundaries_from_best_start(best_start, start)
+
+
+def optimal_partition(
+        values                       : npt.NDArray[np.float64],
+        length                       : npt.NDArray[np.float64],
+        allowed_segment_length_range : tuple[float, float],
+        cost                         : Literal["variance", "cv"],
+        initial_split_boundaries     : Optional[npt.NDArray[np.int64]] = None,
+        engine                       : Literal["numpy", "numba"]       = "numpy",
+        variable_weights             : Optional[npt.ArrayLike]         = None,
+        segment_penalty              : Optional[float]                 = None,
+    ) -> npt.NDArray[np.int64]:
+    """
+    Finds the partition of each initial segment with the least total cost, subject to the allowed segment length
+    range. If no partition of an initial segment satisfies the maximum segment length, the maximum is ignored for
+    that segment.
+
+    Args:
+        values (npt.NDArray[np.float64]): A `(n_rows, n_variables)` array of the segmentation variables, sorted by
+            the linear measure.
+        length (npt.NDArray[np.float64]): A `(n_rows,)` array containing the length of each row.
+        allowed_segment_length_range (tuple[float, float]): Minimum and maximum allowed segment lengths.
+        cost: `"variance"` or `"cv"`, as described in the module docstring.
+        initial_split_boundaries (Optional[npt.NDArray[np.int64]]): Boundaries between groups, such as roads or
+            carriageways, which are partitioned independently. Defaults to `[0, n_rows]`.
+        engine: `"numpy"` evaluates the candidates of each boundary with NumPy, one interpreted step per row; see
+            above. `"numba"` runs the whole search in a JIT-compiled kernel, which is much faster and requires the
+            optional dependency numba.
+        variable_weights (Optional[npt.ArrayLike]): One weight per variable. The costs of the variables are
+            averaged with these weights instead of equally.
+        segment_penalty (Optional[float]): Added to the cost of every segment. Defaults to the BIC-style penalty of
+            each group described above. `0.0` gives segments close to the minimum segment length for the variance
+            cost.
+
+    Returns:
+        A sorted array of split boundaries starting with `0` and ending with `n_rows`.
+    """
+    if cost not in _costs:
+        raise ValueError(f"cost must be one of {list(_costs)}")
+    if engine not in ("numpy", "numba"):
+        raise ValueError('engine must be one of ["numpy", "numba"]')
+    min_allowed_length, max_allowed_length = allowed_segment_length_range
+    n_rows = len(length)
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+    variable_weights = validate_variable_weights(variable_weights, values.shape[1])
+    if initial_split_boundaries is None:
+        group_boundaries = np.array([0, n_rows], dtype=np.int64)
+    else:
+        group_boundaries = np.asarray(initial_split_boundaries, dtype=np.int64)
+
+    if engine == "numba":
+        from ._numba_kernels import numba_partition_group  # pylint: disable=import-outside-toplevel
+        partition_group = numba_partition_group
+    else:
+        partition_group = _partition_group
+
+    split_boundaries = [group_boundaries]
+    for start, end in zip(group_boundaries[:-1], group_boundaries[1:]):
+        if end - start < 2:
+            continue
+        # each group has prefix sums of its own, so that it is partitioned the same way whatever else is in the data
+        prefix_sums = PrefixSums(values[start:end], length[start:end])
+        scale       = variable_scale(prefix_sums, 0, end - start, cost, variable_weights)
+        if segment_penalty is None:
+            group_segment_penalty = default_segment_penalty(values[start:end], cost, scale)
+        else:
+            group_segment_penalty = float(segment_penalty)
+        for maximum_segment_length in (max_allowed_length, np.inf):
+            group_split_boundaries = partition_group(
+                prefix_sums            = prefix_sums,
+                start                  = 0,
+                end                    = int(end - start),
+                minimum_segment_length = float(min_allowed_length),
+                maximum_segment_length = float(maximum_segment_length),
+                cost                   = cost,
+                scale                  = scale,
+                segment_penalty        = group_segment_penalty,
+            )
+            if group_split_boundaries is not None:
+                split_boundaries.append(start + group_split_boundaries)
+                break
+    return np.unique(np.concatenate(split_boundaries))
@@ -0,0 +1,301 @@
+"""
+This is a private module containing parallel execution of `bisection_tree`, either in a pool of worker processes or in
+a pool of threads of this process.
+
+With processes, groups of rows such as roads and carriageways are spread over the workers. The sorted variable matrix
+and row lengths are copied into shared memory once. Worker processes attach to the shared memory instead of receiving
+pickled per-group DataFrames or arrays.
+
+With threads, nothing is copied or pickled. A single `bisection_tree` runs in the calling thread, and the segments of
+each level of the split tree are divided between the threads. The Numba kernel releases the GIL for the whole of each
+call, so the threads can run in parallel; the NumPy engine releases it only inside each array operation. Release of the
+GIL is tested, but the speed-up on several cores has not been measured: the threads backend has only been timed on a
+single CPU, where it is no faster than one thread. `benchmarks/run.py --threads` times it for each number of threads.
+"""
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Literal, Optional
+import numpy as np
+import numpy.typing as npt
+from ._recursive_bisection import bisection_engine, bisection_tree
+from ._profiling import IterationStats, SegmentationProfile
+
+# Groups are packed into roughly this many tasks per worker, so that the pool stays busy without paying
+# the scheduling overhead of one task per (possibly tiny) group.
+_TASKS_PER_WORKER = 4
+
+# A level of the split tree with fewer rows than this per thread is bisected in the calling thread, because handing it
+# to the pool would cost more than it saves.
+_MIN_ROWS_PER_THREAD = 20_000
+
+_SharedArrayDescriptor = tuple[str, tuple[int, ...], str]
+
+
+def _to_shared_memory(array:npt.NDArray) -> tuple[shared_memory.SharedMemory, _SharedArrayDescriptor]:
+    array = np.ascontiguousarray(array)
+    shm   = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _bisect_shared_memory_task(
+        values_descriptor            : _SharedArrayDescriptor,
+        length_descriptor            : _SharedArrayDescriptor,
+        initial_split_boundaries     : npt.NDArray[np.int64],
+        allowed_segment_length_range : tuple[float, float],
+        split_statistic              : Callable[..., npt.NDArray[np.float64]],
+        goal                         : Literal["min", "max"],
+        engine                       : Literal["numpy", "numba"],
+        variable_weights             : Optional[npt.ArrayLike],
+        trace_memory                 : Optional[bool],
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64], list[IterationStats]]:
+    """
+    Runs in a worker process. Attaches to the shared variable matrix and row lengths, and runs `bisection_tree` on
+    the contiguous run of groups described by `initial_split_boundaries`. If `trace_memory` is not `None` the run is
+    profiled, and the stats of each level are returned to be recorded by the parent process.
+    """
+    values_shm = shared_memory.SharedMemory(name=values_descriptor[0])
+    length_shm = shared_memory.SharedMemory(name=length_descriptor[0])
+    profiler   = None if trace_memory is None else SegmentationProfile(trace_memory=trace_memory)
+    try:
+        start, end = initial_split_boundaries[0], initial_split_boundaries[-1]
+        values     = np.ndarray(values_descriptor[1], dtype=values_descriptor[2], buffer=values_shm.buf)
+        length     = np.ndarray(length_descriptor[1], dtype=length_descriptor[2], buffer=length_shm.buf)
+        split_boundaries, parent_length = bisection_tree(
+            values                       = values[start:end],
+            length                       = length[start:end],
+            allowed_segment_length_range = allowed_segment_length_range,
+            split_statistic              = split_statistic,
+            goal                         = goal,
+            initial_split_boundaries     = initial_split_boundaries - start,
+            engine                       = engine,
+            variable_weights             = variable_weights,
+            profiler                     = profiler,
+        )
+        # views into the shared memory must be released before it can be closed
+        del values, length
+        return split_boundaries + start, parent_length, [] if profiler is None else profiler.iterations
+    finally:
+        values_shm.close()
+        length_shm.close()
+
+
+def _group_tasks(group_boundaries:npt.NDArray[np.int64], n_tasks:int) -> list[npt.NDArray[np.int64]]:
+    """
+    Packs contiguous runs of groups into tasks of at least `n_rows / n_tasks` rows. Groups larger than that are
+    given a task of their own. Tasks are returned largest first, so that the largest roads do not start last and
+    leave a long tail.
+    """
+    n_rows      = group_boundaries[-1] - group_boundaries[0]
+    target_rows = max(1, -(-n_rows // max(1, n_tasks)))
+    tasks       = []
+    task_start  = 0
+    for i in range(1, len(group_boundaries)):
+        group_n_rows = group_boundaries[i] - group_boundaries[i - 1]
+        if group_n_rows >= target_rows and task_start < i - 1:
+            # flush the small groups accumulated so far, then give the large group its own task
+            tasks.append(group_boundaries[task_start : i])
+            task_start = i - 1
+        if group_boundaries[i] - group_boundaries[task_start] >= target_rows or i == len(group_boundaries) - 1:
+            tasks.append(group_boundaries[task_start : i + 1])
+            task_start = i
+    return sorted(tasks, key=lambda task: task[-1] - task[0], reverse=True)
+
+
+def _balanced_chunks(starts:npt.NDArray[np.int64], ends:npt.NDArray[np.int64], n_chunks:int) -> list[slice]:
+    """ Divides the segments into at most `n_chunks` contiguous runs of about the same number of rows. """
+    cumulative_n_rows = np.cumsum(ends - starts)
+    cuts = np.searchsorted(
+        cumulative_n_rows,
+        cumulative_n_rows[-1] * np.arange(1, n_chunks) / n_chunks,
+        side = "right",
+    )
+    edges = np.unique(np.concatenate([[0], cuts, [len(starts)]]))
+    return [slice(chunk_start, chunk_end) for chunk_start, chunk_end in zip(edges[:-1], edges[1:])]
+
+
+def threaded_bisections(bisect:Callable, executor:Executor, n_threads:int) -> Callable:
+    """
+    Wraps a function with the signature of `batched_optimal_bisections` so that the segments it is given are divided
+    between the threads of `executor`. Every thread reads the same `PrefixSums`. The results are concatenated in
+    segment order, so they are the same as those of a single call to `bisect`.
+    """
+    def bisect_in_threads(prefix_sums, starts, ends, **kwargs):
+        n_chunks = min(n_threads, len(starts), int(np.sum(ends - starts)) // _MIN_ROWS_PER_THREAD)
+        if n_chunks <= 1:
+            return bisect(prefix_sums=prefix_sums, starts=starts, ends=ends, **kwargs)
+        futures = [
+            executor.submit(bisect, prefix_sums=prefix_sums, starts=starts[chunk], ends=ends[chunk], **kwargs)
+            for chunk in _balanced_chunks(starts, ends, n_chunks)
+        ]
+        results = [future.result() for future in futures]
+        return (
+            np.concatenate([split_indices for split_indices, _ in results]),
+            np.concatenate([is_split for _, is_split in results]),
+        )
+    return bisect_in_threads
+
+
+def parallel_bisection_tree(
+        values                       : npt.NDArray[np.float64],
+        length                       : npt.NDArray[np.float64],
+        allowed_segment_length_range : tuple[float, float],
+        split_statistic              : Callable[..., npt.NDArray[np.float64]],
+        goal                         : Literal["min", "max"],
+        initial_split_boundaries     : npt.NDArray[np.int64],
+        n_jobs                       : Optional[int]                   = None,
+        executor                     : Optional[Executor]              = None,
+        engine                       : Literal["numpy", "numba"]       = "numpy",
+        variable_weights             : Optional[npt.ArrayLike]         = None,
+        profiler                     : Optional[SegmentationProfile]   = None,
+        backend                      : Literal["processes", "threads"] = "processes",
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+    """
+    Equivalent to `bisection_tree`, but the groups described by `initial_split_boundaries` are spread over a pool of
+    worker processes, or the segments of each level of the split tree are spread over a pool of threads.
+
+    Args:
+        n_jobs (Optional[int]): Number of worker processes or threads. `-1` uses every CPU. If both `n_jobs` and
+            `executor` are `None`, or `n_jobs` is `1`, the groups are segmented in this thread by `bisection_tree`.
+        executor (Optional[Executor]): An existing executor to submit work to, such as a long-lived
+            `ProcessPoolExecutor`. It is not shut down afterwards. A `ThreadPoolExecutor` selects the threads
+            backend.
+        profiler (Optional[SegmentationProfile]): With processes, each worker profiles its own task, and the stats of
+            every level are recorded in `profiler` once the task is finished. With threads, each level is recorded as
+            it is in `bisection_tree`.
+        backend (Literal["processes", "threads"]): `"threads"` segments every group in this process, dividing the
+            segments of each level of the split tree between `n_jobs` threads. Nothing is pickled or copied, which
+            suits a long-lived process such as a web worker. Use it with `engine="numba"`, whose kernel releases the
+            GIL. How well it scales across cores has not been measured. Defaults to `"processes"`.
+
+    See `bisection_tree` for the remaining arguments and the return value.
+    """
+    if backend not in ("processes", "threads"):
+        raise ValueError('backend must be one of ["processes", "threads"]')
+    if isinstance(executor, ThreadPoolExecutor):
+        backend = "threads"
+    if n_jobs is not None and n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+
+    if executor is None and (n_jobs is None or n_jobs == 1):
+        return bisection_tree(
+            values                       = values,
+            length                       = length,
+            allowed_segment_length_range = allowed_segment_length_range,
+            split_statistic              = split_statistic,
+            goal                         = goal,
+            initial_split_boundaries     = initial_split_boundaries,
+            engine                       = engine,
+            variable_weights             = variable_weights,
+            profiler                     = profiler,
+        )
+
+    if backend == "threads":
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=n_jobs)
+        try:
+            return bisection_tree(
+                values                       = values,
+                length                       = length,
+                allowed_segment_length_range = allowed_segment_length_range,
+                split_statistic              = split_statistic,
+                goal                         = goal,
+                initial_split_boundaries     = initial_split_boundaries,
+                engine                       = threaded_bisections(
+                    bisection_engine(engine), executor, n_jobs or os.cpu_count() or 1
+                ),
+                variable_weights             = variable_weights,
+                profiler                     = profiler,
+            )
+        finally:
+            if own_executor:
+                executor.shutdown()
+
+    initial_split_boundaries = np.asarray(initial_split_boundaries, dtype=np.int64)
+    tasks = _group_tasks(initial_split_boundaries, n_tasks=(n_jobs or os.cpu_count() or 1) * _TASKS_PER_WORKER)
+
+    values = np.asarray(values)
+    values_shm, values_descriptor = _to_shared_memory(
+        np.asarray(values, dtype=np.float32 if values.dtype == np.float32 else np.float64)
+    )
+    length_shm, length_descriptor = _to_shared_memory(np.asarray(length, dtype=np.float64))
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=n_jobs)
+    try:
+        futures = [
+            executor.submit(
+                _bisect_shared_memory_task,
+                values_descriptor,
+                length_descriptor,
+                task,
+                allowed_segment_length_range,
+                split_statistic,
+                goal,
+                engine,
+                variable_weights,
+                None if profiler is None else profiler.trace_memory,
+            )
+            for task in tasks
+        ]
+        results = [future.result() for future in futures]
+    finally:
+        if own_executor:
+            executor.shutdown()
+        values_shm.close()
+        values_shm.unlink()
+        length_shm.close()
+        length_shm.unlink()
+
+    if profiler is not None:
+        for _, _, iterations in results:
+            for stats in iterations:
+                profiler.record_iteration(stats)
+
+    # neighbouring tasks share the group boundary between them
+    split_boundaries, unique_index = np.unique(
+        np.concatenate([initial_split_boundaries, *(split_boundaries for split_boundaries, _, _ in results)]),
+        return_index = True,
+    )
+    parent_length = np.concatenate([
+        np.full(len(initial_split_boundaries), np.inf),
+        *(parent_length for _, parent_length, _ in results),
+    ])[unique_index]
+    return split_boundaries, parent_length
+
+
+def parallel_recursive_bisection(
+        values                       : npt.NDArray[np.float64],
+        length                       : npt.NDArray[np.float64],
+        allowed_segment_length_range : tuple[float, float],
+        split_statistic              : Callable[..., npt.NDArray[np.float64]],
+        goal                         : Literal["min", "max"],
+        initial_split_boundaries     : npt.NDArray[np.int64],
+        n_jobs                       : Optional[int]                   = None,
+        executor                     : Optional[Executor]              = None,
+        engine                       : Literal["numpy", "numba"]       = "numpy",
+        variable_weights             : Optional[npt.ArrayLike]         = None,
+        profiler                     : Optional[SegmentationProfile]   = None,
+        backend                      : Literal["processes", "threads"] = "processes",
+    ) -> npt.NDArray[np.int64]:
+    """
+    Equivalent to `recursive_bisection`, but the groups described by `initial_split_boundaries` are spread over a
+    pool of worker processes or threads. See `parallel_bisection_tree`.
+    """
+    split_boundaries, _ = parallel_bisection_tree(
+        values                       = values,
+        length                       = length,
+        allowed_segment_length_range = allowed_segment_length_range,
+        split_statistic              = split_statistic,
+        goal                         = goal,
+        initial_split_boundaries     = initial_split_boundaries,
+        n_jobs                       = n_jobs,
+        executor                     = executor,
+        engine                       = engine,
+        variable_weights             = variable_weights,
+        profiler                     = profiler,
+        backend                      = backend,
+    )
+    return split_boundaries
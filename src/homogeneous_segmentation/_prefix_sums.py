@@ -0,0 +1,367 @@
+"""
+This is a private module containing a prefix-sum index over the rows of the data being segmented.
+
+The index is built once per segmentation run. The cumulative `Q statistic` and `P statistic` for any contiguous
+`[start, end)` sub-range of rows can then be answered by differences of the prefix sums, without re-scanning the rows
+each time a sub-segment is bisected.
+
+The sums restart from zero at the first row of every group, such as a road or carriageway, and are accumulated in the
+same order whatever comes before the group. The statistics of a group are therefore rounded in exactly the same way
+whether it is segmented alone or as part of a larger network, in a cache miss, a worker's chunk or after an update.
+
+In float32 mode, each variable is also shifted by the mean of its group, and each squared deviation by the mean
+squared deviation of its group, so that both sums return close to zero at the end of the group instead of growing
+along it. Differences of the sums over a short segment then lose only as much precision as the deviations within the
+group, rather than the size of its values. The sums are accumulated in float64 in blocks of rows, and each is rounded
+to float32 only once.
+"""
+from typing import Iterator, Optional, Union
+import numpy as np
+import numpy.typing as npt
+
+# rows accumulated in float64 at a time, bounding the temporary float64 arrays
+_BLOCK_ROWS = 1 << 16
+
+
+def _group_blocks(
+        group_start : npt.NDArray[np.int64],
+        group_end   : npt.NDArray[np.int64],
+    ) -> Iterator[tuple[npt.NDArray[np.int64], Union[slice, npt.NDArray[np.int64]], Optional[npt.NDArray[np.bool_]]]]:
+    """
+    Divides the rows `[group_start[g], group_end[g])` of each group `g` into blocks of about `_BLOCK_ROWS` rows, so
+    that the running sums of many short groups are found by a single `np.cumsum` along the rows of a block.
+
+    Groups longer than `_BLOCK_ROWS` are yielded alone, in consecutive blocks. Shorter groups are stacked with groups
+    of similar length, and padded to the same number of rows.
+
+    Yields:
+        Tuples `(groups, rows, is_row)`. For a block of a long group, `rows` is a slice of its rows and `is_row` is
+        `None`. Otherwise `rows` is a `(len(groups), n)` array of the rows of each group in order, and `is_row` is
+        `False` where `rows` is padding past the end of a group.
+    """
+    n_rows  = group_end - group_start
+    is_long = n_rows > _BLOCK_ROWS
+    for group in np.flatnonzero(is_long):
+        for first in range(group_start[group], group_end[group], _BLOCK_ROWS):
+            yield np.array([group]), slice(first, min(first + _BLOCK_ROWS, group_end[group])), None
+    # each group is padded to less than twice its number of rows
+    short          = np.flatnonzero(~is_long & (n_rows > 0))
+    width_exponent = np.ceil(np.log2(n_rows[short])).astype(np.int64)
+    for exponent in np.unique(width_exponent):
+        groups_of_width = short[width_exponent == exponent]
+        offset          = np.arange(1 << exponent)
+        n_per_block     = max(_BLOCK_ROWS >> exponent, 1)
+        for first in range(0, len(groups_of_width), n_per_block):
+            groups = groups_of_width[first : first + n_per_block]
+            is_row = offset < n_rows[groups][:, np.newaxis]
+            # padding repeats the last row of its group
+            rows   = np.minimum(group_start[groups][:, np.newaxis] + offset, group_end[groups][:, np.newaxis] - 1)
+            yield groups, rows, is_row
+
+
+def _read_rows(array:npt.NDArray, rows:Union[slice, npt.NDArray[np.int64]]) -> npt.NDArray[np.float64]:
+    """ A new float64 array of the `rows` of a block from `_group_blocks`, shaped `(n_groups, n, n_columns)`. """
+    if isinstance(rows, slice):
+        return array[np.newaxis, rows].astype(np.float64)
+    return np.take(array, rows, axis=0).astype(np.float64, copy=False)
+
+
+class PrefixSums:
+    """ Cumulative counts, sums, sums of squares and lengths of every row of the data being segmented.
+
+    Each array has one more row than the data. The sums and lengths restart at the first row of every group; row `i`
+    holds the total over the rows of its group before `i`, and the row after the last row of a group holds the total
+    of the whole group. The totals over any range of rows `[start, end)` within a group are therefore
+    `array[end] - array[start]`, except that `array[start]` is taken as zero where `start` is the first row of a group;
+    see `start_value`. The counts do not restart, since their differences are exact.
+
+    In float32 mode `sum` and `sum_of_squares` are the sums of the deviations from the mean of each group, and of the
+    squared deviations less the mean squared deviation of each group; see the module docstring. The split statistics
+    account for this, but the arrays cannot be used directly.
+
+    Args:
+        values (npt.NDArray[np.float64]): A `(n_rows, n_variables)` array of the segmentation variables. A 1-D array
+            is treated as a single variable.
+        length (npt.NDArray[np.float64]): A `(n_rows,)` array containing the length of each row.
+        dtype (npt.DTypeLike): `np.float64`, or `np.float32` to halve the memory used by the sums and by the split
+            statistics computed from them. The row counts (int64) and cumulative lengths (float64) are unchanged.
+        group_boundaries (Optional[npt.NDArray[np.int64]]): Boundaries between groups which no segment spans, such as
+            roads. The sums restart at each boundary, and in float32 mode each group is shifted by its own mean.
+            Defaults to `[0, n_rows]`.
+    """
+
+    def __init__(
+            self,
+            values           : npt.NDArray[np.float64],
+            length           : npt.NDArray[np.float64],
+            dtype            : npt.DTypeLike                   = np.float64,
+            group_boundaries : Optional[npt.NDArray[np.int64]] = None,
+        ):
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float64, np.float32):
+            raise ValueError("dtype must be np.float64 or np.float32")
+        values = np.asarray(values, dtype=self.dtype)
+        if values.ndim == 1:
+            values = values[:, np.newaxis]
+        n_rows, n_variables = values.shape
+        if group_boundaries is None:
+            group_boundaries = np.array([0, n_rows], dtype=np.int64)
+        group_boundaries = np.asarray(group_boundaries, dtype=np.int64)
+
+        self.count          = np.arange(n_rows + 1, dtype=np.int64)
+        self.sum            = np.zeros((n_rows + 1, n_variables), dtype=self.dtype)
+        self.sum_of_squares = np.zeros((n_rows + 1, n_variables), dtype=self.dtype)
+        self.length         = np.zeros(n_rows + 1, dtype=np.float64)
+        self.group_start    = group_boundaries[:-1]
+        self.group_end      = group_boundaries[1:]
+        self.is_group_start = np.zeros(n_rows + 1, dtype=np.bool_)
+        self.is_group_start[self.group_start] = True
+        self.group_mean                  = None
+        self.group_mean_square_deviation = None
+        if self.dtype == np.float32:
+            group_n_rows = np.maximum(np.diff(group_boundaries), 1)[:, np.newaxis]
+            # each shift is found in float64, so only the rounding of the shift itself is lost
+            self.group_mean = np.zeros((len(self.group_start), n_variables))
+            if n_rows:
+                self.group_mean = np.add.reduceat(values, self.group_start, axis=0, dtype=np.float64) / group_n_rows
+            self.group_mean_square_deviation = np.zeros_like(self.group_mean)
+            for first in range(0, n_rows, _BLOCK_ROWS):
+                row_group   = self._group(np.arange(first, min(first + _BLOCK_ROWS, n_rows)))
+                group_first = np.flatnonzero(np.diff(row_group, prepend=-1))
+                self.group_mean_square_deviation[row_group[group_first]] += np.add.reduceat(
+                    (values[first : first + _BLOCK_ROWS] - self.group_mean[row_group])**2.0,
+                    group_first,
+                    axis = 0,
+                )
+            self.group_mean_square_deviation /= group_n_rows
+        self._accumulate(values, 0, length=np.asarray(length, dtype=np.float64))
+
+    def _group(self, row:npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+        """ The group of each row. """
+        return np.searchsorted(self.group_start, row, side="right") - 1
+
+    def _accumulate(self, values:npt.NDArray, first_row:int, length:Optional[npt.NDArray[np.float64]] = None):
+        """ Recomputes the sums from `first_row` onwards, restarting them at the first row of each group.
+
+        Each group is summed sequentially in float64, carrying the running total from one block of rows to the next,
+        so its sums are the same whichever other groups share its blocks. In float64 mode the sums of the group
+        containing `first_row` are continued from that row, which gives exactly the same result as summing the group
+        from its first row. In float32 mode the float64 running totals are not stored, so that group is summed from
+        its first row. The cumulative lengths are recomputed too if `length` is given.
+        """
+        first_group = max(int(self._group(first_row)), 0)
+        group_start = self.group_start[first_group:].copy()
+        if self.dtype == np.float64 and len(group_start):
+            group_start[0] = first_row
+        outputs = [self.sum, self.sum_of_squares]
+        if length is not None:
+            outputs.append(self.length[:, np.newaxis])
+            length = length[:, np.newaxis]
+
+        previous_group = -1
+        carry          = []
+        for groups, rows, is_row in _group_blocks(group_start, self.group_end[first_group:]):
+            groups += first_group
+            first_rows = np.array([rows.start]) if is_row is None else rows[:, 0]
+            block      = _read_rows(values, rows)
+            if self.dtype == np.float32:
+                block -= self.group_mean[groups][:, np.newaxis]
+            squares = block**2.0
+            if self.dtype == np.float32:
+                squares -= self.group_mean_square_deviation[groups][:, np.newaxis]
+            blocks = [block, squares] if length is None else [block, squares, _read_rows(length, rows)]
+
+            # only a group longer than a block continues from the previous block
+            if len(groups) > 1 or groups[0] != previous_group:
+                carry = [self.start_value(output, first_rows).astype(np.float64) for output in outputs]
+            for output, output_block, output_carry in zip(outputs, blocks, carry):
+                # adding the carry to the first row continues the running sum exactly as a single `np.cumsum` would
+                output_block[:, 0] += output_carry
+                np.cumsum(output_block, axis=1, out=output_block)
+            if is_row is None:
+                for output, output_block in zip(outputs, blocks):
+                    output[rows.start + 1 : rows.stop + 1] = output_block[0]
+            else:
+                # padding follows the last row of its group, so its sums are simply not written out
+                target   = rows[is_row] + 1
+                selected = np.flatnonzero(is_row)
+                for output, output_block in zip(outputs, blocks):
+                    width = output_block.shape[2]
+                    output.reshape(-1)[(target[:, np.newaxis] * width + np.arange(width)).reshape(-1)] = np.take(
+                        output_block.reshape(-1, width),
+                        selected,
+                        axis = 0,
+                    ).reshape(-1)
+            previous_group = groups[0]
+            carry          = [output_block[:, -1] for output_block in blocks]
+
+    def update(self, first_row:int, values:npt.NDArray[np.float64]):
+        """ Recomputes the sums after the values of some rows have changed, in place.
+
+        Only rows from `first_row` onwards are recomputed, continuing the running sums of its group from `first_row`,
+        so the result is identical to building a new index from `values`. The row lengths must not have changed. In
+        float32 mode the sums are recomputed from the first row of the group containing `first_row`, with the same
+        shifts as before.
+
+        Args:
+            first_row (int): The first row whose values have changed.
+            values (npt.NDArray[np.float64]): Every row of the updated `(n_rows, n_variables)` array.
+        """
+        values = np.asarray(values, dtype=self.dtype)
+        if values.ndim == 1:
+            values = values[:, np.newaxis]
+        self._accumulate(values, first_row)
+
+    def start_value(self, array:npt.NDArray, row):
+        """ `array[row]`, as the value to subtract for a range of rows which starts at `row`.
+
+        This is zero where `row` is the first row of a group, since the sums restart there, and `array[row]` anywhere
+        else. `row` may be an integer or an integer array.
+        """
+        is_group_start = self.is_group_start[row]
+        if array.ndim > 1:
+            is_group_start = np.asarray(is_group_start)[..., np.newaxis]
+        return np.where(is_group_start, 0, array[row])
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.count) - 1
+
+    @property
+    def n_variables(self) -> int:
+        return self.sum.shape[1]
+
+    def segment_length(self, start, end):
+        """ Total length of the rows `[start, end)`, rounded to remove floating point noise.
+
+        `start` and `end` may be integers or integer arrays of the same shape.
+        """
+        return np.round(self.length[end] - self.start_value(self.length, start), decimals=10)
+
+    def cumulative_length(self, start:int, end:int) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        """ The cumulative length of the rows `[start, end)` measured from the left and from the right.
+
+        Returns:
+            A tuple `(left, right)` of arrays of length `end - start`. For the `i`-th row of the range, `left[i]` is
+            the length of rows `[start, start + i]` and `right[i]` is the length of rows `[start + i, end)`. Both
+            include the `i`-th row itself.
+        """
+        left  = np.round(self.length[start + 1 : end + 1] - self.start_value(self.length, start), decimals=10)
+        right = np.round(self.length[end] - self.start_value(self.length, np.arange(start, end)), decimals=10)
+        return left, right
+
+    def _split_totals(self, split, start, end):
+        """ Counts, sums and sums of squares either side of each split index.
+
+        Each split index `split[j]` divides the rows `[start[j], end[j])` into `[start[j], split[j])` and
+        `[split[j], end[j])`. Count arrays are shaped `(len(split), 1)` so that they broadcast against the
+        `(len(split), n_variables)` sum arrays.
+
+        In float32 mode the sums are of the deviations from the mean of the group, and the counts are float32 so that
+        the split statistics are computed in float32.
+        """
+        n_left               = (self.count[split] - self.count[start])[:, np.newaxis]
+        n_right              = (self.count[end] - self.count[split])[:, np.newaxis]
+        sum_left             = self.sum[split] - self.start_value(self.sum, start)
+        sum_right            = self.sum[end] - self.sum[split]
+        sum_of_squares_left  = self.sum_of_squares[split] - self.start_value(self.sum_of_squares, start)
+        sum_of_squares_right = self.sum_of_squares[end] - self.sum_of_squares[split]
+        if self.dtype == np.float32:
+            n_left  = n_left .astype(np.float32)
+            n_right = n_right.astype(np.float32)
+            mean_square_deviation = self.group_mean_square_deviation[self._group(start)].astype(np.float32)
+            sum_of_squares_left  += n_left  * mean_square_deviation
+            sum_of_squares_right += n_right * mean_square_deviation
+        return n_left, n_right, sum_left, sum_right, sum_of_squares_left, sum_of_squares_right
+
+    def q_statistic(self, split, start, end) -> npt.NDArray[np.float64]:
+        """ Computes the Q-statistic for splitting the rows `[start[j], end[j])` at `split[j]`, for each `j`.
+
+        `split`, `start` and `end` are integer arrays of the same length, so that candidate split indices belonging
+        to many different segments can be evaluated at once. See `homogeneous_segmentation._cumulative_q.cumulative_q`
+        for a description of the statistic.
+
+        Returns:
+            A `(len(split), n_variables)` array.
+        """
+        n_left, n_right, sum_left, sum_right, sum_of_squares_left, sum_of_squares_right = self._split_totals(
+            split, start, end
+        )
+        total_n              = (self.count[end] - self.count[start])[:, np.newaxis]
+        total_sum            = self.sum[end] - self.start_value(self.sum, start)
+        total_sum_of_squares = self.sum_of_squares[end] - self.start_value(self.sum_of_squares, start)
+        if self.dtype == np.float32:
+            total_n              = n_left + n_right
+            total_sum_of_squares = sum_of_squares_left + sum_of_squares_right
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return 1 - (
+                  (sum_of_squares_left  - sum_left  * sum_left  / n_left )
+                + (sum_of_squares_right - sum_right * sum_right / n_right)
+            ) / (
+                total_sum_of_squares - total_sum**2.0 / total_n
+            )
+
+    def p_statistic(self, split, start, end) -> npt.NDArray[np.float64]:
+        """ Computes the P-statistic for splitting the rows `[start[j], end[j])` at `split[j]`, for each `j`.
+
+        `split`, `start` and `end` are integer arrays of the same length, so that candidate split indices belonging
+        to many different segments can be evaluated at once. See `homogeneous_segmentation._cumulative_p.cumulative_p`
+        for a description of the statistic.
+
+        Returns:
+            A `(len(split), n_variables)` array.
+        """
+        n_left, n_right, sum_left, sum_right, sum_of_squares_left, sum_of_squares_right = self._split_totals(
+            split, start, end
+        )
+        # The sample standard deviation of a single row is undefined. `cumulative_p` gets NaN from `0 / 0`, but the
+        # difference of two prefix sums is not exactly zero, so the NaN is made explicit here.
+        n_left_less_one  = np.where(n_left  > 1, n_left  - 1, np.nan)
+        n_right_less_one = np.where(n_right > 1, n_right - 1, np.nan)
+        # ignore errors caused by NaN values, the original implementation does not handle them either
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if self.dtype == np.float64:
+                relative_variance_left  = n_left  * sum_of_squares_left  / (sum_left  * sum_left ) - 1
+                relative_variance_right = n_right * sum_of_squares_right / (sum_right * sum_right) - 1
+            else:
+                # `n * sum_of_squares / sum**2 - 1` is `n * (sum of squared deviations from the mean) / sum**2`, which
+                # is computed from the deviations from the group mean without cancellation
+                group_mean = self.group_mean[self._group(start)].astype(np.float32)
+                relative_variance_left  = (
+                    n_left  * (sum_of_squares_left  - sum_left  * sum_left  / n_left )
+                    / (sum_left  + n_left  * group_mean)**2.0
+                )
+                relative_variance_right = (
+                    n_right * (sum_of_squares_right - sum_right * sum_right / n_right)
+                    / (sum_right + n_right * group_mean)**2.0
+                )
+            return (
+                    (relative_variance_left  * n_left  / n_left_less_one )**0.5
+                +   (relative_variance_right * n_right / n_right_less_one)**0.5
+            ) / 2
+
+    def _split_range(self, start:int, end:int):
+        split = np.arange(start + 1, end, dtype=np.int64)
+        return split, np.full_like(split, start), np.full_like(split, end)
+
+    def cumulative_q(self, start:int, end:int) -> npt.NDArray[np.float64]:
+        """ Computes the cumulative Q-statistic for each potential split index of the rows `[start, end)`.
+
+        This gives the same result as `cumulative_q(values[start:end])` for each variable, but is computed from the
+        prefix sums.
+
+        Returns:
+            A `(end - start - 1, n_variables)` array. Row `j` is the Q-statistic for splitting at row `start + j + 1`.
+        """
+        return self.q_statistic(*self._split_range(start, end))
+
+    def cumulative_p(self, start:int, end:int) -> npt.NDArray[np.float64]:
+        """ Computes the cumulative P-statistic for each potential split index of the rows `[start, end)`.
+
+        This gives the same result as `cumulative_p(values[start:end])` for each variable, but is computed from the
+        prefix sums.
+
+        Returns:
+            A `(end - start - 1, n_variables)` array. Row `j` is the P-statistic for splitting at row `start + j + 1`.
+        """
+        return self.p_statistic(*self._split_range(start, end))
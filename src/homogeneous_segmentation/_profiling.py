@@ -0,0 +1,180 @@
+"""
+This is a private module containing `SegmentationProfile`, optional instrumentation of a segmentation run.
+
+Nothing here is called unless a profile is passed to a segmentation function as `profiler=`.
+"""
+import contextlib
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+import numpy as np
+import numpy.typing as npt
+
+
+@dataclass
+class IterationStats:
+    """ What one level of the split tree cost.
+
+    Attributes:
+        depth (int): Depth of the level in the split tree, starting from `0` for the initial segments.
+        n_bisections (int): Number of oversized segments bisected at this level.
+        n_rows_scanned (int): Total number of rows in those segments.
+        n_split_indices (int): Number of split indices found.
+        n_ties (int): Number of segments with more than one optimal split index, which were split into more than two
+            parts.
+        n_unsplittable (int): Number of segments which could not be split without violating the minimum segment
+            length.
+        bisect_seconds (float): Time spent computing the split statistic and finding its optimum.
+        bookkeeping_seconds (float): Time spent selecting oversized segments and merging the new split boundaries.
+        peak_memory_bytes (Optional[int]): Peak memory allocated while bisecting, above that allocated before
+            bisecting, if `trace_memory` was set. See `SegmentationProfile` for when `tracemalloc` was already
+            tracing.
+    """
+    depth               : int
+    n_bisections        : int
+    n_rows_scanned      : int
+    n_split_indices     : int
+    n_ties              : int
+    n_unsplittable      : int
+    bisect_seconds      : float
+    bookkeeping_seconds : float
+    peak_memory_bytes   : Optional[int] = None
+
+
+class SegmentationProfile:
+    """ Collects the cost of each phase of a segmentation run, and of each level of the split tree.
+
+    Pass an instance as the `profiler` argument of a segmentation function, then inspect it afterwards.
+
+    Args:
+        on_iteration (Optional[Callable[[IterationStats], None]]): Called with the stats of each level of the split
+            tree as soon as it is finished. When groups are segmented by worker processes, it is called once each
+            worker's results are returned.
+        trace_memory (bool): Record the peak memory allocated while bisecting each level with `tracemalloc`. This
+            slows down bisection noticeably. If `tracemalloc` is already tracing, the caller's own peak is left
+            untouched; the peak traced at the end of each level, less the memory traced at its start, is recorded
+            instead. That is exact if the level raised the peak, and otherwise an upper bound.
+
+    Attributes:
+        iterations (list[IterationStats]): The stats of each level of the split tree, in the order they finished.
+        phase_seconds (dict[str, float]): Time spent in each phase of the run; `"extract"` (reading columns and
+            grouping the DataFrame), `"prepare"` (validating and sorting), `"bisect"` (or `"partition"` for
+            `segment_ids_by_optimal_partition` and `segment_ids_by_cumulative_difference`, or `"merge"` for
+            `segment_ids_by_agglomerative_merge`) and `"output"`.
+    """
+
+    def __init__(
+            self,
+            on_iteration : Optional[Callable[[IterationStats], None]] = None,
+            trace_memory : bool                                       = False,
+        ):
+        self.on_iteration  = on_iteration
+        self.trace_memory  = trace_memory
+        self.iterations    : list[IterationStats] = []
+        self.phase_seconds : dict[str, float]     = {}
+        self._depth             = 0
+        self._is_tracing        = False
+        self._traced_at_start   = 0
+        self._iteration_start   = 0.0
+        self._bisect_start      = 0.0
+        self._bisect_seconds    = 0.0
+        self._peak_memory_bytes = None
+
+    def __repr__(self):
+        return (
+            f"SegmentationProfile(depth={self.depth}, n_bisections={self.n_bisections}, "
+            f"n_rows_scanned={self.n_rows_scanned}, phase_seconds={self.phase_seconds})"
+        )
+
+    @property
+    def depth(self) -> int:
+        """ Number of levels of the split tree which were bisected. """
+        return max((iteration.depth + 1 for iteration in self.iterations), default=0)
+
+    @property
+    def n_bisections(self) -> int:
+        return sum(iteration.n_bisections for iteration in self.iterations)
+
+    @property
+    def n_rows_scanned(self) -> int:
+        return sum(iteration.n_rows_scanned for iteration in self.iterations)
+
+    @property
+    def n_ties(self) -> int:
+        return sum(iteration.n_ties for iteration in self.iterations)
+
+    @contextlib.contextmanager
+    def phase(self, name:str) -> Iterator[None]:
+        """ Adds the time spent inside the `with` block to `phase_seconds[name]`. """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + time.perf_counter() - start
+
+    def start_tree(self):
+        """ Called by `bisection_tree` before the first level. """
+        self._depth = 0
+
+    def start_iteration(self):
+        """ Called by `bisection_tree` at the start of each level, before oversized segments are selected. """
+        self._iteration_start = time.perf_counter()
+
+    def start_bisect(self):
+        """ Called by `bisection_tree` immediately before the oversized segments of a level are bisected. """
+        # a caller's tracing is left running, and its peak is not reset
+        self._is_tracing      = self.trace_memory and not tracemalloc.is_tracing()
+        self._traced_at_start = 0
+        if self._is_tracing:
+            tracemalloc.start()
+        elif self.trace_memory:
+            self._traced_at_start = tracemalloc.get_traced_memory()[0]
+        self._bisect_start = time.perf_counter()
+
+    def end_bisect(self):
+        """ Called by `bisection_tree` immediately after the oversized segments of a level are bisected. """
+        self._bisect_seconds    = time.perf_counter() - self._bisect_start
+        self._peak_memory_bytes = None
+        if self.trace_memory:
+            self._peak_memory_bytes = tracemalloc.get_traced_memory()[1] - self._traced_at_start
+            if self._is_tracing:
+                tracemalloc.stop()
+
+    def end_iteration(
+            self,
+            starts        : npt.NDArray[np.int64],
+            ends          : npt.NDArray[np.int64],
+            split_indices : npt.NDArray[np.int64],
+            is_split      : npt.NDArray[np.bool_],
+        ):
+        """ Called by `bisection_tree` at the end of each level, with the segments that were bisected. """
+        iteration_seconds = time.perf_counter() - self._iteration_start
+        n_split_indices_per_segment = np.bincount(
+            np.searchsorted(starts, split_indices, side="right") - 1,
+            minlength = len(starts),
+        )
+        self.record_iteration(IterationStats(
+            depth               = self._depth,
+            n_bisections        = len(starts),
+            n_rows_scanned      = int(np.sum(ends - starts)),
+            n_split_indices     = len(split_indices),
+            n_ties              = int(np.count_nonzero(n_split_indices_per_segment > 1)),
+            n_unsplittable      = int(np.count_nonzero(~is_split)),
+            bisect_seconds      = self._bisect_seconds,
+            bookkeeping_seconds = iteration_seconds - self._bisect_seconds,
+            peak_memory_bytes   = self._peak_memory_bytes,
+        ))
+        self._depth += 1
+
+    def record_iteration(self, stats:IterationStats):
+        self.iterations.append(stats)
+        if self.on_iteration is not None:
+            self.on_iteration(stats)
+
+
+def profile_phase(profiler:Optional[SegmentationProfile], name:str):
+    """ `profiler.phase(name)`, or a context manager which does nothing if `profiler` is `None`. """
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.phase(name)
@@ -0,0 +1,184 @@
+"""
+This is a private module containing the recursive bisection engine shared by the SHS and MCV methods.
+
+The engine works only on a contiguous float64 (or float32) matrix of variables, an array of row lengths and an integer
+array of split boundaries. No pandas objects are created while segmenting.
+"""
+from typing import Callable, Literal, Optional, Union
+import numpy as np
+import numpy.typing as npt
+from ._prefix_sums import PrefixSums
+from ._optimal_bisections import batched_optimal_bisections, validate_variable_weights
+from ._numba_kernels import numba_batched_optimal_bisections
+from ._profiling import SegmentationProfile
+
+_engines = {
+    "numpy": batched_optimal_bisections,
+    "numba": numba_batched_optimal_bisections,
+}
+
+
+def bisection_engine(engine:Union[Literal["numpy", "numba"], Callable]) -> Callable:
+    """
+    Resolves the name of an engine to a function with the same signature as `batched_optimal_bisections`. A function
+    is returned as it is.
+    """
+    if callable(engine):
+        return engine
+    bisect = _engines.get(engine)
+    if bisect is None:
+        raise ValueError(f"engine must be one of {list(_engines.keys())}")
+    return bisect
+
+
+def bisection_tree(
+        values                       : npt.NDArray[np.float64],
+        length                       : npt.NDArray[np.float64],
+        allowed_segment_length_range : tuple[float, float],
+        split_statistic              : Callable[..., npt.NDArray[np.float64]],
+        goal                         : Literal["min", "max"],
+        initial_split_boundaries     : Optional[npt.NDArray[np.int64]]            = None,
+        engine                       : Union[Literal["numpy", "numba"], Callable] = "numpy",
+        variable_weights             : Optional[npt.ArrayLike]                    = None,
+        profiler                     : Optional[SegmentationProfile]              = None,
+        prefix_sums                  : Optional[PrefixSums]                       = None,
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+    """
+    Repeatedly bisects every segment longer than the maximum allowed segment length.
+
+    Each oversized segment is split at the `goal` of the mean `split_statistic`, subject to the minimum allowed
+    segment length. Segments that cannot be split without violating the minimum segment length are left as they are.
+
+    Bisection is level-synchronous; all oversized segments at a given depth of the split tree are bisected together
+    by a single call to `batched_optimal_bisections` (or its Numba equivalent).
+
+    Args:
+        values (npt.NDArray[np.float64]): A `(n_rows, n_variables)` array of the segmentation variables, sorted by
+            the linear measure. If it is a float32 array, the prefix sums and split statistics are computed in
+            float32 mode; see `PrefixSums`.
+        length (npt.NDArray[np.float64]): A `(n_rows,)` array containing the length of each row.
+        allowed_segment_length_range (tuple[float, float]): Minimum and maximum allowed segment lengths.
+        split_statistic: Either `PrefixSums.q_statistic` or `PrefixSums.p_statistic`.
+        goal: Whether to split at the `"min"` or `"max"` of the mean split statistic.
+        initial_split_boundaries (Optional[npt.NDArray[np.int64]]): Split boundaries to start from, such as the
+            boundaries between roads or carriageways. Each initial segment is segmented independently, but all of
+            them are bisected together level by level. Defaults to `[0, n_rows]`.
+        engine: `"numpy"` evaluates each level with `batched_optimal_bisections`. `"numba"` uses a JIT-compiled
+            kernel instead, which fuses the split statistic and the search for its optimum into a single loop and
+            requires the optional dependency numba.
+            A function with the same signature as `batched_optimal_bisections` may also be given.
+        variable_weights (Optional[npt.ArrayLike]): One weight per variable. The split statistics of the variables
+            are averaged with these weights instead of equally.
+        profiler (Optional[SegmentationProfile]): Records the cost of each level of the split tree.
+        prefix_sums (Optional[PrefixSums]): An index already built from `values` and `length`, to use instead of
+            building a new one.
+
+    Returns:
+        A tuple `(split_boundaries, parent_length)`. The split boundaries are a sorted array of row indices starting
+        with `0` and ending with `n_rows`; segment `i` is made of the rows `[split_boundaries[i],
+        split_boundaries[i + 1])`. `parent_length[i]` is the length of the segment which was bisected to create
+        `split_boundaries[i]`, or `inf` for the initial split boundaries.
+    """
+    bisect = bisection_engine(engine)
+
+    min_allowed_length, max_allowed_length = allowed_segment_length_range
+    n_rows = len(length)
+
+    # cumulative sums of every variable are computed once, and shared by every bisection below
+    if prefix_sums is None:
+        dtype       = np.float32 if np.asarray(values).dtype == np.float32 else np.float64
+        prefix_sums = PrefixSums(
+            values           = np.ascontiguousarray(values, dtype=dtype),
+            length           = length,
+            dtype            = dtype,
+            group_boundaries = initial_split_boundaries,
+        )
+    variable_weights = validate_variable_weights(variable_weights, prefix_sums.n_variables)
+
+    if initial_split_boundaries is None:
+        split_boundaries = np.array([0, n_rows], dtype=np.int64)
+    else:
+        split_boundaries = np.asarray(initial_split_boundaries, dtype=np.int64)
+    parent_length = np.full(len(split_boundaries), np.inf)
+    # start index of each segment which could not be split further
+    unsplittable_starts = np.array([], dtype=np.int64)
+    if profiler is not None:
+        profiler.start_tree()
+
+    while True:
+        if profiler is not None:
+            profiler.start_iteration()
+        segment_starts = split_boundaries[:-1]
+        segment_ends   = split_boundaries[1:]
+        segment_length = prefix_sums.segment_length(segment_starts, segment_ends)
+        k = np.flatnonzero(
+              (segment_length > max_allowed_length)
+            & ~np.isin(segment_starts, unsplittable_starts)
+        )
+        if len(k) == 0:
+            break
+
+        # NOTE: Generally there should be only a single optimal split index per segment, but if there
+        # is an equal maximum at two indices, then the segment is split into more than 2 parts.
+        if profiler is not None:
+            profiler.start_bisect()
+        split_indices, is_split = bisect(
+            prefix_sums            = prefix_sums,
+            starts                 = segment_starts[k],
+            ends                   = segment_ends[k],
+            minimum_segment_length = min_allowed_length,
+            split_statistic        = split_statistic,
+            goal                   = goal,
+            variable_weights       = variable_weights,
+        )
+        if profiler is not None:
+            profiler.end_bisect()
+        # each split index lies inside the segment which starts at or before it
+        split_parent_length = segment_length[k][np.searchsorted(segment_starts[k], split_indices, side="right") - 1]
+        unsplittable_starts = np.append(unsplittable_starts, segment_starts[k][~is_split])
+        split_boundaries    = np.concatenate([split_boundaries, split_indices])
+        parent_length       = np.concatenate([parent_length, split_parent_length])
+        order               = np.argsort(split_boundaries, kind="stable")
+        split_boundaries    = split_boundaries[order]
+        parent_length       = parent_length[order]
+        if profiler is not None:
+            profiler.end_iteration(segment_starts[k], segment_ends[k], split_indices, is_split)
+
+    return split_boundaries, parent_length
+
+
+def recursive_bisection(
+        values                       : npt.NDArray[np.float64],
+        length                       : npt.NDArray[np.float64],
+        allowed_segment_length_range : tuple[float, float],
+        split_statistic              : Callable[..., npt.NDArray[np.float64]],
+        goal                         : Literal["min", "max"],
+        initial_split_boundaries     : Optional[npt.NDArray[np.int64]] = None,
+        engine                       : Literal["numpy", "numba"]       = "numpy",
+        variable_weights             : Optional[npt.ArrayLike]         = None,
+        profiler                     : Optional[SegmentationProfile]   = None,
+    ) -> npt.NDArray[np.int64]:
+    """
+    Same as `bisection_tree`, but returns only the split boundaries.
+    """
+    split_boundaries, _ = bisection_tree(
+        values                       = values,
+        length                       = length,
+        allowed_segment_length_range = allowed_segment_length_range,
+        split_statistic              = split_statistic,
+        goal                         = goal,
+        initial_split_boundaries     = initial_split_boundaries,
+        engine                       = engine,
+        variable_weights             = variable_weights,
+        profiler                     = profiler,
+    )
+    return split_boundaries
+
+
+def segment_ids_from_split_boundaries(split_boundaries:npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    """
+    Converts split boundaries (as returned by `recursive_bisection`) to an integer segment id for each row, starting
+    from `1`.
+    """
+    ll = np.diff(split_boundaries)
+    return np.repeat(np.arange(1, len(ll) + 1, dtype=np.int64), ll)
@@ -0,0 +1,135 @@
+"""
+Implementation of the Cumulative Difference Approach (CDA) segmentation.
+"""
+
+from typing import Optional, Union
+import numpy as np
+import numpy.typing as npt
+from ._cumulative_difference import cumulative_difference_approach
+from ._recursive_bisection import segment_ids_from_split_boundaries
+from ._segment_arrays import prepare_arrays, restore_order
+from ._segment_data_frame import extract_arrays, to_output, segment_table_frame
+from ._frame_interchange import DataFrameLike, SeriesLike
+from ._segment_table import segment_table
+from ._profiling import SegmentationProfile, profile_phase
+
+
+def segment_ids_by_cumulative_difference(
+        data:DataFrameLike,
+        measure:tuple[str, str],
+        variable_column_names:list[str],
+        allowed_segment_length_range:Optional[tuple[float, float]] = None,
+        group_by:Optional[list[str]] = None,
+        variable_weights:Optional[npt.ArrayLike] = None,
+        threshold_constant:float = 1.3,
+        profiler:Optional[SegmentationProfile] = None,
+        return_segments:bool = False,
+        cv_threshold:float = 0.25,
+    )->Union[SeriesLike, tuple[SeriesLike, DataFrameLike]]:
+    """
+    Homogeneous segmentation function using the Cumulative Difference Approach (CDA) of AGPT05-19 Appendix D.
+
+    - The cumulative difference `Z` between the area under the variable and the area under its mean turns wherever
+      the variable crosses the mean. Each group is split at the turning point which is most significant, that is
+      where `|Z|` is largest relative to its spread if the group had no change in mean, among the split indices
+      which the SHS and MCV methods allow by the minimum segment length.
+    - The split is kept if `|Z|` relative to its spread is more than `threshold_constant * sqrt(2 log n)` times the
+      noise of the `n` rows of the group, estimated from the differences between neighbouring rows, or if the group
+      is longer than the maximum allowed segment length.
+    - Both sides of each split are split again by the same approach, using their own mean, until no segment has a
+      significant turning point and none is too long.
+
+    Every segment of each level is processed in a single vectorised pass. The run takes one pass per level of splits
+    rather than a single pass, since whether a turning point is significant depends on the mean of the segment it
+    lies in.
+
+    Args:
+        data, measure, variable_column_names, allowed_segment_length_range, group_by: See
+            `segment_ids_to_maximize_spatial_heterogeneity`.
+        variable_weights (Optional[npt.ArrayLike]): One non-negative weight per variable column. With more than one
+            variable, each is standardised by the mean and standard deviation of its segment and the turning points are
+            those of the cumulative difference of the weighted sum of the standardised variables.
+        threshold_constant (float): How far a turning point must stand out from the noise to be used, as a multiple
+            of the universal threshold of binary segmentation. Larger values give fewer, longer segments. Defaults to
+            `1.3`, from Fryzlewicz (2014), Wild Binary Segmentation for Multiple Change-Point Detection.
+        profiler (Optional[SegmentationProfile]): Opt-in instrumentation. The time spent in each phase of the run is
+            recorded in it, with the search for boundaries recorded as `"partition"`.
+        return_segments, cv_threshold: See `segment_ids_to_maximize_spatial_heterogeneity`.
+
+    Returns:
+        A series of integer segment ids with the same index as the original DataFrame. Segment ids are unique across
+        all groups. Rows with a missing value in any of the `variable_column_names` receive a missing segment id. If
+        `return_segments` is set, a tuple of the series and a table summarising each segment.
+    """
+    with profile_phase(profiler, "extract"):
+        start, end, values, group, is_complete = extract_arrays(data, measure, variable_column_names, group_by)
+    result = segment_cda_arrays(
+        start                        = start,
+        end                          = end,
+        values                       = values,
+        allowed_segment_length_range = allowed_segment_length_range,
+        group                        = group,
+        variable_weights             = variable_weights,
+        threshold_constant           = threshold_constant,
+        profiler                     = profiler,
+        return_segments              = return_segments,
+        cv_threshold                 = cv_threshold,
+    )
+    with profile_phase(profiler, "output"):
+        if not return_segments:
+            return to_output(result, is_complete, data)
+        segment_id, table = result
+        return (
+            to_output(segment_id, is_complete, data),
+            segment_table_frame(table, data, measure, variable_column_names, group_by, is_complete),
+        )
+
+
+def segment_cda_arrays(
+        start:npt.ArrayLike,
+        end:npt.ArrayLike,
+        values:npt.ArrayLike,
+        allowed_segment_length_range:Optional[tuple[float, float]] = None,
+        group:Optional[npt.ArrayLike] = None,
+        variable_weights:Optional[npt.ArrayLike] = None,
+        threshold_constant:float = 1.3,
+        profiler:Optional[SegmentationProfile] = None,
+        return_segments:bool = False,
+        cv_threshold:float = 0.25,
+    )->Union[npt.NDArray[np.int64], tuple[npt.NDArray[np.int64], dict[str, npt.NDArray]]]:
+    """
+    Array-level version of `segment_ids_by_cumulative_difference` which does not use pandas.
+
+    Args:
+        start, end, values, group: See `segment_shs_arrays`.
+        allowed_segment_length_range, variable_weights, threshold_constant, profiler: See
+            `segment_ids_by_cumulative_difference`.
+
+    Returns:
+        An int64 array of segment ids in the same order as the input rows. Segment ids are unique across all groups.
+        If `return_segments` is set, a tuple of the segment ids and a table summarising each segment, as returned by
+        `segment_shs_arrays`.
+    """
+    with profile_phase(profiler, "prepare"):
+        values, length, group_boundaries, order = prepare_arrays(start, end, values, group)
+
+    if allowed_segment_length_range is None:
+        allowed_segment_length_range = (
+            length.min(),
+            length.sum()
+        )
+
+    with profile_phase(profiler, "partition"):
+        split_boundaries = cumulative_difference_approach(
+            values                       = values,
+            length                       = length,
+            allowed_segment_length_range = allowed_segment_length_range,
+            initial_split_boundaries     = group_boundaries,
+            variable_weights             = variable_weights,
+            threshold_constant           = threshold_constant,
+        )
+    with profile_phase(profiler, "output"):
+        segment_id = restore_order(segment_ids_from_split_boundaries(split_boundaries), order)
+        if not return_segments:
+            return segment_id
+        return segment_id, segment_table(start, end, values, length, split_boundaries, order, cv_threshold)
@@ -1,129 +1,188 @@
 """
 Implementation of the 'Minimum Coefficient of Variation' (MCV) homogeneous segmentation algorithm.
 """
-from typing import Optional
-import pandas as pd
+import os
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Literal, Optional, Sequence, Union
 import numpy as np
-from ._optimal_bisections import optimal_bisections
-from ._cumulative_p import cumulative_p
+import numpy.typing as npt
+from ._prefix_sums import PrefixSums
+from ._segment_arrays import segment_arrays
+from ._segment_data_frame import segment_data_frame
+from ._frame_interchange import DataFrameLike, SeriesLike
+from ._profiling import SegmentationProfile
+from ._cache import SegmentationCache
+from ._segment_sweep import sweep_data_frame
+from ._segment_file import segment_file
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def segment_ids_to_minimize_coefficient_of_variation(
-        data                         : pd.DataFrame,
+        data                         : DataFrameLike,
         measure                      : tuple[str, str],
         variable_column_names        : list[str],
-        allowed_segment_length_range : Optional[tuple[float, float]] = None,
-    ) -> pd.Series:
+        allowed_segment_length_range : Optional[tuple[float, float]]   = None,
+        group_by                     : Optional[list[str]]             = None,
+        n_jobs                       : Optional[int]                   = None,
+        executor                     : Optional[Executor]              = None,
+        engine                       : Literal["numpy", "numba"]       = "numpy",
+        variable_weights             : Optional[npt.ArrayLike]         = None,
+        profiler                     : Optional[SegmentationProfile]   = None,
+        cache                        : Optional[SegmentationCache]     = None,
+        return_segments              : bool                            = False,
+        cv_threshold                 : float                           = 0.25,
+        dtype                        : npt.DTypeLike                   = np.float64,
+        backend                      : Literal["processes", "threads"] = "processes",
+    ) -> Union[SeriesLike, tuple[SeriesLike, DataFrameLike]]:
     """
     Homogeneous segmentation function for continuous variables, aiming to 'Minimise Coefficient of Variation' (MCV)
     within selected segments.
-    """
-
-    LENGTH_COLUMN_NAME = "___length___"
 
-    measure_start, measure_end = measure
-    original_index = data.index
-
-    # preprocessing
-    data = (
-        data
-        .dropna(subset=variable_column_names)
-        .sort_values(by=measure_start)
-        .reset_index(drop=True)
+    The arguments are the same as `segment_ids_to_maximize_spatial_heterogeneity`.
+    Use `group_by` (eg `["road", "cwy"]`) to segment many roads or carriageways in a single call, and `n_jobs` or
+    `executor` to spread the groups over several worker processes, or threads with `backend="threads"`.
+    `engine="numba"` selects the optional JIT-compiled kernel, `variable_weights` sets the importance of each
+    variable, and `profiler` records the cost of each phase and of each level of the split tree. Groups found in a
+    `cache` are not segmented again, and
+    `return_segments` also returns a table summarising each segment.
+    """
+    return segment_data_frame(
+        data                         = data,
+        measure                      = measure,
+        variable_column_names        = variable_column_names,
+        allowed_segment_length_range = allowed_segment_length_range,
+        group_by                     = group_by,
+        n_jobs                       = n_jobs,
+        executor                     = executor,
+        engine                       = engine,
+        variable_weights             = variable_weights,
+        profiler                     = profiler,
+        cache                        = cache,
+        return_segments              = return_segments,
+        cv_threshold                 = cv_threshold,
+        dtype                        = dtype,
+        backend                      = backend,
+        split_statistic              = PrefixSums.p_statistic,
+        goal                         = "min",
     )
 
 
-    # add length # remove system errors of small data
-    data[LENGTH_COLUMN_NAME] = (data[measure_end] - data[measure_start]).round(decimals=10).values
-
-    if allowed_segment_length_range is None:
-        allowed_segment_length_range = (
-            data[LENGTH_COLUMN_NAME].min(),
-            data[LENGTH_COLUMN_NAME].sum()
-        )
-
-    if data[LENGTH_COLUMN_NAME].sum() <= allowed_segment_length_range[1]:
-        return pd.Series(
-            data = np.ones(len(data.index), dtype=np.int64),
-            index = data.index,
-        )
-    ## Start original mcv function
-    
-    # n_var = len(var)
-    min_allowed_length, max_allowed_length = allowed_segment_length_range
+def segment_mcv_arrays(
+        start                        : npt.ArrayLike,
+        end                          : npt.ArrayLike,
+        values                       : npt.ArrayLike,
+        allowed_segment_length_range : Optional[tuple[float, float]]   = None,
+        group                        : Optional[npt.ArrayLike]         = None,
+        n_jobs                       : Optional[int]                   = None,
+        executor                     : Optional[Executor]              = None,
+        engine                       : Literal["numpy", "numba"]       = "numpy",
+        variable_weights             : Optional[npt.ArrayLike]         = None,
+        profiler                     : Optional[SegmentationProfile]   = None,
+        cache                        : Optional[SegmentationCache]     = None,
+        return_segments              : bool                            = False,
+        cv_threshold                 : float                           = 0.25,
+        dtype                        : npt.DTypeLike                   = np.float64,
+        backend                      : Literal["processes", "threads"] = "processes",
+    ) -> Union[npt.NDArray[np.int64], tuple[npt.NDArray[np.int64], dict[str, npt.NDArray]]]:
+    """
+    Array-level version of `segment_ids_to_minimize_coefficient_of_variation` which does not use pandas.
 
-    # first segmentation
-    ss          = optimal_bisections(
-        variables                  = data.loc[:, variable_column_names].values.transpose(),
-        length                     = data[LENGTH_COLUMN_NAME].values,
-        minimum_segment_length     = min_allowed_length,
-        cumulative_split_statistic = cumulative_p,
-        goal                       = "min",
+    The arguments are the same as `segment_shs_arrays`. Returns an int64 array of segment ids in the same order as
+    the input rows, and their segment table if `return_segments` is set.
+    """
+    return segment_arrays(
+        start                        = start,
+        end                          = end,
+        values                       = values,
+        allowed_segment_length_range = allowed_segment_length_range,
+        group                        = group,
+        split_statistic              = PrefixSums.p_statistic,
+        goal                         = "min",
+        n_jobs                       = n_jobs,
+        executor                     = executor,
+        engine                       = engine,
+        variable_weights             = variable_weights,
+        profiler                     = profiler,
+        cache                        = cache,
+        return_segments              = return_segments,
+        cv_threshold                 = cv_threshold,
+        dtype                        = dtype,
+        backend                      = backend,
     )
-    #ss = np.array([3,5])
-    # following segmentation
-    k1               = np.array([0, *ss])
-    k2               = np.array([*ss, len(data.index)])
-    ll               = k2 - k1 # integer length of arrays on each side of split
-    split_boundaries = np.append(0, np.cumsum(ll)) # split boundaries, including 0 and len(data.index)
-    segment_id       = np.repeat(np.arange(0, len(ll)), ll) # segment id for each row of data
-    # segdatalist = np.split(data, segid)
-
-    # NOTE: We are grouping the data wherever _seg2 found a maximum Q value.
-    # Generally there should be only a single maximum, but if there
-    # is an equal maximum at two indices, then there will be more than 2 groups.
-    # in practice this should be vanishingly rare... 
-    # but in future we should come back and prevent this.
-    data_grouped_by_seg = data.groupby(segment_id)
-    data_grouped_by_segment_id:list[pd.DataFrame] = [group for _ ,group in data.groupby(segment_id)]
 
-    # lengthdata        = pandas.DataFrame([data.loc[:,length], segid], columns = ["length","seg.id"]))
-    segment_length_summary = data_grouped_by_seg[LENGTH_COLUMN_NAME].sum()
 
-    segment_length         = segment_length_summary.round(10).values
-    k = np.flatnonzero(segment_length > max_allowed_length)
-
-    while(len(k) > 0):
-        sa = [
-            optimal_bisections(
-                variables                  = data_grouped_by_segment_id[x].loc[:,variable_column_names].values.transpose(),
-                length                     = data_grouped_by_segment_id[x][LENGTH_COLUMN_NAME].values,
-                minimum_segment_length     = min_allowed_length,
-                cumulative_split_statistic = cumulative_p,
-                goal                       = "min",
-            )
-            +
-            split_boundaries[x]
-            for x
-            in k
-        ]
-        ss               = np.sort(np.concatenate([ss, *sa]))
-        k1               = np.array([0, *ss])
-        k2               = np.array([*ss, len(data.index)])
-        ll               = k2 - k1
-        split_boundaries = np.append(np.array([0]), np.cumsum(ll))
-        segment_id            = np.repeat(np.arange(0, len(ll)), ll)
-        # segdatalist = np.split(data, segid)
-
-        # we are grouping the data wherever _seg2 found a maximum. generally there should be only a single maximum,
-        # but if there is an equal maximum at two indices, then there will be 3 groups overall.
-        data_grouped_by_segment_id:list[pd.DataFrame] = [group for _ ,group in data.groupby(segment_id)]
+def segment_mcv_sweep(
+        data                          : "pd.DataFrame",
+        measure                       : tuple[str, str],
+        variable_column_names         : list[str],
+        allowed_segment_length_ranges : Sequence[tuple[float, float]],
+        group_by                      : Optional[list[str]]       = None,
+        engine                        : Literal["numpy", "numba"] = "numpy",
+        variable_weights              : Optional[npt.ArrayLike]   = None,
+    ) -> "pd.DataFrame":
+    """
+    Segments `data` with the Minimize Coefficient of Variation (MCV) method once for each allowed segment length
+    range.
 
-        # lengthdata        = pandas.DataFrame([data.loc[:,length], segid], columns = ["length","seg.id"]))
-        segment_length_summary = data[LENGTH_COLUMN_NAME].groupby(segment_id).sum()
+    The arguments and return value are the same as `segment_shs_sweep`.
+    """
+    return sweep_data_frame(
+        data                          = data,
+        measure                       = measure,
+        variable_column_names         = variable_column_names,
+        allowed_segment_length_ranges = allowed_segment_length_ranges,
+        group_by                      = group_by,
+        split_statistic               = PrefixSums.p_statistic,
+        goal                          = "min",
+        engine                        = engine,
+        variable_weights              = variable_weights,
+    )
 
-        segment_length         = segment_length_summary.round(10).values
-        k                 = np.flatnonzero(segment_length > max_allowed_length)
-    
-    # # add seg.id
-    k1                          = np.array([0, *ss])
-    k2                          = np.array([*ss, len(data.index)])
-    ll                          = k2 - k1
-    segment_id                  = np.repeat(np.arange(0, len(ll), dtype=np.int64), ll) + 1
-    ## End original shs function
 
+def segment_mcv_file(
+        input_path                   : Union[str, os.PathLike],
+        output_path                  : Union[str, os.PathLike],
+        measure                      : tuple[str, str],
+        variable_column_names        : list[str],
+        allowed_segment_length_range : tuple[float, float],
+        group_by                     : list[str],
+        segments_path                : Optional[Union[str, os.PathLike]] = None,
+        chunk_size                   : int                               = 100_000,
+        segment_id_column_name       : str                               = "segment_id",
+        engine                       : Literal["numpy", "numba"]         = "numpy",
+        variable_weights             : Optional[npt.ArrayLike]           = None,
+        cv_threshold                 : float                             = 0.25,
+        n_jobs                       : Optional[int]                     = None,
+        executor                     : Optional[Executor]                = None,
+        dtype                        : npt.DTypeLike                     = np.float64,
+        backend                      : Literal["processes", "threads"]   = "processes",
+    ) -> int:
+    """
+    Segments a CSV or Parquet file with the Minimize Coefficient of Variation (MCV) method without loading the whole
+    file into memory.
 
-    return pd.Series(
-        index = original_index,
-        data  = segment_id
-    )
\ No newline at end of file
+    The arguments and return value are the same as `segment_shs_file`.
+    """
+    _, _, n_segments = segment_file(
+        input_path                   = input_path,
+        output_path                  = output_path,
+        measure                      = measure,
+        variable_column_names        = variable_column_names,
+        allowed_segment_length_range = allowed_segment_length_range,
+        group_by                     = group_by,
+        split_statistic              = PrefixSums.p_statistic,
+        goal                         = "min",
+        segments_path                = segments_path,
+        chunk_size                   = chunk_size,
+        segment_id_column_name       = segment_id_column_name,
+        engine                       = engine,
+        variable_weights             = variable_weights,
+        cv_threshold                 = cv_threshold,
+        n_jobs                       = n_jobs,
+        executor                     = executor,
+        dtype                        = dtype,
+        backend                      = backend,
+    )
+    return n_segments
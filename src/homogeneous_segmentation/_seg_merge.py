@@ -0,0 +1,148 @@
+"""
+Implementation of the agglomerative merge segmentation, a bottom-up alternative to the top-down SHS and MCV methods.
+"""
+
+from typing import Literal, Optional, Union
+import numpy as np
+import numpy.typing as npt
+from ._agglomerative_merge import agglomerative_merge
+from ._recursive_bisection import segment_ids_from_split_boundaries
+from ._segment_arrays import prepare_arrays, restore_order
+from ._segment_data_frame import extract_arrays, to_output, segment_table_frame
+from ._frame_interchange import DataFrameLike, SeriesLike
+from ._segment_table import segment_table
+from ._profiling import SegmentationProfile, profile_phase
+
+
+def segment_ids_by_agglomerative_merge(
+        data:DataFrameLike,
+        measure:tuple[str, str],
+        variable_column_names:list[str],
+        allowed_segment_length_range:Optional[tuple[float, float]] = None,
+        group_by:Optional[list[str]] = None,
+        cost:Literal["variance", "cv"] = "variance",
+        segment_penalty:Optional[float] = None,
+        engine:Literal["numpy", "numba"] = "numpy",
+        variable_weights:Optional[npt.ArrayLike] = None,
+        profiler:Optional[SegmentationProfile] = None,
+        return_segments:bool = False,
+        cv_threshold:float = 0.25,
+    )->Union[SeriesLike, tuple[SeriesLike, DataFrameLike]]:
+    """
+    Homogeneous segmentation function which builds segments bottom-up, by repeatedly merging the adjacent pair of
+    segments whose merge increases the within-segment cost the least.
+
+    - Every row starts as a segment of its own.
+    - Segments shorter than the minimum allowed segment length are merged first, then any pair whose merge is no
+      longer than the maximum allowed segment length, until no such pair is left.
+    - With `cost="variance"` each merge is the one which increases the variance within segments the least (Ward's
+      criterion), which is the aim of the SHS method. With `cost="cv"` it is the one which increases the row
+      weighted coefficient of variation the least, which is the aim of the MCV method.
+
+    The pairs are kept in a heap, and each merge cost is found in constant time from prefix sums, so a group of `n`
+    rows takes `O(n log n)` time however many levels SHS or MCV would need to reach the maximum segment length. Like
+    SHS and MCV it is greedy, so it does not in general find the best partition; see
+    `segment_ids_by_optimal_partition`.
+
+    Args:
+        data, measure, variable_column_names, allowed_segment_length_range, group_by: See
+            `segment_ids_to_maximize_spatial_heterogeneity`.
+        cost (Literal["variance", "cv"]): The within-segment cost whose increase is minimised by each merge. The cost
+            of each variable is normalised within each group, as in `segment_ids_by_optimal_partition`.
+        segment_penalty (Optional[float]): Segments which are already at least the minimum length are merged only
+            while their merge increases the cost by less than this, in the same units as in
+            `segment_ids_by_optimal_partition`. By default they are merged until no pair fits within the maximum
+            segment length.
+        engine (Literal["numpy", "numba"]): `"numba"` runs the merges in a JIT-compiled kernel, which requires the
+            optional dependency numba. Defaults to `"numpy"`, which merges with Python's `heapq` one interpreted step
+            at a time and is also accepted as `"python"`. On 200,000 rows it takes about 5 seconds and its peak
+            memory is several hundred bytes per row, so use `"numba"` on large networks. Both give the same result.
+        variable_weights (Optional[npt.ArrayLike]): One non-negative weight per variable column. The costs of the
+            variables are averaged with these weights instead of equally.
+        profiler (Optional[SegmentationProfile]): Opt-in instrumentation. The time spent in each phase of the run is
+            recorded in it, with the merges recorded as `"merge"`.
+        return_segments, cv_threshold: See `segment_ids_to_maximize_spatial_heterogeneity`.
+
+    Returns:
+        A series of integer segment ids with the same index as the original DataFrame. Segment ids are unique across
+        all groups. Rows with a missing value in any of the `variable_column_names` receive a missing segment id. If
+        `return_segments` is set, a tuple of the series and a table summarising each segment.
+    """
+    with profile_phase(profiler, "extract"):
+        start, end, values, group, is_complete = extract_arrays(data, measure, variable_column_names, group_by)
+    result = segment_agglomerative_merge_arrays(
+        start                        = start,
+        end                          = end,
+        values                       = values,
+        allowed_segment_length_range = allowed_segment_length_range,
+        group                        = group,
+        cost                         = cost,
+        segment_penalty              = segment_penalty,
+        engine                       = engine,
+        variable_weights             = variable_weights,
+        profiler                     = profiler,
+        return_segments              = return_segments,
+        cv_threshold                 = cv_threshold,
+    )
+    with profile_phase(profiler, "output"):
+        if not return_segments:
+            return to_output(result, is_complete, data)
+        segment_id, table = result
+        return (
+            to_output(segment_id, is_complete, data),
+            segment_table_frame(table, data, measure, variable_column_names, group_by, is_complete),
+        )
+
+
+def segment_agglomerative_merge_arrays(
+        start:npt.ArrayLike,
+        end:npt.ArrayLike,
+        values:npt.ArrayLike,
+        allowed_segment_length_range:Optional[tuple[float, float]] = None,
+        group:Optional[npt.ArrayLike] = None,
+        cost:Literal["variance", "cv"] = "variance",
+        segment_penalty:Optional[float] = None,
+        engine:Literal["numpy", "numba"] = "numpy",
+        variable_weights:Optional[npt.ArrayLike] = None,
+        profiler:Optional[SegmentationProfile] = None,
+        return_segments:bool = False,
+        cv_threshold:float = 0.25,
+    )->Union[npt.NDArray[np.int64], tuple[npt.NDArray[np.int64], dict[str, npt.NDArray]]]:
+    """
+    Array-level version of `segment_ids_by_agglomerative_merge` which does not use pandas.
+
+    Args:
+        start, end, values, group: See `segment_shs_arrays`.
+        allowed_segment_length_range, cost, segment_penalty, engine, variable_weights, profiler: See
+            `segment_ids_by_agglomerative_merge`.
+
+    Returns:
+        An int64 array of segment ids in the same order as the input rows. Segment ids are unique across all groups.
+        If `return_segments` is set, a tuple of the segment ids and a table summarising each segment, as returned by
+        `segment_shs_arrays`.
+    """
+    with profile_phase(profiler, "prepare"):
+        values, length, group_boundaries, order = prepare_arrays(start, end, values, group)
+
+    if allowed_segment_length_range is None:
+        allowed_segment_length_range = (
+            length.min(),
+            length.sum()
+        )
+
+    with profile_phase(profiler, "merge"):
+        split_boundaries = agglomerative_merge(
+            values                       = values,
+            length                       = length,
+            allowed_segment_length_range = allowed_segment_length_range,
+            cost                         = cost,
+            initial_split_boundaries     = group_boundaries,
+            engine                       = engine,
+            variable_weights             = variable_weights,
+            segment_penalty              = segment_penalty,
+        )
+    with profile_phase(profiler, "output"):
+        segment_id = restore_order(segment_ids_from_split_boundaries(split_boundaries), order)
+        if not return_segments:
+            return segment_id
+        return segment_id, segment_table(start, end, values, length, split_boundaries, order, cv_threshold)
@@ -0,0 +1,149 @@
+"""
+Implementation of the optimal partition segmentation, a globally optimal alternative to the greedy SHS and MCV
+methods.
+"""
+
+from typing import Literal, Optional, Union
+import numpy as np
+import numpy.typing as npt
+from ._optimal_partition import optimal_partition
+from ._recursive_bisection import segment_ids_from_split_boundaries
+from ._segment_arrays import prepare_arrays, restore_order
+from ._segment_data_frame import extract_arrays, to_output, segment_table_frame
+from ._frame_interchange import DataFrameLike, SeriesLike
+from ._segment_table import segment_table
+from ._profiling import SegmentationProfile, profile_phase
+
+
+def segment_ids_by_optimal_partition(
+        data:DataFrameLike,
+        measure:tuple[str, str],
+        variable_column_names:list[str],
+        allowed_segment_length_range:Optional[tuple[float, float]] = None,
+        group_by:Optional[list[str]] = None,
+        cost:Literal["variance", "cv"] = "variance",
+        segment_penalty:Optional[float] = None,
+        engine:Literal["numpy", "numba"] = "numpy",
+        variable_weights:Optional[npt.ArrayLike] = None,
+        profiler:Optional[SegmentationProfile] = None,
+        return_segments:bool = False,
+        cv_threshold:float = 0.25,
+    )->Union[SeriesLike, tuple[SeriesLike, DataFrameLike]]:
+    """
+    Homogeneous segmentation function which finds the partition with the least total within-segment cost, rather
+    than bisecting greedily like the SHS and MCV methods.
+
+    - With `cost="variance"` it minimises the variance within segments, which is the aim of the SHS method.
+    - With `cost="cv"` it minimises the row weighted mean coefficient of variation of the segments, which is the aim
+      of the MCV method.
+    - Every segment is at least the minimum and at most the maximum allowed segment length, except that a single row
+      may be longer than the maximum, and a group shorter than the minimum is a single segment.
+
+    The search is a dynamic program over every possible segment end, and is pruned with the PELT method for the
+    variance cost. It is slower than the SHS and MCV methods. With `engine="numpy"` it makes one interpreted step per
+    row, about 6 seconds per 100,000 rows, so use `engine="numba"` on large networks.
+
+    Args:
+        data, measure, variable_column_names, allowed_segment_length_range, group_by: See
+            `segment_ids_to_maximize_spatial_heterogeneity`.
+        cost (Literal["variance", "cv"]): The within-segment cost to minimise. The cost of each variable is
+            normalised within each group, so that variables measured in different units can be combined.
+        segment_penalty (Optional[float]): Added to the cost of every segment, in the same units as the total cost of
+            a group (a fraction of the group's variance for `"variance"`, or a coefficient of variation for `"cv"`).
+            eg `0.01` splits a segment only where that explains at least 1% of the variance of its group. Defaults to
+            a BIC-style penalty for each group, `2 * log(n)` times the variance of the noise of its `n` rows (or their
+            coefficient of variation for `"cv"`), with the noise estimated from the differences of adjacent rows.
+            Splitting a segment never increases its variance, so with `0.0` the variance cost gives segments close
+            to the minimum length.
+        engine (Literal["numpy", "numba"]): `"numba"` runs the search in a JIT-compiled kernel, which is much
+            faster and requires the optional dependency numba. Defaults to `"numpy"`, which is interpreted per row;
+            see above.
+        variable_weights (Optional[npt.ArrayLike]): One non-negative weight per variable column. The costs of the
+            variables are averaged with these weights instead of equally.
+        profiler (Optional[SegmentationProfile]): Opt-in instrumentation. The time spent in each phase of the run is
+            recorded in it, with the search recorded as `"partition"`.
+        return_segments, cv_threshold: See `segment_ids_to_maximize_spatial_heterogeneity`.
+
+    Returns:
+        A series of integer segment ids with the same index as the original DataFrame. Segment ids are unique across
+        all groups. Rows with a missing value in any of the `variable_column_names` receive a missing segment id. If
+        `return_segments` is set, a tuple of the series and a table summarising each segment.
+    """
+    with profile_phase(profiler, "extract"):
+        start, end, values, group, is_complete = extract_arrays(data, measure, variable_column_names, group_by)
+    result = segment_optimal_partition_arrays(
+        start                        = start,
+        end                          = end,
+        values                       = values,
+        allowed_segment_length_range = allowed_segment_length_range,
+        group                        = group,
+        cost                         = cost,
+        segment_penalty              = segment_penalty,
+        engine                       = engine,
+        variable_weights             = variable_weights,
+        profiler                     = profiler,
+        return_segments              = return_segments,
+        cv_threshold                 = cv_threshold,
+    )
+    with profile_phase(profiler, "output"):
+        if not return_segments:
+            return to_output(result, is_complete, data)
+        segment_id, table = result
+        return (
+            to_output(segment_id, is_complete, data),
+            segment_table_frame(table, data, measure, variable_column_names, group_by, is_complete),
+        )
+
+
+def segment_optimal_partition_arrays(
+        start:npt.ArrayLike,
+        end:npt.ArrayLike,
+        values:npt.ArrayLike,
+        allowed_segment_length_range:Optional[tuple[float, float]] = None,
+        group:Optional[npt.ArrayLike] = None,
+        cost:Literal["variance", "cv"] = "variance",
+        segment_penalty:Optional[float] = None,
+        engine:Literal["numpy", "numba"] = "numpy",
+        variable_weights:Optional[npt.ArrayLike] = None,
+        profiler:Optional[SegmentationProfile] = None,
+        return_segments:bool = False,
+        cv_threshold:float = 0.25,
+    )->Union[npt.NDArray[np.int64], tuple[npt.NDArray[np.int64], dict[str, npt.NDArray]]]:
+    """
+    Array-level version of `segment_ids_by_optimal_partition` which does not use pandas.
+
+    Args:
+        start, end, values, group: See `segment_shs_arrays`.
+        allowed_segment_length_range, cost, segment_penalty, engine, variable_weights, profiler: See
+            `segment_ids_by_optimal_partition`.
+
+    Returns:
+        An int64 array of segment ids in the same order as the input rows. Segment ids are unique across all groups.
+        If `return_segments` is set, a tuple of the segment ids and a table summarising each segment, as returned by
+        `segment_shs_arrays`.
+    """
+    with profile_phase(profiler, "prepare"):
+        values, length, group_boundaries, order = prepare_arrays(start, end, values, group)
+
+    if allowed_segment_length_range is None:
+        allowed_segment_length_range = (
+            length.min(),
+            length.sum()
+        )
+
+    with profile_phase(profiler, "partition"):
+        split_boundaries = optimal_partition(
+            values                       = values,
+            length                       = length,
+            allowed_segment_length_range = allowed_segment_length_range,
+            cost                         = cost,
+            initial_split_boundaries     = group_boundaries,
+            engine                       = engine,
+            variable_weights             = variable_weights,
+            segment_penalty              = segment_penalty,
+        )
+    with profile_phase(profiler, "output"):
+        segment_id = restore_order(segment_ids_from_split_boundaries(split_boundaries), order)
+        if not return_segments:
+            return segment_id
+        return segment_id, segment_table(start, end, values, length, split_boundaries, order, cv_threshold)
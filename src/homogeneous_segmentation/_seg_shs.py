@@ -2,19 +2,41 @@
 Implementation of the Spatial Heterogeneity-based Segmentation (SHS).
 """
 
-from typing import Optional
-import pandas as pd
+import os
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Literal, Optional, Sequence, Union
 import numpy as np
-from ._optimal_bisections import optimal_bisections
-from ._cumulative_q import cumulative_q
+import numpy.typing as npt
+from ._prefix_sums import PrefixSums
+from ._segment_arrays import segment_arrays
+from ._segment_data_frame import segment_data_frame
+from ._frame_interchange import DataFrameLike, SeriesLike
+from ._profiling import SegmentationProfile
+from ._cache import SegmentationCache
+from ._segment_sweep import sweep_data_frame
+from ._segment_file import segment_file
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def segment_ids_to_maximize_spatial_heterogeneity(
-        data:pd.DataFrame,
+        data:DataFrameLike,
         measure:tuple[str, str],
         variable_column_names:list[str],
         allowed_segment_length_range:Optional[tuple[float, float]] = None,
-    )->pd.Series:
+        group_by:Optional[list[str]] = None,
+        n_jobs:Optional[int] = None,
+        executor:Optional[Executor] = None,
+        engine:Literal["numpy", "numba"] = "numpy",
+        variable_weights:Optional[npt.ArrayLike] = None,
+        profiler:Optional[SegmentationProfile] = None,
+        cache:Optional[SegmentationCache] = None,
+        return_segments:bool = False,
+        cv_threshold:float = 0.25,
+        dtype:npt.DTypeLike = np.float64,
+        backend:Literal["processes", "threads"] = "processes",
+    )->Union[SeriesLike, tuple[SeriesLike, DataFrameLike]]:
     """
     Homogeneous segmentation function for continuous variables sing the Spatial Heterogeneity Segmentation (SHS) method.
     
@@ -23,7 +45,9 @@ def segment_ids_to_maximize_spatial_heterogeneity(
     - the segmentation is stopped when the minimum segment length is less than the minimum allowed segment length.
 
     Args:
-        data (DataFrame): DataFrame to be modified
+        data (DataFrameLike): DataFrame to be modified. A `pyarrow.Table` or `polars.DataFrame` is read without
+            converting it to pandas, and the measure and variable columns are read as views of their buffers where
+            possible.
         measure (tuple[str,str]): Names of column indicating start SLK (linear / spatial measure).
         eg ("slk_from", "slk_to")
         variables (list[str]): A list of column names referring to the continuous numeric variables to be used by the
@@ -33,112 +57,248 @@ def segment_ids_to_maximize_spatial_heterogeneity(
             If nothing is provided then the min length of existing segments will be used as minimum
             and the sum of all segment lengths will be used as the maximum.
             This function only groups rows by adding the index column "seg.id"
+        group_by (Optional[list[str]]): Names of columns identifying separate linear references, such as
+            `["road", "cwy"]`. Each group is segmented independently, but the whole frame is sorted and prepared only
+            once and every group is segmented in the same pass.
+        n_jobs (Optional[int]): Opt-in number of worker processes used to segment the groups in parallel. `-1` uses
+            every CPU. The sorted variables and lengths are placed in shared memory once, and the largest groups are
+            scheduled first. By default all groups are segmented in this process.
+        executor (Optional[Executor]): An existing executor, such as a long-lived `ProcessPoolExecutor`, to segment
+            the groups with instead of creating a new pool. It is not shut down afterwards. A `ThreadPoolExecutor`
+            selects the threads backend.
+        engine (Literal["numpy", "numba"]): `"numba"` computes the split statistic and finds its optimum with a
+            JIT-compiled kernel, which requires the optional dependency numba. Defaults to `"numpy"`.
+        variable_weights (Optional[npt.ArrayLike]): One non-negative weight per variable column, in the same order as
+            `variable_column_names`. The split statistics of the variables are averaged with these weights, instead
+            of equally, when choosing where to split. eg `[2.0, 1.0]` makes the first variable twice as important.
+        profiler (Optional[SegmentationProfile]): Opt-in instrumentation. The time spent in each phase of the run,
+            and the number of bisections, rows scanned, ties and time spent at each level of the split tree, are
+            recorded in it. Nothing is recorded, and nothing is timed, if it is `None`.
+        cache (Optional[SegmentationCache]): Opt-in on-disk cache of the result of each group. A group whose sorted
+            lengths and variables, and segmentation parameters, are the same as in an earlier run is read from the
+            cache instead of being segmented again.
+        return_segments (bool): Also return a table summarising each segment, computed from the sorted rows without
+            a further groupby.
+        cv_threshold (float): Segments with a coefficient of variation above this in any variable are flagged in the
+            `fails_cv_threshold` column of the segment table. Defaults to the `0.25` homogeneity test of AGPT05-19
+            section 9.2.5.
+        dtype (npt.DTypeLike): `np.float32` stores the variables, their prefix sums and the split statistics in float32,
+            halving the memory they use. The int64 row indices and float64 lengths used while bisecting are unchanged,
+            so the peak memory of a run falls by less than half; by about a fifth with one variable and two fifths with
+            twenty. Each road is shifted by its own mean before summing so that the split statistics stay accurate to
+            about `1e-6`, but a split may still differ from float64 where two candidates are that close. Requires
+            `engine="numpy"`. Defaults to `np.float64`.
+        backend (Literal["processes", "threads"]): `"threads"` runs `n_jobs` threads in this process instead of
+            worker processes. The segments of each level of the split tree, across every group, are divided between
+            the threads, so nothing is pickled or copied and a single long road is also segmented in parallel. Use it
+            with `engine="numba"`, whose kernel releases the GIL. How well it scales across cores has not been
+            measured. Defaults to `"processes"`.
         
     Returns:
         The a series containing the integer segment ids. THe series has the the same index as the original DataFrame.
+        Segment ids are unique across all groups. Rows with a missing value in any of the `variable_column_names`
+        receive a missing segment id.
+
+        If `return_segments` is set, a tuple of the series and a DataFrame indexed by segment id. It has the
+        `group_by` columns, the start and end measure, the total `length` and `n_rows` of each segment, the
+        `<variable>_mean`, `<variable>_std` (sample standard deviation) and `<variable>_cv` of each variable, and
+        `fails_cv_threshold`.
+
+        If `data` is a `pyarrow.Table` the segment ids are an int64 `pyarrow.Array`, and if it is a
+        `polars.DataFrame` they are an Int64 `polars.Series`, with a null for each row with a missing value. The
+        segment table is then a table or DataFrame of the same library, with the segment id as its first column.
     """
+    return segment_data_frame(
+        data                         = data,
+        measure                      = measure,
+        variable_column_names        = variable_column_names,
+        allowed_segment_length_range = allowed_segment_length_range,
+        group_by                     = group_by,
+        n_jobs                       = n_jobs,
+        executor                     = executor,
+        engine                       = engine,
+        variable_weights             = variable_weights,
+        profiler                     = profiler,
+        cache                        = cache,
+        return_segments              = return_segments,
+        cv_threshold                 = cv_threshold,
+        dtype                        = dtype,
+        backend                      = backend,
+        split_statistic              = PrefixSums.q_statistic,
+        goal                         = "max",
+    )
 
-    LENGTH_COLUMN_NAME = "___length___"
 
-    measure_start, measure_end = measure
-    original_index = data.index
+def segment_shs_arrays(
+        start:npt.ArrayLike,
+        end:npt.ArrayLike,
+        values:npt.ArrayLike,
+        allowed_segment_length_range:Optional[tuple[float, float]] = None,
+        group:Optional[npt.ArrayLike] = None,
+        n_jobs:Optional[int] = None,
+        executor:Optional[Executor] = None,
+        engine:Literal["numpy", "numba"] = "numpy",
+        variable_weights:Optional[npt.ArrayLike] = None,
+        profiler:Optional[SegmentationProfile] = None,
+        cache:Optional[SegmentationCache] = None,
+        return_segments:bool = False,
+        cv_threshold:float = 0.25,
+        dtype:npt.DTypeLike = np.float64,
+        backend:Literal["processes", "threads"] = "processes",
+    )->Union[npt.NDArray[np.int64], tuple[npt.NDArray[np.int64], dict[str, npt.NDArray]]]:
+    """
+    Array-level version of `segment_ids_to_maximize_spatial_heterogeneity` which does not use pandas.
+
+    Input that is already sorted by `group` and then `start` is detected and is not sorted or copied again.
+
+    Args:
+        start (npt.ArrayLike): `(n_rows,)` start measure (eg SLK) of each row.
+        end (npt.ArrayLike): `(n_rows,)` end measure of each row.
+        values (npt.ArrayLike): `(n_rows, n_variables)` or `(n_rows,)` array of the continuous numeric variables to
+            be used by the segmentation method. Must not contain NaN.
+        allowed_segment_length_range (Optional[tuple[float,float]]): See
+            `segment_ids_to_maximize_spatial_heterogeneity`.
+        group (Optional[npt.ArrayLike]): `(n_rows,)` array of labels (eg integer road codes) identifying separate
+            linear references, each of which is segmented independently.
+        n_jobs, executor, engine, variable_weights, profiler, cache, return_segments, cv_threshold, dtype, backend:
+            See `segment_ids_to_maximize_spatial_heterogeneity`.
 
-    # preprocessing
-    data = (
-        data
-        .dropna(subset=variable_column_names)
-        .sort_values(by=measure_start)
-        .reset_index(drop=True)
+    Returns:
+        An int64 array of segment ids in the same order as the input rows. Segment ids are unique across all groups.
+        If `return_segments` is set, a tuple of the segment ids and a dictionary of arrays with one row per segment
+        in order of segment id; `"segment_id"`, `"start"`, `"end"`, `"length"`, `"n_rows"`, `"first_row"` (the
+        index of the first input row of each segment), `"fails_cv_threshold"`, and the `(n_segments, n_variables)`
+        arrays `"mean"`, `"standard_deviation"` and `"coefficient_of_variation"`.
+    """
+    return segment_arrays(
+        start                        = start,
+        end                          = end,
+        values                       = values,
+        allowed_segment_length_range = allowed_segment_length_range,
+        group                        = group,
+        split_statistic              = PrefixSums.q_statistic,
+        goal                         = "max",
+        n_jobs                       = n_jobs,
+        executor                     = executor,
+        engine                       = engine,
+        variable_weights             = variable_weights,
+        profiler                     = profiler,
+        cache                        = cache,
+        return_segments              = return_segments,
+        cv_threshold                 = cv_threshold,
+        dtype                        = dtype,
+        backend                      = backend,
     )
 
-    # add length # remove system errors of small data
-    data[LENGTH_COLUMN_NAME] = (data[measure_end] - data[measure_start]).round(decimals=10).values
-
-    if allowed_segment_length_range is None:
-        allowed_segment_length_range = (
-            data[LENGTH_COLUMN_NAME].min(),
-            data[LENGTH_COLUMN_NAME].sum()
-        )
-
-    if data[LENGTH_COLUMN_NAME].sum() <= allowed_segment_length_range[1]:
-        return pd.Series(
-            data = np.ones(len(data.index), dtype=np.int64),
-            index = data.index,
-        )
-
-    ## Start original shs function
-    # n_var = len(var)
-    min_allowed_length, max_allowed_length = allowed_segment_length_range
-
-    # first segmentation
-    ss          = optimal_bisections(
-        variables                  = data.loc[:, variable_column_names].values.transpose(),
-        length                     = data[LENGTH_COLUMN_NAME].values,
-        minimum_segment_length     = min_allowed_length,
-        cumulative_split_statistic = cumulative_q,
-        goal                       = "max",
+
+def segment_shs_sweep(
+        data:"pd.DataFrame",
+        measure:tuple[str, str],
+        variable_column_names:list[str],
+        allowed_segment_length_ranges:Sequence[tuple[float, float]],
+        group_by:Optional[list[str]] = None,
+        engine:Literal["numpy", "numba"] = "numpy",
+        variable_weights:Optional[npt.ArrayLike] = None,
+    )->"pd.DataFrame":
+    """
+    Segments `data` with the Spatial Heterogeneity Segmentation (SHS) method once for each allowed segment length
+    range, such as for a sensitivity study of the recommendations of AGPT05 section 9.2.5.
+
+    Sorting and row lengths are computed only once. Ranges with the same minimum share a single split tree, and a
+    split found for one minimum is re-used for every larger minimum that still allows it.
+
+    Args:
+        data, measure, variable_column_names, group_by, engine, variable_weights: See
+            `segment_ids_to_maximize_spatial_heterogeneity`.
+        allowed_segment_length_ranges (Sequence[tuple[float,float]]): The `(minimum, maximum)` allowed segment
+            lengths to segment with. eg `[(0.05, 0.2), (0.05, 0.5), (0.1, 0.5)]`
+
+    Returns:
+        A DataFrame with the same index as `data` and one column of segment ids per allowed segment length range.
+        Each column is identical to the result of `segment_ids_to_maximize_spatial_heterogeneity` for that range.
+        The columns are a MultiIndex of `(minimum_segment_length, maximum_segment_length)`.
+    """
+    return sweep_data_frame(
+        data                          = data,
+        measure                       = measure,
+        variable_column_names         = variable_column_names,
+        allowed_segment_length_ranges = allowed_segment_length_ranges,
+        group_by                      = group_by,
+        split_statistic               = PrefixSums.q_statistic,
+        goal                          = "max",
+        engine                        = engine,
+        variable_weights              = variable_weights,
     )
-    #ss = np.array([3,5])
-    # following segmentation
-    k1               = np.array([0, *ss])
-    k2               = np.array([*ss, len(data.index)])
-    ll               = k2 - k1 # integer length of arrays on each side of split
-    split_boundaries = np.append(0, np.cumsum(ll)) # split boundaries, including 0 and len(data.index)
-    segment_id       = np.repeat(np.arange(0, len(ll)), ll) # segment id for each row of data
-    # segdatalist = np.split(data, segid)
-
-    # NOTE: We are grouping the data wherever _seg2 found a maximum Q value.
-    # Generally there should be only a single maximum, but if there
-    # is an equal maximum at two indices, then there will be more than 2 groups.
-    # in practice this should be vanishingly rare... 
-    # but in future we should come back and prevent this.
-    data_grouped_by_seg                           = data.groupby(segment_id)
-    data_grouped_by_segment_id:list[pd.DataFrame] = [group for _ ,group in data.groupby(segment_id)]
-
-    # lengthdata        = pandas.DataFrame([data.loc[:,length], segid], columns = ["length","seg.id"]))
-    segment_length_summary = data_grouped_by_seg[LENGTH_COLUMN_NAME].sum()
-    segment_length         = segment_length_summary.round(10).values
-    k                      = np.flatnonzero(segment_length > max_allowed_length)
-
-    while(len(k) > 0):
-        sa = [
-            optimal_bisections(
-                variables                  = data_grouped_by_segment_id[x].loc[:,variable_column_names].values.transpose(),
-                length                     = data_grouped_by_segment_id[x][LENGTH_COLUMN_NAME].values,
-                minimum_segment_length     = min_allowed_length,
-                cumulative_split_statistic = cumulative_q,
-                goal                       = "max",
-            )
-            +
-            split_boundaries[x]
-            for x
-            in k
-        ]
-        ss               = np.sort(np.concatenate([ss, *sa]))
-        k1               = np.array([0, *ss])
-        k2               = np.array([*ss, len(data.index)])
-        ll               = k2 - k1
-        split_boundaries = np.append(np.array([0]), np.cumsum(ll))
-        segment_id       = np.repeat(np.arange(0, len(ll)), ll)
-        # segdatalist = np.split(data, segid)
-
-        # we are grouping the data wherever _seg2 found a maximum. generally there should be only a single maximum,
-        # but if there is an equal maximum at two indices, then there will be 3 groups overall.
-        data_grouped_by_segment_id:list[pd.DataFrame] = [group for _ ,group in data.groupby(segment_id)]
-
-        # lengthdata        = pandas.DataFrame([data.loc[:,length], segid], columns = ["length","seg.id"]))
-        segment_length_summary = data[LENGTH_COLUMN_NAME].groupby(segment_id).sum()
-        segment_length         = segment_length_summary.round(10).values
-        k                      = np.flatnonzero(segment_length > max_allowed_length)
-    
-    # # add seg.id
-    k1                          = np.array([0, *ss])
-    k2                          = np.array([*ss, len(data.index)])
-    ll                          = k2 - k1
-    segment_id                  = np.repeat(np.arange(0, len(ll), dtype=np.int64), ll) + 1
-    ## End original shs function
-
-    return pd.Series(
-        index = original_index,
-        data  = segment_id
+
+
+def segment_shs_file(
+        input_path:Union[str, os.PathLike],
+        output_path:Union[str, os.PathLike],
+        measure:tuple[str, str],
+        variable_column_names:list[str],
+        allowed_segment_length_range:tuple[float, float],
+        group_by:list[str],
+        segments_path:Optional[Union[str, os.PathLike]] = None,
+        chunk_size:int = 100_000,
+        segment_id_column_name:str = "segment_id",
+        engine:Literal["numpy", "numba"] = "numpy",
+        variable_weights:Optional[npt.ArrayLike] = None,
+        cv_threshold:float = 0.25,
+        n_jobs:Optional[int] = None,
+        executor:Optional[Executor] = None,
+        dtype:npt.DTypeLike = np.float64,
+        backend:Literal["processes", "threads"] = "processes",
+    )->int:
+    """
+    Segments a CSV or Parquet file with the Spatial Heterogeneity Segmentation (SHS) method without loading the whole
+    file into memory.
+
+    The file is read `chunk_size` rows at a time, and each group is segmented and written out as soon as all of its
+    rows have been read, so the memory used is bounded by the largest group (eg the longest road and carriageway)
+    rather than by the file. The segment ids are the same as those of `segment_ids_to_maximize_spatial_heterogeneity`
+    when the groups are in ascending order in the file.
+
+    Args:
+        input_path (Union[str, os.PathLike]): The file to segment. Files ending in `.parquet` or `.pq` are read as
+            Parquet, which requires the optional dependency pyarrow, and any other file is read as CSV. The rows of
+            each group must be contiguous, eg by sorting the file by the `group_by` columns.
+        output_path (Union[str, os.PathLike]): The file to write the rows of `input_path` to, in the same order, with
+            an added column of segment ids. Its format is chosen by its suffix in the same way.
+        measure, variable_column_names, engine, variable_weights, cv_threshold, dtype: See
+            `segment_ids_to_maximize_spatial_heterogeneity`.
+        allowed_segment_length_range (tuple[float, float]): Minimum and maximum allowed segment lengths. Unlike
+            `segment_ids_to_maximize_spatial_heterogeneity` there is no default, as it would depend on rows which
+            have not yet been read.
+        group_by (list[str]): The columns which identify each group, such as `["road", "cwy"]`.
+        segments_path (Optional[Union[str, os.PathLike]]): If given, the segment table described in
+            `segment_ids_to_maximize_spatial_heterogeneity` is written to this file, with the segment id as its first
+            column.
+        chunk_size (int): The number of rows read at a time.
+        segment_id_column_name (str): The name of the column of segment ids added to `output_path`.
+        n_jobs, executor, backend: See `segment_ids_to_maximize_spatial_heterogeneity`. The groups of each chunk are
+            spread over the worker processes or threads, so `chunk_size` should be large enough to hold many groups.
+
+    Returns:
+        The number of segments written.
+    """
+    _, _, n_segments = segment_file(
+        input_path                   = input_path,
+        output_path                  = output_path,
+        measure                      = measure,
+        variable_column_names        = variable_column_names,
+        allowed_segment_length_range = allowed_segment_length_range,
+        group_by                     = group_by,
+        split_statistic              = PrefixSums.q_statistic,
+        goal                         = "max",
+        segments_path                = segments_path,
+        chunk_size                   = chunk_size,
+        segment_id_column_name       = segment_id_column_name,
+        engine                       = engine,
+        variable_weights             = variable_weights,
+        cv_threshold                 = cv_threshold,
+        n_jobs                       = n_jobs,
+        executor                     = executor,
+        dtype                        = dtype,
+        backend                      = backend,
     )
+    return n_segments
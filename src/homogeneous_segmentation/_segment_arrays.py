@@ -0,0 +1,155 @@
+"""
+This is a private module containing the array-level preprocessing shared by the SHS and MCV methods.
+"""
+from concurrent.futures import Executor
+from functools import partial
+from typing import Callable, Literal, Optional, Union
+import numpy as np
+import numpy.typing as npt
+from ._recursive_bisection import segment_ids_from_split_boundaries
+from ._parallel import parallel_recursive_bisection
+from ._profiling import SegmentationProfile, profile_phase
+from ._cache import SegmentationCache, cached_recursive_bisection
+from ._segment_table import segment_table
+
+
+def _is_sorted(start:npt.NDArray, group:Optional[npt.NDArray]) -> bool:
+    """ True if the rows are already sorted by group, then by start. """
+    if group is None:
+        return bool(np.all(start[1:] >= start[:-1]))
+    same_group = group[1:] == group[:-1]
+    return bool(
+            np.all(same_group | (group[1:] > group[:-1]))
+        and np.all(~same_group | (start[1:] >= start[:-1]))
+    )
+
+
+def prepare_arrays(
+        start  : npt.ArrayLike,
+        end    : npt.ArrayLike,
+        values : npt.ArrayLike,
+        group  : Optional[npt.ArrayLike],
+        dtype  : npt.DTypeLike = np.float64,
+    ) -> tuple[
+        npt.NDArray[np.float64],
+        npt.NDArray[np.float64],
+        npt.NDArray[np.int64],
+        Optional[npt.NDArray[np.int64]],
+    ]:
+    """
+    Validates the input rows and sorts them by `group` then `start`, unless they are detected to already be in that
+    order, in which case `values` is used without being copied (provided it is already an array of `dtype`).
+
+    Returns:
+        A tuple `(values, length, group_boundaries, order)`. `values` is a `(n_rows, n_variables)` matrix and
+        `length` the length of each row, both sorted. `group_boundaries` are the initial split boundaries between
+        groups. `order` is the permutation which sorted the rows, or `None` if they were already sorted.
+    """
+    start  = np.asarray(start, dtype=np.float64)
+    end    = np.asarray(end  , dtype=np.float64)
+    values = np.asarray(values, dtype=dtype)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+    if group is not None:
+        group = np.asarray(group)
+    n_rows = len(start)
+    if values.shape[0] != n_rows or len(end) != n_rows or (group is not None and len(group) != n_rows):
+        raise ValueError("start, end, values and group must all have the same number of rows")
+    if np.isnan(values).any():
+        raise ValueError("values must not contain NaN; drop those rows before segmenting")
+
+    order = None
+    if not _is_sorted(start, group):
+        order  = np.lexsort((start,)) if group is None else np.lexsort((start, group))
+        start  = start [order]
+        end    = end   [order]
+        values = values[order]
+        if group is not None:
+            group = group[order]
+
+    # remove system errors of small data
+    length = np.round(end - start, decimals=10)
+
+    if group is None:
+        group_boundaries = np.array([0, n_rows], dtype=np.int64)
+    else:
+        group_boundaries = np.concatenate([
+            [0],
+            np.flatnonzero(group[1:] != group[:-1]) + 1,
+            [n_rows],
+        ]).astype(np.int64)
+    return values, length, group_boundaries, order
+
+
+def restore_order(segment_id:npt.NDArray, order:Optional[npt.NDArray[np.int64]]) -> npt.NDArray:
+    """ Undoes the sort performed by `prepare_arrays`. """
+    if order is None:
+        return segment_id
+    unsorted_segment_id        = np.empty_like(segment_id)
+    unsorted_segment_id[order] = segment_id
+    return unsorted_segment_id
+
+
+def segment_arrays(
+        start                        : npt.ArrayLike,
+        end                          : npt.ArrayLike,
+        values                       : npt.ArrayLike,
+        allowed_segment_length_range : Optional[tuple[float, float]],
+        group                        : Optional[npt.ArrayLike],
+        split_statistic              : Callable[..., npt.NDArray[np.float64]],
+        goal                         : Literal["min", "max"],
+        n_jobs                       : Optional[int]                   = None,
+        executor                     : Optional[Executor]              = None,
+        engine                       : Literal["numpy", "numba"]       = "numpy",
+        variable_weights             : Optional[npt.ArrayLike]         = None,
+        profiler                     : Optional[SegmentationProfile]   = None,
+        cache                        : Optional[SegmentationCache]     = None,
+        return_segments              : bool                            = False,
+        cv_threshold                 : float                           = 0.25,
+        dtype                        : npt.DTypeLike                   = np.float64,
+        backend                      : Literal["processes", "threads"] = "processes",
+    ) -> Union[npt.NDArray[np.int64], tuple[npt.NDArray[np.int64], dict[str, npt.NDArray]]]:
+    """
+    Segments rows described by NumPy arrays. Rows are sorted by `group` then `start` as described in
+    `prepare_arrays`. If a `profiler` is given, the time spent in each phase and the cost of each level of the split
+    tree are recorded in it. If a `cache` is given, groups found in it are not segmented again; see
+    `cached_recursive_bisection`. `n_jobs`, `executor` and `backend` are passed to `parallel_recursive_bisection`.
+    With `dtype=np.float32` the variables are stored and segmented in float32 mode; see `PrefixSums`.
+
+    Returns:
+        An int64 array of segment ids, starting from `1` and unique across all groups, in the same order as the
+        input rows. If `return_segments` is set, a tuple of the segment ids and their `segment_table`.
+    """
+    with profile_phase(profiler, "prepare"):
+        values, length, group_boundaries, order = prepare_arrays(start, end, values, group, dtype)
+
+    if allowed_segment_length_range is None:
+        allowed_segment_length_range = (
+            length.min(),
+            length.sum()
+        )
+
+    if cache is None:
+        bisection = parallel_recursive_bisection
+    else:
+        bisection = partial(cached_recursive_bisection, cache)
+    with profile_phase(profiler, "bisect"):
+        split_boundaries = bisection(
+            values                       = values,
+            length                       = length,
+            allowed_segment_length_range = allowed_segment_length_range,
+            split_statistic              = split_statistic,
+            goal                         = goal,
+            initial_split_boundaries     = group_boundaries,
+            n_jobs                       = n_jobs,
+            executor                     = executor,
+            engine                       = engine,
+            variable_weights             = variable_weights,
+            profiler                     = profiler,
+            backend                      = backend,
+        )
+    with profile_phase(profiler, "output"):
+        segment_id = restore_order(segment_ids_from_split_boundaries(split_boundaries), order)
+        if not return_segments:
+            return segment_id
+        return segment_id, segment_table(start, end, values, length, split_boundaries, order, cv_threshold)
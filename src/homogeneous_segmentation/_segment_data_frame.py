@@ -0,0 +1,187 @@
+"""
+This is a private module containing the DataFrame entry point shared by the SHS and MCV methods.
+"""
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Callable, Literal, Optional, Union
+import numpy as np
+import numpy.typing as npt
+from ._segment_arrays import segment_arrays
+from ._profiling import SegmentationProfile, profile_phase
+from ._cache import SegmentationCache
+from ._frame_interchange import (
+    DataFrameLike,
+    SeriesLike,
+    column_to_numpy,
+    frame_kind,
+    frame_like,
+    group_codes,
+    segment_ids_like,
+    variable_matrix,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def extract_arrays(
+        data                  : DataFrameLike,
+        measure               : tuple[str, str],
+        variable_column_names : list[str],
+        group_by              : Optional[list[str]],
+        dtype                 : npt.DTypeLike = np.float64,
+    ) -> tuple[
+        npt.NDArray[np.float64],
+        npt.NDArray[np.float64],
+        npt.NDArray[np.float64],
+        Optional[npt.NDArray[np.int64]],
+        npt.NDArray[np.bool_],
+    ]:
+    """
+    Extracts the `(start, end, values, group, is_complete)` arrays from `data`, which may be a `pd.DataFrame`,
+    `pyarrow.Table` or `polars.DataFrame`. Rows with a missing value in any of the `variable_column_names` are dropped
+    from the first four arrays, and are `False` in `is_complete`. The variables are read as `dtype`.
+    """
+    measure_start, measure_end = measure
+
+    values = variable_matrix(data, variable_column_names, dtype)
+    start  = np.asarray(column_to_numpy(data, measure_start), dtype=np.float64)
+    end    = np.asarray(column_to_numpy(data, measure_end  ), dtype=np.float64)
+    if group_by:
+        group = group_codes(data, group_by)
+    else:
+        group = None
+
+    # drop rows with missing values
+    is_complete = ~np.isnan(values).any(axis=1)
+    if not is_complete.all():
+        values = values[is_complete]
+        start  = start [is_complete]
+        end    = end   [is_complete]
+        if group is not None:
+            group = group[is_complete]
+    return start, end, values, group, is_complete
+
+
+def to_series(segment_id:npt.NDArray, is_complete:npt.NDArray[np.bool_], index:"pd.Index") -> "pd.Series":
+    """ Aligns `segment_id` to `index`. Rows dropped by `extract_arrays` receive a missing segment id. """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    if not is_complete.all():
+        segment_id = (
+            pd.Series(segment_id, index=np.flatnonzero(is_complete))
+            .reindex(np.arange(len(index)))
+            .to_numpy()
+        )
+    return pd.Series(
+        index = index,
+        data  = segment_id
+    )
+
+
+def to_output(segment_id:npt.NDArray, is_complete:npt.NDArray[np.bool_], data:DataFrameLike) -> SeriesLike:
+    """ `to_series` aligned to the index of a `pd.DataFrame`, or an Arrow array or polars series of the same length
+    as a `pyarrow.Table` or `polars.DataFrame`. """
+    if frame_kind(data) == "pandas":
+        return to_series(segment_id, is_complete, data.index)
+    return segment_ids_like(data, segment_id, is_complete)
+
+
+def segment_table_frame(
+        table                 : dict[str, npt.NDArray],
+        data                  : DataFrameLike,
+        measure               : tuple[str, str],
+        variable_column_names : list[str],
+        group_by              : Optional[list[str]],
+        is_complete           : npt.NDArray[np.bool_],
+    ) -> DataFrameLike:
+    """
+    Converts a `segment_table` to a DataFrame indexed by segment id. The `group_by` columns are taken from the first
+    row of each segment, the measure columns keep their names, and each statistic of each variable is a column named
+    `"<variable>_mean"`, `"<variable>_std"` or `"<variable>_cv"`.
+
+    If `data` is a `pyarrow.Table` or `polars.DataFrame`, the result is one too, with the segment id as its first
+    column instead of its index.
+    """
+    measure_start, measure_end = measure
+    columns = {}
+    if group_by:
+        # rows dropped by `extract_arrays` are skipped when indexing into `data`
+        first_row = np.flatnonzero(is_complete)[table["first_row"]]
+        for column_name in group_by:
+            columns[column_name] = column_to_numpy(data, column_name)[first_row]
+    columns[measure_start] = table["start"]
+    columns[measure_end  ] = table["end"]
+    columns["length"     ] = table["length"]
+    columns["n_rows"     ] = table["n_rows"]
+    for i, column_name in enumerate(variable_column_names):
+        columns[f"{column_name}_mean"] = table["mean"][:, i]
+        columns[f"{column_name}_std" ] = table["standard_deviation"][:, i]
+        columns[f"{column_name}_cv"  ] = table["coefficient_of_variation"][:, i]
+    columns["fails_cv_threshold"] = table["fails_cv_threshold"]
+    if frame_kind(data) != "pandas":
+        return frame_like(data, {"segment_id": table["segment_id"], **columns})
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    return pd.DataFrame(columns, index=pd.Index(table["segment_id"], name="segment_id"))
+
+
+def segment_data_frame(
+        data                         : DataFrameLike,
+        measure                      : tuple[str, str],
+        variable_column_names        : list[str],
+        allowed_segment_length_range : Optional[tuple[float, float]],
+        group_by                     : Optional[list[str]],
+        split_statistic              : Callable[..., npt.NDArray[np.float64]],
+        goal                         : Literal["min", "max"],
+        n_jobs                       : Optional[int]                   = None,
+        executor                     : Optional[Executor]              = None,
+        engine                       : Literal["numpy", "numba"]       = "numpy",
+        variable_weights             : Optional[npt.ArrayLike]         = None,
+        profiler                     : Optional[SegmentationProfile]   = None,
+        cache                        : Optional[SegmentationCache]     = None,
+        return_segments              : bool                            = False,
+        cv_threshold                 : float                           = 0.25,
+        dtype                        : npt.DTypeLike                   = np.float64,
+        backend                      : Literal["processes", "threads"] = "processes",
+    ) -> Union[SeriesLike, tuple[SeriesLike, DataFrameLike]]:
+    """
+    Extracts NumPy arrays from `data` and segments them with `segment_arrays`. Every group (or the whole frame if
+    `group_by` is `None`) is segmented in a single pass of `recursive_bisection`. If `n_jobs` or `executor` is
+    given, the groups are instead spread over a pool of worker processes, or threads if `backend` is `"threads"`, by
+    `parallel_recursive_bisection`.
+
+    Returns:
+        A series of integer segment ids, unique across all groups, with the same index as `data`. Rows with a missing
+        value in any of the `variable_column_names` are not segmented and receive a missing segment id. If
+        `return_segments` is set, a tuple of the series and its `segment_table_frame`. See `to_output` for a
+        `pyarrow.Table` or `polars.DataFrame`.
+    """
+    with profile_phase(profiler, "extract"):
+        start, end, values, group, is_complete = extract_arrays(
+            data, measure, variable_column_names, group_by, dtype
+        )
+    result = segment_arrays(
+        start                        = start,
+        end                          = end,
+        values                       = values,
+        allowed_segment_length_range = allowed_segment_length_range,
+        group                        = group,
+        split_statistic              = split_statistic,
+        goal                         = goal,
+        n_jobs                       = n_jobs,
+        executor                     = executor,
+        engine                       = engine,
+        variable_weights             = variable_weights,
+        profiler                     = profiler,
+        cache                        = cache,
+        return_segments              = return_segments,
+        cv_threshold                 = cv_threshold,
+        dtype                        = dtype,
+        backend                      = backend,
+    )
+    with profile_phase(profiler, "output"):
+        if not return_segments:
+            return to_output(result, is_complete, data)
+        segment_id, table = result
+        return (
+            to_output(segment_id, is_complete, data),
+            segment_table_frame(table, data, measure, variable_column_names, group_by, is_complete),
+        )
@@ -0,0 +1,218 @@
+"""
+This is a private module containing the file entry point shared by the SHS and MCV methods, which segments a CSV or
+Parquet file too large to hold in memory.
+
+The file is read in chunks. Rows must be sorted so that each group (such as each road and carriageway) is contiguous,
+so every group except the last in the rows read so far is complete and can be segmented and written out. Only the
+rows of the last, possibly incomplete, group are kept until the next chunk is read, so the memory used is bounded by
+the largest group plus one chunk rather than by the whole file.
+"""
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterator, Literal, Optional, Union
+import numpy as np
+import numpy.typing as npt
+from ._segment_data_frame import segment_data_frame
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def _file_format(path:Path) -> Literal["csv", "parquet"]:
+    return "parquet" if path.suffix.lower() in (".parquet", ".pq") else "csv"
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow                  # pylint: disable=import-outside-toplevel
+        import pyarrow.parquet as pq    # pylint: disable=import-outside-toplevel
+    except ImportError as error:
+        raise ImportError(
+            'Reading or writing Parquet files requires the optional dependency pyarrow. '
+            'Install it with `pip install homogeneous-segmentation[parquet]`, or use CSV files.'
+        ) from error
+    return pyarrow, pq
+
+
+def read_chunks(path:Path, chunk_size:int) -> Iterator["pd.DataFrame"]:
+    """ Reads a CSV or Parquet file, depending on its suffix, `chunk_size` rows at a time. """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    if _file_format(path) == "parquet":
+        _, pq = _import_pyarrow()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        with pd.read_csv(path, chunksize=chunk_size) as reader:
+            yield from reader
+
+
+class ChunkWriter:
+    """ Appends DataFrames to a CSV or Parquet file, depending on its suffix. The file is created by the first write,
+    and a Parquet file is only complete once `close` is called. """
+
+    def __init__(self, path:Path):
+        self.path        = path
+        self.file_format = _file_format(path)
+        self._writer     = None
+        self._is_empty   = True
+
+    def write(self, data:"pd.DataFrame"):
+        if self.file_format == "parquet":
+            pyarrow, pq = _import_pyarrow()
+            if self._writer is None:
+                table = pyarrow.Table.from_pandas(data, preserve_index=False)
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                # later chunks must match the schema of the first, even if pandas infers a different dtype for them
+                table = pyarrow.Table.from_pandas(data, schema=self._writer.schema, preserve_index=False)
+            self._writer.write_table(table)
+        else:
+            data.to_csv(self.path, mode="w" if self._is_empty else "a", header=self._is_empty, index=False)
+        self._is_empty = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _run_starts(keys:"pd.DataFrame") -> npt.NDArray[np.int64]:
+    """ The positions at which the `keys` differ from the previous row. Missing keys are equal to each other. """
+    current  = keys.iloc[1:].reset_index(drop=True)
+    previous = keys.iloc[:-1].reset_index(drop=True)
+    differs  = (current != previous) & ~(current.isna() & previous.isna())
+    return np.concatenate([[0], np.flatnonzero(differs.any(axis=1).to_numpy()) + 1])
+
+
+def _key(row:tuple) -> tuple:
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    return tuple(None if pd.isna(value) else value for value in row)
+
+
+def segment_file(
+        input_path                   : Union[str, os.PathLike],
+        output_path                  : Union[str, os.PathLike],
+        measure                      : tuple[str, str],
+        variable_column_names        : list[str],
+        allowed_segment_length_range : tuple[float, float],
+        group_by                     : list[str],
+        split_statistic              : Callable[..., npt.NDArray[np.float64]],
+        goal                         : Literal["min", "max"],
+        segments_path                : Optional[Union[str, os.PathLike]] = None,
+        chunk_size                   : int                               = 100_000,
+        segment_id_column_name       : str                               = "segment_id",
+        engine                       : Literal["numpy", "numba"]         = "numpy",
+        variable_weights             : Optional[npt.ArrayLike]           = None,
+        cv_threshold                 : float                             = 0.25,
+        n_jobs                       : Optional[int]                     = None,
+        executor                     : Optional[Executor]                = None,
+        dtype                        : npt.DTypeLike                     = np.float64,
+        backend                      : Literal["processes", "threads"]   = "processes",
+    ) -> tuple[int, int, int]:
+    """
+    Segments the rows of `input_path` one complete set of groups at a time with `segment_data_frame`, appending them
+    with their segment ids to `output_path`, and their segment table to `segments_path` if it is given. Segment ids
+    are offset by the number of segments already written, so they are unique across the whole file.
+
+    If `n_jobs` or `executor` is given, the groups of each chunk are spread over a pool of worker processes by
+    `parallel_recursive_bisection`, or the segments of each level over a pool of threads if `backend` is
+    `"threads"`. A pool created for `n_jobs` is shared by every chunk.
+
+    Returns:
+        A tuple of the number of rows, groups and segments written.
+
+    Raises:
+        ValueError: If the rows of a group are not contiguous in `input_path`.
+    """
+    input_path  = Path(input_path).expanduser()
+    output_path = Path(output_path).expanduser()
+    if not group_by:
+        raise ValueError("group_by is required to segment a file one group at a time")
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    group_by   = list(group_by)
+    n_rows     = 0
+    n_segments = 0
+    seen_keys  = set()
+
+    def segment_partition(partition:"pd.DataFrame", output_writer:ChunkWriter, segment_writer:Optional[ChunkWriter]):
+        nonlocal n_rows, n_segments
+        # the groups of a partition must not have appeared in an earlier partition, or in each other
+        keys = [
+            _key(row)
+            for row in partition[group_by].iloc[_run_starts(partition[group_by])].itertuples(index=False, name=None)
+        ]
+        if len(set(keys)) != len(keys) or not seen_keys.isdisjoint(keys):
+            raise ValueError(
+                f"the rows of {str(input_path)!r} must be sorted so that the rows of each group in "
+                f"group_by={group_by} are contiguous"
+            )
+        seen_keys.update(keys)
+
+        # a single group cannot be spread over worker processes, and is quicker to segment in this process, but the
+        # threads backend divides the segments of each level of the group between its threads
+        is_parallel = len(keys) > 1 or backend == "threads"
+        segment_id, segments = segment_data_frame(
+            data                         = partition,
+            measure                      = measure,
+            variable_column_names        = variable_column_names,
+            allowed_segment_length_range = allowed_segment_length_range,
+            group_by                     = group_by,
+            split_statistic              = split_statistic,
+            goal                         = goal,
+            engine                       = engine,
+            variable_weights             = variable_weights,
+            n_jobs                       = n_jobs if is_parallel else None,
+            executor                     = executor if is_parallel else None,
+            return_segments              = True,
+            cv_threshold                 = cv_threshold,
+            dtype                        = dtype,
+            backend                      = backend,
+        )
+        output_writer.write(partition.assign(**{segment_id_column_name: (segment_id + n_segments).astype("Int64")}))
+        if segment_writer is not None:
+            segments.index = segments.index + n_segments
+            segment_writer.write(segments.reset_index())
+        n_rows     += len(partition)
+        n_segments += len(segments)
+
+    if n_jobs is not None and n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+    with ExitStack() as stack:
+        if executor is None and n_jobs is not None and n_jobs > 1:
+            pool     = ThreadPoolExecutor if backend == "threads" else ProcessPoolExecutor
+            executor = stack.enter_context(pool(max_workers=n_jobs))
+        output_writer  = stack.enter_context(ChunkWriter(output_path))
+        segment_writer = None
+        if segments_path is not None:
+            segment_writer = stack.enter_context(ChunkWriter(Path(segments_path).expanduser()))
+
+        # the pieces of the last group read so far, which are only concatenated once the group is complete, so that a
+        # group spanning many chunks is copied once rather than once per chunk
+        pending = []
+        for chunk in read_chunks(input_path, chunk_size):
+            if len(chunk) == 0:
+                continue
+            # every group but the last is complete, as the rows are sorted
+            last_group_start = _run_starts(chunk[group_by])[-1]
+            continues_group  = pending and (
+                _key(tuple(pending[-1][group_by].iloc[-1])) == _key(tuple(chunk[group_by].iloc[0]))
+            )
+            if continues_group and last_group_start == 0:
+                pending.append(chunk)
+                continue
+            if last_group_start > 0:
+                pending.append(chunk.iloc[:last_group_start])
+            if pending:
+                segment_partition(pd.concat(pending, ignore_index=True), output_writer, segment_writer)
+            pending = [chunk.iloc[last_group_start:]]
+        if pending:
+            segment_partition(pd.concat(pending, ignore_index=True), output_writer, segment_writer)
+    return n_rows, len(seen_keys), n_segments
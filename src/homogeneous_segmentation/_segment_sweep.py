@@ -0,0 +1,106 @@
+"""
+This is a private module containing the parameter sweep shared by the SHS and MCV methods, which segments the same
+rows with many allowed segment length ranges.
+
+Sorting and row lengths are computed once. Ranges with the same minimum share one split tree, built down to the
+smallest of their maximums and then cut at each maximum, as in `SegmentationHierarchy`. Between different minimums,
+the optimal split of every bisected segment is remembered and re-used whenever it is still feasible.
+"""
+from typing import TYPE_CHECKING, Callable, Literal, Optional, Sequence, Union
+import numpy as np
+import numpy.typing as npt
+from ._recursive_bisection import bisection_engine, bisection_tree, segment_ids_from_split_boundaries
+from ._segment_arrays import prepare_arrays, restore_order
+from ._shared_bisections import SharedBisections
+from ._segment_data_frame import extract_arrays
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def sweep_arrays(
+        start                         : npt.ArrayLike,
+        end                           : npt.ArrayLike,
+        values                        : npt.ArrayLike,
+        allowed_segment_length_ranges : Sequence[tuple[float, float]],
+        group                         : Optional[npt.ArrayLike],
+        split_statistic               : Callable[..., npt.NDArray[np.float64]],
+        goal                          : Literal["min", "max"],
+        engine                        : Union[Literal["numpy", "numba"], Callable] = "numpy",
+        variable_weights              : Optional[npt.ArrayLike]                    = None,
+    ) -> npt.NDArray[np.int64]:
+    """
+    Segments rows described by NumPy arrays once for each of the `allowed_segment_length_ranges`.
+
+    Returns:
+        An `(n_rows, n_ranges)` int64 array. Column `j` holds the segment ids which `segment_arrays` would return for
+        `allowed_segment_length_ranges[j]`, in the same order as the input rows.
+    """
+    values, length, group_boundaries, order = prepare_arrays(start, end, values, group)
+    bisect = SharedBisections(bisection_engine(engine))
+
+    segment_id = np.empty((len(length), len(allowed_segment_length_ranges)), dtype=np.int64)
+    minimums   = np.array([minimum for minimum, _ in allowed_segment_length_ranges], dtype=np.float64)
+    maximums   = np.array([maximum for _, maximum in allowed_segment_length_ranges], dtype=np.float64)
+    for minimum in np.unique(minimums):
+        j = np.flatnonzero(minimums == minimum)
+        split_boundaries, parent_length = bisection_tree(
+            values                       = values,
+            length                       = length,
+            allowed_segment_length_range = (minimum, maximums[j].min()),
+            split_statistic              = split_statistic,
+            goal                         = goal,
+            initial_split_boundaries     = group_boundaries,
+            engine                       = bisect,
+            variable_weights             = variable_weights,
+        )
+        for column in j:
+            segment_id[:, column] = restore_order(
+                segment_ids_from_split_boundaries(split_boundaries[parent_length > maximums[column]]),
+                order,
+            )
+    return segment_id
+
+
+def sweep_data_frame(
+        data                          : "pd.DataFrame",
+        measure                       : tuple[str, str],
+        variable_column_names         : list[str],
+        allowed_segment_length_ranges : Sequence[tuple[float, float]],
+        group_by                      : Optional[list[str]],
+        split_statistic               : Callable[..., npt.NDArray[np.float64]],
+        goal                          : Literal["min", "max"],
+        engine                        : Literal["numpy", "numba"] = "numpy",
+        variable_weights              : Optional[npt.ArrayLike]   = None,
+    ) -> "pd.DataFrame":
+    """
+    Extracts NumPy arrays from `data` and segments them with `sweep_arrays`.
+
+    Returns:
+        A DataFrame with the same index as `data` and one column of segment ids per allowed segment length range.
+        The columns are a MultiIndex of `(minimum_segment_length, maximum_segment_length)`.
+    """
+    start, end, values, group, is_complete = extract_arrays(data, measure, variable_column_names, group_by)
+    segment_id = sweep_arrays(
+        start                         = start,
+        end                           = end,
+        values                        = values,
+        allowed_segment_length_ranges = allowed_segment_length_ranges,
+        group                         = group,
+        split_statistic               = split_statistic,
+        goal                          = goal,
+        engine                        = engine,
+        variable_weights              = variable_weights,
+    )
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    columns = pd.MultiIndex.from_tuples(
+        [tuple(allowed_segment_length_range) for allowed_segment_length_range in allowed_segment_length_ranges],
+        names = ["minimum_segment_length", "maximum_segment_length"],
+    )
+    if not is_complete.all():
+        return (
+            pd.DataFrame(segment_id, index=np.flatnonzero(is_complete), columns=columns)
+            .reindex(np.arange(len(data.index)))
+            .set_axis(data.index, axis=0)
+        )
+    return pd.DataFrame(segment_id, index=data.index, columns=columns)
@@ -0,0 +1,90 @@
+"""
+This is a private module containing the segment table; summary statistics of each segment, computed from the sorted
+rows and split boundaries that the segmentation has already produced, so that no groupby is needed afterwards.
+
+`homogeneous_segmentation._segment_data_frame.segment_table_frame` converts it to a DataFrame.
+"""
+from typing import Optional
+import numpy as np
+import numpy.typing as npt
+
+
+def segment_table(
+        start            : npt.ArrayLike,
+        end              : npt.ArrayLike,
+        values           : npt.NDArray[np.float64],
+        length           : npt.NDArray[np.float64],
+        split_boundaries : npt.NDArray[np.int64],
+        order            : Optional[npt.NDArray[np.int64]],
+        cv_threshold     : float,
+    ) -> dict[str, npt.NDArray]:
+    """
+    Summarises each segment with `np.add.reduceat` over the sorted rows.
+
+    Args:
+        start, end (npt.ArrayLike): `(n_rows,)` start and end measure of each row, in input order.
+        values (npt.NDArray[np.float64]): The sorted `(n_rows, n_variables)` matrix returned by `prepare_arrays`.
+        length (npt.NDArray[np.float64]): The sorted length of each row returned by `prepare_arrays`.
+        split_boundaries (npt.NDArray[np.int64]): Split boundaries into the sorted rows.
+        order (Optional[npt.NDArray[np.int64]]): The permutation returned by `prepare_arrays`.
+        cv_threshold (float): Segments with a coefficient of variation above this in any variable are flagged.
+
+    Returns:
+        A dictionary of arrays with one row per segment, in order of segment id;
+
+        - `"segment_id"`, `"start"`, `"end"`, `"length"` (total length of the rows) and `"n_rows"`.
+        - `"first_row"`, the index of the first row of each segment in input order.
+        - `"mean"`, `"standard_deviation"` and `"coefficient_of_variation"`, each `(n_segments, n_variables)`. These
+          are the mean of the rows and their sample standard deviation, as in the MCV method and a pandas groupby.
+          The standard deviation of a single row is NaN. The coefficient of variation is the standard deviation over
+          the absolute value of the mean, as in the P statistic, so it is never negative, and it is infinite where
+          the mean is zero and the rows vary.
+        - `"fails_cv_threshold"`, True where the coefficient of variation of any variable is above `cv_threshold`.
+    """
+    n_rows, n_variables = values.shape
+    if n_rows == 0:
+        split_boundaries = np.array([0], dtype=np.int64)
+    segment_start  = split_boundaries[:-1]
+    segment_n_rows = np.diff(split_boundaries)
+    n_segments     = len(segment_start)
+
+    first = segment_start
+    last  = segment_start + segment_n_rows - 1
+    if order is not None:
+        first = order[first]
+        last  = order[last]
+
+    segment_sum       = np.zeros((n_segments, n_variables))
+    sum_of_deviations = np.zeros((n_segments, n_variables))
+    segment_length    = np.zeros(n_segments)
+    if n_segments:
+        segment_sum    = np.add.reduceat(values, segment_start, axis=0, dtype=np.float64)
+        segment_length = np.round(np.add.reduceat(length, segment_start), decimals=10)
+    n    = segment_n_rows[:, np.newaxis]
+    mean = segment_sum / n
+    if n_segments:
+        # deviations from the mean of each segment, rather than the difference of two sums, so that the standard
+        # deviation is as accurate as a groupby. Differences of `PrefixSums` cancel badly for a short segment far
+        # along a long road with a large mean; 8 row segments of a 200,000 row road of mean 1000 and standard
+        # deviation 5 are off by up to 7e-6 that way, against 1e-15 here, for one extra pass over the rows.
+        sum_of_deviations = np.add.reduceat(
+            (values - np.repeat(mean, segment_n_rows, axis=0))**2.0,
+            segment_start,
+            axis = 0,
+        )
+    with np.errstate(invalid='ignore', divide='ignore'):
+        standard_deviation       = np.sqrt(sum_of_deviations / np.where(n > 1, n - 1, np.nan))
+        coefficient_of_variation = standard_deviation / np.abs(mean)
+    return {
+        "segment_id"               : np.arange(1, n_segments + 1, dtype=np.int64),
+        "start"                    : np.asarray(start, dtype=np.float64)[first],
+        "end"                      : np.asarray(end  , dtype=np.float64)[last],
+        "length"                   : segment_length,
+        "n_rows"                   : segment_n_rows,
+        "first_row"                : first,
+        "mean"                     : mean,
+        "standard_deviation"       : standard_deviation,
+        "coefficient_of_variation" : coefficient_of_variation,
+        "fails_cv_threshold"       : np.any(coefficient_of_variation > cv_threshold, axis=1),
+    }
+
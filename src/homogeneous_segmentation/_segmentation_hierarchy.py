@@ -0,0 +1,208 @@
+"""
+This is a private module containing `SegmentationHierarchy`, the complete split tree of a segmentation.
+
+The maximum allowed segment length only decides where top-down bisection stops; it has no effect on where any
+segment is split. The tree is therefore built once, bisecting down to the minimum allowed segment length, and the
+segmentation for any maximum allowed segment length is a cut of that tree.
+"""
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Callable, Literal, Optional, Union
+import numpy as np
+import numpy.typing as npt
+from ._prefix_sums import PrefixSums
+from ._recursive_bisection import segment_ids_from_split_boundaries
+from ._parallel import parallel_bisection_tree
+from ._segment_arrays import prepare_arrays, restore_order
+from ._segment_data_frame import extract_arrays, to_series
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class SegmentationHierarchy:
+    """ Every split made by the SHS or MCV method, down to the minimum allowed segment length.
+
+    Use `maximize_spatial_heterogeneity` or `minimize_coefficient_of_variation` to build a hierarchy, and then
+    `segment_ids` to cut it at any number of maximum allowed segment lengths without re-evaluating the split
+    statistic.
+
+    Attributes:
+        split_boundaries (npt.NDArray[np.int64]): Every split boundary in the tree, as row indices into the sorted
+            rows.
+        parent_length (npt.NDArray[np.float64]): For each split boundary, the length of the segment which was
+            bisected to create it, or `inf` for the boundaries between groups.
+        minimum_segment_length (float): The minimum allowed segment length the tree was built with.
+    """
+
+    def __init__(
+            self,
+            split_boundaries       : npt.NDArray[np.int64],
+            parent_length          : npt.NDArray[np.float64],
+            minimum_segment_length : float,
+            order                  : Optional[npt.NDArray[np.int64]] = None,
+            is_complete            : Optional[npt.NDArray[np.bool_]] = None,
+            index                  : Optional["pd.Index"]            = None,
+        ):
+        self.split_boundaries       = split_boundaries
+        self.parent_length          = parent_length
+        self.minimum_segment_length = minimum_segment_length
+        self._order                 = order
+        self._is_complete           = is_complete
+        self._index                 = index
+
+    @classmethod
+    def _build(
+            cls,
+            start                  : npt.ArrayLike,
+            end                    : npt.ArrayLike,
+            values                 : npt.ArrayLike,
+            minimum_segment_length : Optional[float],
+            group                  : Optional[npt.ArrayLike],
+            split_statistic        : Callable[..., npt.NDArray[np.float64]],
+            goal                   : Literal["min", "max"],
+            n_jobs                 : Optional[int],
+            executor               : Optional[Executor],
+            engine                 : Literal["numpy", "numba"],
+            variable_weights       : Optional[npt.ArrayLike],
+        ) -> "SegmentationHierarchy":
+        values, length, group_boundaries, order = prepare_arrays(start, end, values, group)
+        if minimum_segment_length is None:
+            minimum_segment_length = length.min()
+        # every segment is longer than a maximum length of -inf, so bisection only stops at the minimum length
+        split_boundaries, parent_length = parallel_bisection_tree(
+            values                       = values,
+            length                       = length,
+            allowed_segment_length_range = (minimum_segment_length, -np.inf),
+            split_statistic              = split_statistic,
+            goal                         = goal,
+            initial_split_boundaries     = group_boundaries,
+            n_jobs                       = n_jobs,
+            executor                     = executor,
+            engine                       = engine,
+            variable_weights             = variable_weights,
+        )
+        return cls(split_boundaries, parent_length, minimum_segment_length, order)
+
+    @classmethod
+    def _build_from_data_frame(
+            cls,
+            data                   : "pd.DataFrame",
+            measure                : tuple[str, str],
+            variable_column_names  : list[str],
+            minimum_segment_length : Optional[float],
+            group_by               : Optional[list[str]],
+            split_statistic        : Callable[..., npt.NDArray[np.float64]],
+            goal                   : Literal["min", "max"],
+            n_jobs                 : Optional[int],
+            executor               : Optional[Executor],
+            engine                 : Literal["numpy", "numba"],
+            variable_weights       : Optional[npt.ArrayLike],
+        ) -> "SegmentationHierarchy":
+        start, end, values, group, is_complete = extract_arrays(data, measure, variable_column_names, group_by)
+        hierarchy = cls._build(
+            start                  = start,
+            end                    = end,
+            values                 = values,
+            minimum_segment_length = minimum_segment_length,
+            group                  = group,
+            split_statistic        = split_statistic,
+            goal                   = goal,
+            n_jobs                 = n_jobs,
+            executor               = executor,
+            engine                 = engine,
+            variable_weights       = variable_weights,
+        )
+        hierarchy._is_complete = is_complete
+        hierarchy._index       = data.index
+        return hierarchy
+
+    @classmethod
+    def maximize_spatial_heterogeneity(
+            cls,
+            data                   : "pd.DataFrame",
+            measure                : tuple[str, str],
+            variable_column_names  : list[str],
+            minimum_segment_length : Optional[float]           = None,
+            group_by               : Optional[list[str]]       = None,
+            n_jobs                 : Optional[int]             = None,
+            executor               : Optional[Executor]        = None,
+            engine                 : Literal["numpy", "numba"] = "numpy",
+            variable_weights       : Optional[npt.ArrayLike]   = None,
+        ) -> "SegmentationHierarchy":
+        """
+        Builds the hierarchy of the Spatial Heterogeneity Segmentation (SHS) method. The arguments are the same as
+        `segment_ids_to_maximize_spatial_heterogeneity`, except that only the minimum of the allowed segment length
+        range is given. It defaults to the length of the shortest row.
+        """
+        return cls._build_from_data_frame(
+            data                   = data,
+            measure                = measure,
+            variable_column_names  = variable_column_names,
+            minimum_segment_length = minimum_segment_length,
+            group_by               = group_by,
+            split_statistic        = PrefixSums.q_statistic,
+            goal                   = "max",
+            n_jobs                 = n_jobs,
+            executor               = executor,
+            engine                 = engine,
+            variable_weights       = variable_weights,
+        )
+
+    @classmethod
+    def minimize_coefficient_of_variation(
+            cls,
+            data                   : "pd.DataFrame",
+            measure                : tuple[str, str],
+            variable_column_names  : list[str],
+            minimum_segment_length : Optional[float]           = None,
+            group_by               : Optional[list[str]]       = None,
+            n_jobs                 : Optional[int]             = None,
+            executor               : Optional[Executor]        = None,
+            engine                 : Literal["numpy", "numba"] = "numpy",
+            variable_weights       : Optional[npt.ArrayLike]   = None,
+        ) -> "SegmentationHierarchy":
+        """
+        Builds the hierarchy of the Minimize Coefficient of Variation (MCV) method. The arguments are the same as
+        `segment_ids_to_minimize_coefficient_of_variation`, except that only the minimum of the allowed segment
+        length range is given. It defaults to the length of the shortest row.
+        """
+        return cls._build_from_data_frame(
+            data                   = data,
+            measure                = measure,
+            variable_column_names  = variable_column_names,
+            minimum_segment_length = minimum_segment_length,
+            group_by               = group_by,
+            split_statistic        = PrefixSums.p_statistic,
+            goal                   = "min",
+            n_jobs                 = n_jobs,
+            executor               = executor,
+            engine                 = engine,
+            variable_weights       = variable_weights,
+        )
+
+    def split_boundaries_at(self, maximum_segment_length:float) -> npt.NDArray[np.int64]:
+        """
+        The split boundaries, into the sorted rows, of the segmentation with the given maximum allowed segment
+        length.
+
+        A split is kept if the segment it bisected is longer than `maximum_segment_length`. Every ancestor of that
+        segment is at least as long, so was also bisected.
+        """
+        return self.split_boundaries[self.parent_length > maximum_segment_length]
+
+    def segment_ids(self, maximum_segment_length:float) -> Union["pd.Series", npt.NDArray[np.int64]]:
+        """
+        Segment ids identical to those of the SHS or MCV function called with `allowed_segment_length_range` of
+        `(minimum_segment_length, maximum_segment_length)`.
+
+        Returns:
+            A series aligned to the index of the original `data`, or an int64 array in the order of the input rows
+            if the hierarchy was built from arrays.
+        """
+        segment_id = restore_order(
+            segment_ids_from_split_boundaries(self.split_boundaries_at(maximum_segment_length)),
+            self._order,
+        )
+        if self._index is None:
+            return segment_id
+        return to_series(segment_id, self._is_complete, self._index)
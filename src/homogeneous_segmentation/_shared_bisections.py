@@ -0,0 +1,99 @@
+"""
+This is a private module containing `SharedBisections`, which remembers the optimal split indices of every segment
+bisected by an engine so that later runs over the same rows can re-use them.
+"""
+from typing import Callable, Literal, Optional
+import numpy as np
+import numpy.typing as npt
+from ._prefix_sums import PrefixSums
+
+
+class SharedBisections:
+    """ Wraps a bisection engine, remembering the optimal split indices of every segment it has bisected.
+
+    A larger minimum allowed segment length only removes candidate split indices from the edges of a segment; it
+    never changes the split statistic of those that remain. If any remembered optimum of a segment is still a
+    candidate then the optimum over the remaining candidates is the same, and the engine does not need to be called.
+    Minimums should therefore be visited in ascending order. When the values of some rows change, the segments
+    containing them must be forgotten with `forget`.
+
+    Instances are called with the same arguments as `batched_optimal_bisections`.
+    """
+
+    def __init__(self, bisect:Callable):
+        self.bisect = bisect
+        # key of the segment each remembered split index belongs to, sorted
+        self._key   = np.array([], dtype=np.int64)
+        self._split = np.array([], dtype=np.int64)
+
+    def forget(self, rows:npt.ArrayLike, n_rows:int):
+        """ Forgets the split indices of every segment which contains any of `rows`, such as rows whose values have
+        changed. `n_rows` is the number of rows the engine was called with. """
+        rows       = np.unique(np.asarray(rows, dtype=np.int64))
+        start, end = np.divmod(self._key, n_rows + 1)
+        overlaps   = np.searchsorted(rows, start, side="left") < np.searchsorted(rows, end, side="left")
+        self._key   = self._key  [~overlaps]
+        self._split = self._split[~overlaps]
+
+    @staticmethod
+    def _is_candidate(prefix_sums:PrefixSums, split, start, end, minimum_segment_length:float) -> npt.NDArray:
+        """ True where `split` is a candidate split index of `[start, end)` in `batched_optimal_bisections`.
+
+        The cumulative lengths are monotonic, so only the rows either side of the split need to be checked.
+        """
+        length_left  = prefix_sums.segment_length(start, split)
+        length_right = prefix_sums.segment_length(np.minimum(split + 1, end - 1), end)
+        return (split > start) & (length_left > minimum_segment_length) & (length_right > minimum_segment_length)
+
+    def __call__(
+            self,
+            prefix_sums            : PrefixSums,
+            starts                 : npt.NDArray[np.int64],
+            ends                   : npt.NDArray[np.int64],
+            minimum_segment_length : float,
+            split_statistic        : Callable[..., npt.NDArray[np.float64]],
+            goal                   : Literal["min", "max"],
+            variable_weights       : Optional[npt.NDArray[np.float64]] = None,
+        ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.bool_]]:
+        starts = np.asarray(starts, dtype=np.int64)
+        ends   = np.asarray(ends  , dtype=np.int64)
+        key    = starts * (prefix_sums.n_rows + 1) + ends
+
+        # every remembered split index of every segment, with the segment it belongs to
+        first          = np.searchsorted(self._key, key, side="left")
+        n_remembered   = np.searchsorted(self._key, key, side="right") - first
+        split_segment  = np.repeat(np.arange(len(starts)), n_remembered)
+        split          = self._split[
+            np.arange(len(split_segment)) - np.repeat(np.cumsum(n_remembered) - n_remembered, n_remembered)
+            + np.repeat(first, n_remembered)
+        ]
+        is_candidate   = self._is_candidate(
+            prefix_sums, split, starts[split_segment], ends[split_segment], minimum_segment_length
+        )
+        is_split       = np.zeros(len(starts), dtype=np.bool_)
+        is_split[split_segment[is_candidate]] = True
+
+        # segments without a remembered optimum that is still a candidate are bisected by the engine
+        k = np.flatnonzero(~is_split)
+        if len(k) == 0:
+            return np.sort(split[is_candidate]), is_split
+        new_split, is_split[k] = self.bisect(
+            prefix_sums            = prefix_sums,
+            starts                 = starts[k],
+            ends                   = ends[k],
+            minimum_segment_length = minimum_segment_length,
+            split_statistic        = split_statistic,
+            goal                   = goal,
+            variable_weights       = variable_weights,
+        )
+
+        # remember the optimums of segments which had none; segments with a NaN optimum are not split, so nothing is
+        # remembered for them
+        new_split_segment = k[np.searchsorted(starts[k], new_split, side="right") - 1]
+        is_new            = n_remembered[new_split_segment] == 0
+        remembered        = np.concatenate([self._key, key[new_split_segment][is_new]])
+        order             = np.argsort(remembered, kind="stable")
+        self._key         = remembered[order]
+        self._split       = np.concatenate([self._split, new_split[is_new]])[order]
+
+        return np.sort(np.concatenate([split[is_candidate], new_split])), is_split
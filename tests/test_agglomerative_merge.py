@@ -0,0 +1,170 @@
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import segment_ids_by_agglomerative_merge, segment_agglomerative_merge_arrays
+from homogeneous_segmentation._agglomerative_merge import agglomerative_merge
+
+
+def _segment_lengths(length, split_boundaries):
+    return np.round(np.add.reduceat(length, split_boundaries[:-1]), 10)
+
+
+@pytest.mark.parametrize("cost", ["variance", "cv"])
+@pytest.mark.parametrize("segment_penalty", [None, 0.001])
+def test_numba_engine_matches_numpy(cost, segment_penalty):
+    pytest.importorskip("numba")
+    rng    = np.random.default_rng(1)
+    n_rows = 3000
+    length = rng.choice([0.01, 0.02], n_rows)
+    values = rng.normal(100, 20, (n_rows, 2))
+    group_boundaries = np.array([0, 1000, 1001, 2500, n_rows])
+    kwargs = dict(
+        values                       = values,
+        length                       = length,
+        allowed_segment_length_range = (0.05, 0.3),
+        cost                         = cost,
+        initial_split_boundaries     = group_boundaries,
+        variable_weights             = [1.0, 3.0],
+        segment_penalty              = segment_penalty,
+    )
+    assert np.array_equal(agglomerative_merge(**kwargs), agglomerative_merge(**kwargs, engine="numba"))
+
+
+@pytest.mark.parametrize("cost", ["variance", "cv"])
+@pytest.mark.parametrize("segment_penalty", [None, 0.001])
+def test_numba_engine_matches_numpy_with_tied_costs(cost, segment_penalty):
+    # rows of equal length and a few repeated levels give many merges whose increase in cost is exactly equal, so the
+    # engines must also break ties in the same order
+    pytest.importorskip("numba")
+    rng    = np.random.default_rng(3)
+    n_rows = 3000
+    length = np.full(n_rows, 0.01)
+    values = np.repeat(rng.choice([50.0, 60.0, 80.0], (n_rows // 10, 2)), 10, axis=0)
+    values[rng.random(n_rows) < 0.05] += 10.0
+    assert not np.isnan(values).any()
+    kwargs = dict(
+        values                       = values,
+        length                       = length,
+        allowed_segment_length_range = (0.05, 0.3),
+        cost                         = cost,
+        initial_split_boundaries     = np.array([0, 700, 701, 1500, 2600, n_rows]),
+        segment_penalty              = segment_penalty,
+    )
+    assert np.array_equal(
+        agglomerative_merge(**kwargs, engine="numpy"),
+        agglomerative_merge(**kwargs, engine="numba"),
+    )
+
+
+def test_python_is_an_alias_of_the_numpy_engine():
+    rng    = np.random.default_rng(4)
+    length = rng.choice([0.01, 0.02], 500)
+    values = rng.normal(100, 20, 500)
+    kwargs = dict(values=values, length=length, allowed_segment_length_range=(0.05, 0.3), cost="variance")
+    assert np.array_equal(agglomerative_merge(**kwargs, engine="python"), agglomerative_merge(**kwargs, engine="numpy"))
+    with pytest.raises(ValueError, match="engine"):
+        agglomerative_merge(**kwargs, engine="cython")
+
+
+@pytest.mark.parametrize("cost", ["variance", "cv"])
+def test_segments_respect_allowed_segment_length_range(cost):
+    rng    = np.random.default_rng(2)
+    n_rows = 2000
+    length = rng.choice([0.01, 0.02, 0.03], n_rows)
+    values = rng.normal(100, 20, (n_rows, 1))
+    group_boundaries = np.array([0, 700, 702, n_rows])
+    split_boundaries = agglomerative_merge(
+        values                       = values,
+        length                       = length,
+        allowed_segment_length_range = (0.05, 0.2),
+        cost                         = cost,
+        initial_split_boundaries     = group_boundaries,
+    )
+    assert np.isin(group_boundaries, split_boundaries).all()
+    segment_length = _segment_lengths(length, split_boundaries)
+    n_segment_rows = np.diff(split_boundaries)
+    is_whole_group = np.isin(split_boundaries[:-1], group_boundaries) & np.isin(split_boundaries[1:], group_boundaries)
+    assert ((segment_length >= 0.05) | is_whole_group).all()
+    # a short segment which fits with neither neighbour is merged with one of them even so
+    assert ((segment_length <= 0.2) | (n_segment_rows == 1)).mean() > 0.99
+    assert (segment_length < 0.2 + 0.05).all()
+    # with no segment penalty, no two neighbouring segments of a group would still fit within the maximum
+    for left in range(len(split_boundaries) - 2):
+        if split_boundaries[left + 1] in group_boundaries:
+            continue
+        assert segment_length[left] + segment_length[left + 1] > 0.2
+
+
+def test_step_is_found():
+    n_rows = 200
+    values = np.where(np.arange(n_rows) < 120, 10.0, 30.0)[:, np.newaxis]
+    split_boundaries = agglomerative_merge(
+        values                       = values,
+        length                       = np.full(n_rows, 0.01),
+        allowed_segment_length_range = (0.1, 2.0),
+        cost                         = "variance",
+        segment_penalty              = 0.01,
+    )
+    assert split_boundaries.tolist() == [0, 120, n_rows]
+
+
+def test_segment_penalty_reduces_the_number_of_segments():
+    data = pd.read_csv("./tests/r_outputs/df2_seg_test_out.csv").drop(columns="seg.id")
+    kwargs = dict(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.050, 2.000),
+    )
+    n_segments = [
+        segment_ids_by_agglomerative_merge(**kwargs, segment_penalty=segment_penalty).nunique()
+        for segment_penalty in [0.0, 0.01, None]
+    ]
+    assert n_segments[0] > n_segments[1] > n_segments[2]
+
+
+def test_groups_unsorted_rows_and_missing_values():
+    rng    = np.random.default_rng(3)
+    n_rows = 400
+    data   = pd.DataFrame({
+        "road"       : np.repeat(["H001", "H002"], n_rows // 2),
+        "slk_from"   : np.tile(np.arange(n_rows // 2) * 0.01, 2),
+        "deflection" : rng.normal(200, 30, n_rows),
+    })
+    data["slk_to"] = data["slk_from"] + 0.01
+    data.loc[data.index[:5], "deflection"] = np.nan
+    shuffled = data.sample(frac=1, random_state=0)
+    kwargs   = dict(
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.03, 0.3),
+        group_by                     = ["road"],
+        cost                         = "cv",
+    )
+    segment_id = segment_ids_by_agglomerative_merge(data=data, **kwargs)
+    pd.testing.assert_series_equal(
+        segment_ids_by_agglomerative_merge(data=shuffled, **kwargs),
+        segment_id[shuffled.index],
+    )
+    assert segment_id.isna().sum() == 5
+    # segments never span two roads
+    assert data.loc[segment_id.notna()].groupby(segment_id)["road"].nunique().eq(1).all()
+
+    complete = data.dropna()
+    assert np.array_equal(
+        segment_agglomerative_merge_arrays(
+            start                        = complete["slk_from"],
+            end                          = complete["slk_to"],
+            values                       = complete["deflection"],
+            allowed_segment_length_range = (0.03, 0.3),
+            group                        = complete["road"],
+            cost                         = "cv",
+        ),
+        segment_id.dropna().to_numpy(),
+    )
+
+
+@pytest.mark.parametrize("kwargs", [dict(cost="median"), dict(engine="cython")])
+def test_invalid_arguments(kwargs):
+    with pytest.raises(ValueError):
+        segment_agglomerative_merge_arrays([0.0, 1.0], [1.0, 2.0], [1.0, 2.0], **kwargs)
@@ -0,0 +1,140 @@
+import asyncio
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import (
+    AsyncSegmenter,
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+)
+from homogeneous_segmentation import _async_segmentation
+
+
+def _roads(n_roads:int) -> list[pd.DataFrame]:
+    rng   = np.random.default_rng(2)
+    roads = []
+    for road in range(n_roads):
+        n_rows = int(rng.integers(20, 300))
+        data   = pd.DataFrame({
+            "road"       : f"H{road:03}",
+            "cwy"        : rng.choice(["L", "R"], n_rows),
+            "slk_from"   : np.arange(n_rows) * 0.01,
+            "slk_to"     : np.arange(1, n_rows + 1) * 0.01,
+            "deflection" : rng.normal(200, 20, n_rows) + np.repeat(rng.normal(0, 40, 3), -(-n_rows // 3))[:n_rows],
+        }, index=np.arange(n_rows) + 1000 * road)
+        data.loc[data.index[5], "deflection"] = np.nan
+        roads.append(data)
+    return roads
+
+
+_kwargs = dict(
+    measure                      = ("slk_from", "slk_to"),
+    variable_column_names        = ["deflection"],
+    allowed_segment_length_range = (0.050, 0.500),
+)
+
+
+@pytest.mark.parametrize("method, segmentation_function", [
+    ("maximize_spatial_heterogeneity"   , segment_ids_to_maximize_spatial_heterogeneity),
+    ("minimize_coefficient_of_variation", segment_ids_to_minimize_coefficient_of_variation),
+])
+@pytest.mark.parametrize("group_by", [None, ["cwy"]])
+def test_coalesced_requests_match_separate_calls(monkeypatch, method, segmentation_function, group_by):
+    batch_sizes = []
+    segment_batch = _async_segmentation._segment_batch
+    def record_batch(requests):
+        batch_sizes.append(len(requests))
+        return segment_batch(requests)
+    monkeypatch.setattr(_async_segmentation, "_segment_batch", record_batch)
+
+    roads = _roads(12)
+    async def segment_all():
+        async with AsyncSegmenter(max_concurrency=2, batch_window=0.05) as segmenter:
+            return await asyncio.gather(*(
+                getattr(segmenter, method)(data=road, group_by=group_by, **_kwargs)
+                for road in roads
+            ))
+    results = asyncio.run(segment_all())
+
+    assert batch_sizes == [12]
+    for road, result in zip(roads, results):
+        pd.testing.assert_series_equal(result, segmentation_function(data=road, group_by=group_by, **_kwargs))
+
+
+def test_batches_are_limited_by_rows_and_parameters(monkeypatch):
+    batch_sizes = []
+    segment_batch = _async_segmentation._segment_batch
+    def record_batch(requests):
+        batch_sizes.append(len(requests))
+        return segment_batch(requests)
+    monkeypatch.setattr(_async_segmentation, "_segment_batch", record_batch)
+
+    roads = _roads(6)
+    async def segment_all():
+        async with AsyncSegmenter(batch_window=0.05, max_batch_rows=1) as segmenter:
+            rows_limited = await asyncio.gather(*(
+                segmenter.maximize_spatial_heterogeneity(data=road, **_kwargs) for road in roads
+            ))
+        async with AsyncSegmenter(batch_window=0.05) as segmenter:
+            mixed = await asyncio.gather(
+                segmenter.maximize_spatial_heterogeneity(data=roads[0], **_kwargs),
+                segmenter.minimize_coefficient_of_variation(data=roads[1], **_kwargs),
+                # without a length range, a request is segmented on its own
+                segmenter.maximize_spatial_heterogeneity(
+                    data                  = roads[2],
+                    measure               = ("slk_from", "slk_to"),
+                    variable_column_names = ["deflection"],
+                ),
+            )
+        return rows_limited, mixed
+    rows_limited, mixed = asyncio.run(segment_all())
+
+    assert batch_sizes == [1] * 9
+    for road, result in zip(roads, rows_limited):
+        pd.testing.assert_series_equal(result, segment_ids_to_maximize_spatial_heterogeneity(data=road, **_kwargs))
+    pd.testing.assert_series_equal(
+        mixed[2],
+        segment_ids_to_maximize_spatial_heterogeneity(
+            data                  = roads[2],
+            measure               = ("slk_from", "slk_to"),
+            variable_column_names = ["deflection"],
+        ),
+    )
+
+
+def test_error_is_raised_only_by_the_request_that_caused_it():
+    roads = _roads(3)
+    async def segment_all():
+        async with AsyncSegmenter(batch_window=0.05) as segmenter:
+            return await asyncio.gather(
+                segmenter.maximize_spatial_heterogeneity(data=roads[0], **_kwargs),
+                segmenter.maximize_spatial_heterogeneity(data=roads[1].drop(columns="deflection"), **_kwargs),
+                segmenter.maximize_spatial_heterogeneity(data=roads[2], **_kwargs),
+                return_exceptions=True,
+            )
+    results = asyncio.run(segment_all())
+    assert isinstance(results[1], KeyError)
+    pd.testing.assert_series_equal(results[0], segment_ids_to_maximize_spatial_heterogeneity(data=roads[0], **_kwargs))
+    pd.testing.assert_series_equal(results[2], segment_ids_to_maximize_spatial_heterogeneity(data=roads[2], **_kwargs))
+
+
+def test_concurrency_is_limited(monkeypatch):
+    in_progress     = 0
+    max_in_progress = 0
+    segment_batch   = _async_segmentation._segment_batch
+    def slow_batch(requests):
+        nonlocal in_progress, max_in_progress
+        in_progress    += 1
+        max_in_progress = max(max_in_progress, in_progress)
+        try:
+            return segment_batch(requests)
+        finally:
+            in_progress -= 1
+    monkeypatch.setattr(_async_segmentation, "_segment_batch", slow_batch)
+
+    roads = _roads(8)
+    async def segment_all():
+        async with AsyncSegmenter(max_concurrency=2, batch_window=0, max_batch_rows=1) as segmenter:
+            await asyncio.gather(*(segmenter.maximize_spatial_heterogeneity(data=road, **_kwargs) for road in roads))
+    asyncio.run(segment_all())
+    assert 1 <= max_in_progress <= 2
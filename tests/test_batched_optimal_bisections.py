@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from homogeneous_segmentation._prefix_sums import PrefixSums
+from homogeneous_segmentation._cumulative_q import cumulative_q
+from homogeneous_segmentation._cumulative_p import cumulative_p
+from homogeneous_segmentation._optimal_bisections import optimal_bisections, batched_optimal_bisections
+
+
+@pytest.mark.parametrize("cumulative_split_statistic, split_statistic, goal", [
+    (cumulative_q, PrefixSums.q_statistic, "max"),
+    (cumulative_p, PrefixSums.p_statistic, "min"),
+])
+def test_batched_optimal_bisections_matches_optimal_bisections(cumulative_split_statistic, split_statistic, goal):
+    rng    = np.random.default_rng(42)
+    values = rng.normal(100, 20, size=(500, 3)) + np.repeat(rng.normal(0, 50, size=(10, 3)), 50, axis=0)
+    length = np.ones(500)
+    boundaries  = np.array([0, 37, 60, 61, 200, 230, 500])
+    starts      = boundaries[:-1]
+    ends        = boundaries[1:]
+
+    split_indices, is_split = batched_optimal_bisections(
+        prefix_sums            = PrefixSums(values, length),
+        starts                 = starts,
+        ends                   = ends,
+        minimum_segment_length = 5,
+        split_statistic        = split_statistic,
+        goal                   = goal,
+    )
+
+    expected_split_indices = []
+    expected_is_split      = []
+    for start, end in zip(starts, ends):
+        if end - start <= 12:
+            # too short to split; optimal_bisections cannot handle this case
+            expected_is_split.append(False)
+            continue
+        segment_split_indices = optimal_bisections(
+            variables                  = values[start:end].transpose(),
+            length                     = length[start:end],
+            minimum_segment_length     = 5,
+            cumulative_split_statistic = cumulative_split_statistic,
+            goal                       = goal,
+        ) + start
+        expected_split_indices.extend(segment_split_indices)
+        expected_is_split.append(len(segment_split_indices) > 0)
+
+    assert split_indices.tolist() == expected_split_indices
+    assert is_split.tolist() == expected_is_split
+    assert split_indices.dtype == np.int64
+
+
+def test_batched_optimal_bisections_no_segments():
+    split_indices, is_split = batched_optimal_bisections(
+        prefix_sums            = PrefixSums(np.ones((10, 1)), np.ones(10)),
+        starts                 = np.array([], dtype=np.int64),
+        ends                   = np.array([], dtype=np.int64),
+        minimum_segment_length = 2,
+        split_statistic        = PrefixSums.q_statistic,
+        goal                   = "max",
+    )
+    assert len(split_indices) == 0
+    assert len(is_split) == 0
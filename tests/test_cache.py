@@ -0,0 +1,106 @@
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+    segment_shs_arrays,
+    SegmentationCache,
+)
+from util.test_datasets import road_network
+
+
+@pytest.mark.parametrize("segmentation_function", [
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+])
+def test_cache_returns_the_same_segment_ids(tmp_path, segmentation_function):
+    data   = road_network(3, 300, shuffle=True)
+    kwargs = dict(
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.05, 0.5),
+        group_by                     = ["road"],
+    )
+    expected = segmentation_function(data, **kwargs)
+    cache    = SegmentationCache(tmp_path)
+    pd.testing.assert_series_equal(segmentation_function(data, **kwargs, cache=cache), expected)
+    assert (cache.hits, cache.misses) == (0, 3)
+    pd.testing.assert_series_equal(segmentation_function(data, **kwargs, cache=cache), expected)
+    assert (cache.hits, cache.misses) == (3, 3)
+
+    # only the road with new data is segmented again
+    changed = data.copy()
+    changed.loc[changed["road"] == "H002", "deflection"] *= np.linspace(0.5, 1.5, 300)
+    pd.testing.assert_series_equal(
+        segmentation_function(changed, **kwargs, cache=cache),
+        segmentation_function(changed, **kwargs),
+    )
+    assert (cache.hits, cache.misses) == (5, 4)
+
+    # the parameters are part of the key
+    segmentation_function(data, **{**kwargs, "allowed_segment_length_range": (0.05, 1.0)}, cache=cache)
+    assert (cache.hits, cache.misses) == (5, 7)
+
+
+@pytest.mark.parametrize("engine", ["numpy", "numba"])
+def test_cold_warm_and_partly_warm_runs_agree(tmp_path, engine):
+    if engine == "numba":
+        pytest.importorskip("numba")
+    data   = road_network(6, None, carriageways=("L", "R"), n_variables=2, seed=5)
+    kwargs = dict(
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection", "roughness"],
+        allowed_segment_length_range = (0.05, 0.5),
+        group_by                     = ["road", "cwy"],
+        engine                       = engine,
+    )
+    expected = segment_ids_to_maximize_spatial_heterogeneity(data, **kwargs)
+    cache    = SegmentationCache(tmp_path)
+
+    # warm the cache with every other road, then segment the whole network from a partly warm cache
+    some_roads = data["road"].isin(data["road"].unique()[::2])
+    segment_ids_to_maximize_spatial_heterogeneity(data[some_roads], **kwargs, cache=cache)
+    partly_warm = segment_ids_to_maximize_spatial_heterogeneity(data, **kwargs, cache=cache)
+    assert cache.hits > 0 and cache.misses > cache.hits
+    warm = segment_ids_to_maximize_spatial_heterogeneity(data, **kwargs, cache=cache)
+    pd.testing.assert_series_equal(partly_warm, expected)
+    pd.testing.assert_series_equal(warm, expected)
+
+
+def test_engine_is_part_of_the_key(tmp_path):
+    pytest.importorskip("numba")
+    start = np.arange(200) * 0.01
+    data  = (start, start + 0.01, np.random.default_rng(2).normal(size=200), (0.05, 0.3))
+    cache = SegmentationCache(tmp_path)
+    segment_shs_arrays(*data, cache=cache, engine="numpy")
+    segment_shs_arrays(*data, cache=cache, engine="numba")
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    rng   = np.random.default_rng(3)
+    start = np.arange(200) * 0.01
+    cache = SegmentationCache(tmp_path)
+    for _ in range(3):
+        segment_shs_arrays(start, start + 0.01, rng.normal(size=200), (0.05, 0.3), cache=cache)
+    entry_bytes = max(path.stat().st_size for path in tmp_path.glob("*.npy"))
+
+    cache = SegmentationCache(tmp_path, max_bytes=2 * entry_bytes)
+    segment_shs_arrays(start, start + 0.01, rng.normal(size=200), (0.05, 0.3), cache=cache)
+    assert len(list(tmp_path.glob("*.npy"))) <= 2
+
+
+def test_cache_evicts_after_a_run_with_only_hits(tmp_path):
+    start  = np.arange(200) * 0.01
+    values = np.random.default_rng(3).normal(size=(200, 3))
+    for variable in range(3):
+        segment_shs_arrays(start, start + 0.01, values[:, variable], (0.05, 0.3), cache=SegmentationCache(tmp_path))
+    entry_bytes = max(path.stat().st_size for path in tmp_path.glob("*.npy"))
+
+    cache = SegmentationCache(tmp_path, max_bytes=entry_bytes)
+    segment_shs_arrays(start, start + 0.01, values[:, 0], (0.05, 0.3), cache=cache)
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert len(list(tmp_path.glob("*.npy"))) == 1
+    segment_shs_arrays(start, start + 0.01, values[:, 0], (0.05, 0.3), cache=cache)
+    assert cache.hits == 2
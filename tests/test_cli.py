@@ -0,0 +1,70 @@
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import segment_mcv_file
+from homogeneous_segmentation._cli import main
+
+
+def _write_network(path):
+    rng    = np.random.default_rng(6)
+    n_rows = 800
+    data   = pd.DataFrame({
+        "road"       : np.repeat([f"H{i:03}" for i in range(8)], n_rows // 8),
+        "slk_from"   : np.tile(np.arange(n_rows // 8) * 0.01, 8),
+        "deflection" : rng.normal(200, 40, n_rows),
+        "roughness"  : rng.normal(3, 0.5, n_rows),
+    })
+    data["slk_to"] = data["slk_from"] + 0.01
+    data.to_csv(path, index=False)
+
+
+@pytest.mark.parametrize("jobs", [[], ["--jobs", "2"], ["--jobs", "2", "--threads"]])
+def test_cli_matches_segment_file(tmp_path, capsys, jobs):
+    _write_network(tmp_path / "network.csv")
+    segment_mcv_file(
+        input_path                   = tmp_path / "network.csv",
+        output_path                  = tmp_path / "expected.csv",
+        segments_path                = tmp_path / "expected_segments.csv",
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection", "roughness"],
+        allowed_segment_length_range = (0.05, 0.3),
+        group_by                     = ["road"],
+        variable_weights             = [2.0, 1.0],
+    )
+    status = main([
+        str(tmp_path / "network.csv"),
+        str(tmp_path / "segmented.csv"),
+        "--measure", "slk_from", "slk_to",
+        "--variables", "deflection", "roughness",
+        "--group-by", "road",
+        "--length-range", "0.05", "0.3",
+        "--method", "mcv",
+        "--weights", "2", "1",
+        "--segments", str(tmp_path / "segments.csv"),
+        "--chunk-size", "300",
+        *jobs,
+    ])
+    assert status == 0
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "segmented.csv"), pd.read_csv(tmp_path / "expected.csv"))
+    pd.testing.assert_frame_equal(
+        pd.read_csv(tmp_path / "segments.csv"),
+        pd.read_csv(tmp_path / "expected_segments.csv"),
+    )
+    output = capsys.readouterr().out
+    assert "800 rows of 8 groups" in output
+    assert "rows/s" in output and "roads/s" in output
+
+
+def test_cli_reports_errors(tmp_path, capsys):
+    _write_network(tmp_path / "network.csv")
+    with pytest.raises(SystemExit) as exit_info:
+        main([
+            str(tmp_path / "network.csv"),
+            str(tmp_path / "segmented.csv"),
+            "--measure", "slk_from", "slk_to",
+            "--variables", "missing_column",
+            "--group-by", "road",
+            "--length-range", "0.05", "0.3",
+        ])
+    assert exit_info.value.code == 1
+    assert "error" in capsys.readouterr().err
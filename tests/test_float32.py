@@ -0,0 +1,111 @@
+import tracemalloc
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+    segment_shs_arrays,
+)
+from homogeneous_segmentation._prefix_sums import PrefixSums
+
+
+@pytest.mark.parametrize("segmentation_function, r_output_path", [
+    (segment_ids_to_maximize_spatial_heterogeneity   , "./tests/r_outputs/df2_seg_test_out.csv"),
+    (segment_ids_to_minimize_coefficient_of_variation, "./tests/r_outputs/df2_mcv_test_out.csv"),
+])
+def test_float32_matches_r_output(segmentation_function, r_output_path):
+    r_output = pd.read_csv(r_output_path)
+    kwargs   = dict(
+        data                         = r_output.drop(columns="seg.id"),
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.050, 0.200),
+    )
+    segment_id = segmentation_function(**kwargs, dtype=np.float32)
+    assert segment_id.tolist() == r_output["seg.id"].tolist()
+    assert segment_id.tolist() == segmentation_function(**kwargs).tolist()
+
+
+def _offset_network(n_groups=4, n_rows_per_group=50_000):
+    rng    = np.random.default_rng(3)
+    n_rows = n_groups * n_rows_per_group
+    values = rng.normal(0, 1, (n_rows, 2)) + np.repeat(rng.uniform(1_000, 5_000, (n_groups, 2)), n_rows_per_group, 0)
+    # a step part way along each group, so that each group has a clear best split
+    values += (np.arange(n_rows) % n_rows_per_group > n_rows_per_group // 3)[:, np.newaxis]
+    length = rng.choice([0.5, 1.0, 2.0], n_rows)
+    return values, length, np.arange(0, n_rows + 1, n_rows_per_group)
+
+
+@pytest.mark.parametrize("statistic, best", [("cumulative_q", np.nanargmax), ("cumulative_p", np.nanargmin)])
+def test_float32_statistics_match_float64_far_from_zero(statistic, best):
+    values, length, group_boundaries = _offset_network()
+    float64 = PrefixSums(values, length)
+    float32 = PrefixSums(values, length, dtype=np.float32, group_boundaries=group_boundaries)
+    assert float32.sum.dtype == np.float32 and float32.sum_of_squares.dtype == np.float32
+    for start, end in zip(group_boundaries[:-1], group_boundaries[1:]):
+        expected = getattr(float64, statistic)(start, end)
+        result   = getattr(float32, statistic)(start, end)
+        np.testing.assert_allclose(result, expected, atol=1e-6)
+        assert (best(result, axis=0) == best(expected, axis=0)).all()
+
+
+def test_float32_update_matches_float64():
+    values, length, group_boundaries = _offset_network(n_groups=3, n_rows_per_group=30_000)
+    prefix_sums = PrefixSums(values, length, dtype=np.float32, group_boundaries=group_boundaries)
+    values[40_000:41_000] += 3
+    prefix_sums.update(40_000, values)
+    expected = PrefixSums(values, length)
+    for start, end in zip(group_boundaries[:-1], group_boundaries[1:]):
+        np.testing.assert_allclose(prefix_sums.cumulative_q(start, end), expected.cumulative_q(start, end), atol=1e-6)
+        np.testing.assert_allclose(prefix_sums.cumulative_p(start, end), expected.cumulative_p(start, end), atol=1e-6)
+
+
+def _peak_memory(function) -> int:
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_float32_memory():
+    values, length, group_boundaries = _offset_network(n_groups=2, n_rows_per_group=50_000)
+    values = np.concatenate([values, values, values[:, :1]], axis=1)
+    float64 = PrefixSums(values, length)
+    float32 = PrefixSums(values, length, dtype=np.float32, group_boundaries=group_boundaries)
+    # only the sums are halved; the counts and lengths are the same
+    assert float32.sum.nbytes == float64.sum.nbytes // 2
+    assert float32.sum_of_squares.nbytes == float64.sum_of_squares.nbytes // 2
+    assert float32.count.nbytes == float64.count.nbytes and float32.length.nbytes == float64.length.nbytes
+
+    # the row indices and lengths used while bisecting are not, so the peak memory of a run falls by less than half
+    start = np.concatenate([[0], np.cumsum(length)[:-1]])
+    group = np.repeat([0, 1], 50_000)
+    peak  = {
+        dtype: _peak_memory(lambda dtype=dtype: segment_shs_arrays(
+            start, start + length, values, (1.0, 20.0), group=group, dtype=dtype,
+        ))
+        for dtype in [np.float64, np.float32]
+    }
+    assert 0.5 < peak[np.float32] / peak[np.float64] < 0.8
+
+
+def test_invalid_dtype():
+    with pytest.raises(ValueError):
+        PrefixSums(np.ones(10), np.ones(10), dtype=np.int64)
+
+
+def test_float32_numba_engine_is_rejected():
+    pytest.importorskip("numba")
+    data = pd.read_csv("./tests/r_outputs/df2_seg_test_out.csv").drop(columns="seg.id")
+    with pytest.raises(ValueError):
+        segment_ids_to_maximize_spatial_heterogeneity(
+            data                         = data,
+            measure                      = ("slk_from", "slk_to"),
+            variable_column_names        = ["deflection"],
+            allowed_segment_length_range = (0.050, 0.200),
+            engine                       = "numba",
+            dtype                        = np.float32,
+        )
@@ -0,0 +1,86 @@
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+    segment_ids_by_optimal_partition,
+    segment_ids_by_cumulative_difference,
+)
+from homogeneous_segmentation._segment_data_frame import extract_arrays
+from util.test_datasets import road_network
+
+
+def _from_pandas(data, library):
+    if library == "pyarrow":
+        return pytest.importorskip("pyarrow").Table.from_pandas(data, preserve_index=False)
+    return pytest.importorskip("polars").from_dict({name: data[name].to_numpy() for name in data.columns})
+
+
+def _to_pandas(result, library):
+    if library == "pyarrow":
+        return pd.Series(result.to_pylist(), dtype="Int64")
+    return pd.Series(result.to_list(), dtype="Int64")
+
+
+@pytest.mark.parametrize("library", ["pyarrow", "polars"])
+@pytest.mark.parametrize("segment_ids", [
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+    segment_ids_by_optimal_partition,
+    segment_ids_by_cumulative_difference,
+])
+def test_same_segment_ids_as_pandas(library, segment_ids):
+    data   = road_network(2, 50, n_missing=2)
+    kwargs = dict(
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.050, 0.200),
+        group_by                     = ["road"],
+        return_segments              = True,
+    )
+    expected_segment_id, expected_segments = segment_ids(data=data, **kwargs)
+    segment_id, segments = segment_ids(data=_from_pandas(data, library), **kwargs)
+
+    assert len(segment_id) == len(data)
+    pd.testing.assert_series_equal(_to_pandas(segment_id, library), expected_segment_id.astype("Int64"))
+    if library == "polars":
+        # polars needs pyarrow for `to_pandas`
+        segments = pd.DataFrame(segments.to_dict(as_series=False))
+    else:
+        segments = segments.to_pandas()
+    pd.testing.assert_frame_equal(segments.set_index("segment_id"), expected_segments, check_dtype=False)
+
+
+@pytest.mark.parametrize("library", ["pyarrow", "polars"])
+def test_columns_are_read_without_copying(library):
+    data  = road_network(2, 50, n_missing=2).dropna()
+    table = _from_pandas(data, library)
+    start, _, values, _, is_complete = extract_arrays(table, ("slk_from", "slk_to"), ["deflection"], ["road"])
+    if library == "pyarrow":
+        buffers = [table.column(name).chunk(0).to_numpy() for name in ["slk_from", "deflection"]]
+    else:
+        buffers = [table.get_column(name).to_numpy() for name in ["slk_from", "deflection"]]
+    assert is_complete.all()
+    assert np.shares_memory(start, buffers[0])
+    assert np.shares_memory(values, buffers[1])
+
+
+def test_multiple_variables_and_chunked_arrow_table():
+    pyarrow = pytest.importorskip("pyarrow")
+    data    = road_network(2, 50, n_missing=2)
+    data["roughness"] = np.linspace(2, 5, len(data))
+    table   = pyarrow.concat_tables([
+        pyarrow.Table.from_pandas(data.iloc[:40], preserve_index=False),
+        pyarrow.Table.from_pandas(data.iloc[40:], preserve_index=False),
+    ])
+    kwargs  = dict(
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection", "roughness"],
+        allowed_segment_length_range = (0.050, 0.200),
+        group_by                     = ["road"],
+    )
+    pd.testing.assert_series_equal(
+        _to_pandas(segment_ids_to_maximize_spatial_heterogeneity(data=table, **kwargs), "pyarrow"),
+        segment_ids_to_maximize_spatial_heterogeneity(data=data, **kwargs).astype("Int64"),
+    )
@@ -0,0 +1,108 @@
+from io import StringIO
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+)
+from util.test_datasets import road_network
+
+road = pd.read_csv(StringIO("""road,slk_from,slk_to,cwy,deflection,dirn
+H001,0.00,0.01,L,179.37,L
+H001,0.01,0.02,L,177.12,L
+H001,0.02,0.03,L,179.06,L
+H001,0.03,0.04,L,212.65,L
+H001,0.04,0.05,L,175.35,L
+H001,0.05,0.06,L,188.66,L
+H001,0.06,0.07,L,188.31,L
+H001,0.07,0.08,L,174.48,L
+H001,0.08,0.09,L,210.28,L
+H001,0.09,0.10,L,260.05,L
+H001,0.10,0.11,L,228.83,L
+H001,0.11,0.12,L,226.33,L
+H001,0.12,0.13,L,245.53,L
+H001,0.13,0.14,L,315.77,L
+H001,0.14,0.15,L,373.86,L
+H001,0.15,0.16,L,333.56,L"""))
+
+network = pd.concat([
+    road,
+    road.assign(cwy="R", deflection=road["deflection"].values[::-1]),
+    road.assign(road="H002", deflection=road["deflection"] * 1.5 + np.arange(16)),
+]).sample(frac=1, random_state=0)
+network.index = network.index * 100 + np.arange(len(network.index))
+
+
+@pytest.mark.parametrize("segmentation_function", [
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+])
+def test_group_by_matches_segmenting_each_group(segmentation_function):
+    result = segmentation_function(
+        data                         = network,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.030, 0.080),
+        group_by                     = ["road", "cwy"],
+    )
+    assert result.index.equals(network.index)
+    assert result.dtype == np.int64
+
+    seen_segment_ids = set()
+    for _, group in network.groupby(["road", "cwy"]):
+        group_result = result.loc[group.index]
+        expected     = segmentation_function(
+            data                         = group.sort_values("slk_from"),
+            measure                      = ("slk_from", "slk_to"),
+            variable_column_names        = ["deflection"],
+            allowed_segment_length_range = (0.030, 0.080),
+        )
+        # segment ids are renumbered, but rows are grouped the same way
+        pd.testing.assert_series_equal(
+            group_result.loc[expected.index] - group_result.min() + 1,
+            expected,
+        )
+        assert seen_segment_ids.isdisjoint(group_result)
+        seen_segment_ids.update(group_result)
+    assert seen_segment_ids == set(range(1, len(seen_segment_ids) + 1))
+
+
+def test_group_by_missing_values_are_not_segmented():
+    data = network.copy()
+    data.loc[data.index[3], "deflection"] = np.nan
+    result = segment_ids_to_maximize_spatial_heterogeneity(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.030, 0.080),
+        group_by                     = ["road", "cwy"],
+    )
+    assert result.index.equals(data.index)
+    assert result.isna().sum() == 1
+    assert np.isnan(result.iloc[3])
+
+
+@pytest.mark.parametrize("segmentation_function", [
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+])
+@pytest.mark.parametrize("engine", ["numpy", "numba"])
+def test_a_road_is_segmented_the_same_alone_and_in_a_network(segmentation_function, engine):
+    if engine == "numba":
+        pytest.importorskip("numba")
+    data = road_network(20, n_rows_per_road=None, seed=1)
+    # the last road is symmetric about its middle, so mirrored split indices tie exactly when it is summed alone, and
+    # any rounding carried over from the roads before it would break the tie
+    last_road = data["road"] == data["road"].iloc[-1]
+    half      = np.round(data.loc[last_road, "deflection"].to_numpy()[: (last_road.sum() + 1) // 2], 1)
+    data.loc[last_road, "deflection"] = np.concatenate([half, half[: last_road.sum() // 2][::-1]])
+    kwargs = dict(
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.050, 0.500),
+        engine                       = engine,
+    )
+    in_network = segmentation_function(data=data, group_by=["road"], **kwargs)[last_road]
+    alone      = segmentation_function(data=data[last_road], **kwargs)
+    pd.testing.assert_series_equal(in_network - in_network.min() + 1, alone)
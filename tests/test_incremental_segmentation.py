@@ -0,0 +1,96 @@
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+    IncrementalSegmentation,
+)
+from homogeneous_segmentation._optimal_bisections import batched_optimal_bisections
+
+
+@pytest.mark.parametrize("segmentation_function, build_segmentation", [
+    (segment_ids_to_maximize_spatial_heterogeneity,    IncrementalSegmentation.maximize_spatial_heterogeneity),
+    (segment_ids_to_minimize_coefficient_of_variation, IncrementalSegmentation.minimize_coefficient_of_variation),
+])
+def test_update_matches_segmenting_again(segmentation_function, build_segmentation):
+    data = pd.read_csv("./tests/r_outputs/df2_seg_test_out.csv").drop(columns="seg.id")
+    kwargs = dict(
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.050, 0.500),
+    )
+    segmentation = build_segmentation(data=data, **kwargs)
+    pd.testing.assert_series_equal(segmentation.segment_ids(), segmentation_function(data=data, **kwargs))
+
+    rng = np.random.default_rng(0)
+    for start in [0, 40, len(data) - 30]:
+        changed = data.iloc[start:start + 30].copy()
+        changed["deflection"] = rng.normal(300, 60, len(changed)).round(2)
+        data.loc[changed.index, "deflection"] = changed["deflection"]
+        pd.testing.assert_series_equal(segmentation.update(changed), segmentation_function(data=data, **kwargs))
+
+
+def test_update_with_groups_unsorted_rows_and_missing_values():
+    rng    = np.random.default_rng(3)
+    n_rows = 400
+    data   = pd.DataFrame({
+        "road"       : np.repeat(["H001", "H002"], n_rows // 2),
+        "slk_from"   : np.tile(np.arange(n_rows // 2) * 0.01, 2),
+        "deflection" : rng.normal(200, 30, n_rows),
+        "roughness"  : rng.normal(3, 0.5, n_rows),
+    }).sample(frac=1, random_state=0)
+    data["slk_to"] = data["slk_from"] + 0.01
+    data.loc[data.index[:5], "deflection"] = np.nan
+    kwargs = dict(
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection", "roughness"],
+        allowed_segment_length_range = (0.03, 0.3),
+        group_by                     = ["road"],
+        variable_weights             = [2.0, 1.0],
+    )
+    segmentation = IncrementalSegmentation.minimize_coefficient_of_variation(data=data, **kwargs)
+
+    changed = data[(data["road"] == "H002") & data["slk_from"].between(0.5, 0.7)].dropna().copy()
+    changed["deflection"] *= 1.5
+    data.loc[changed.index, "deflection"] = changed["deflection"]
+    pd.testing.assert_series_equal(
+        segmentation.update(changed),
+        segment_ids_to_minimize_coefficient_of_variation(data=data, **kwargs),
+    )
+
+    with pytest.raises(ValueError):
+        segmentation.update(data.iloc[:1])
+    with pytest.raises(ValueError):
+        segmentation.update(pd.DataFrame({"deflection": [1.0], "roughness": [1.0]}, index=[n_rows + 1]))
+
+
+def test_update_bisects_only_segments_containing_changed_rows():
+    rng    = np.random.default_rng(1)
+    n_rows = 2000
+    data   = pd.DataFrame({
+        "slk_from"   : np.arange(n_rows) * 0.01,
+        # distinct sections, so that a small change does not move the splits near the root of the tree
+        "deflection" : np.repeat(rng.normal(200, 60, n_rows // 50), 50) + rng.normal(0, 5, n_rows),
+    })
+    data["slk_to"] = data["slk_from"] + 0.01
+
+    n_rows_bisected = []
+    def counting_engine(**kwargs):
+        n_rows_bisected.append(int(np.sum(kwargs["ends"] - kwargs["starts"])))
+        return batched_optimal_bisections(**kwargs)
+
+    segmentation = IncrementalSegmentation.maximize_spatial_heterogeneity(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.05, 0.2),
+        engine                       = counting_engine,
+    )
+    n_rows_bisected_to_build = sum(n_rows_bisected)
+    n_rows_bisected.clear()
+
+    changed = data.iloc[1500:1510].copy()
+    changed["deflection"] += 5
+    segmentation.update(changed)
+    assert 0 < sum(n_rows_bisected) < n_rows_bisected_to_build / 2
@@ -0,0 +1,49 @@
+import subprocess
+import sys
+import pytest
+
+# run in a fresh interpreter, as pytest and the other tests have already imported pandas
+_array_level_script = """
+import sys
+import numpy as np
+import homogeneous_segmentation
+
+assert "pandas" not in sys.modules, "importing homogeneous_segmentation imported pandas"
+
+start  = np.arange(300) * 0.01
+values = np.random.default_rng(0).normal(200, 30, 300)
+group  = np.repeat([0, 1], 150)
+for segment_arrays in [
+    homogeneous_segmentation.segment_shs_arrays,
+    homogeneous_segmentation.segment_mcv_arrays,
+    homogeneous_segmentation.segment_optimal_partition_arrays,
+    homogeneous_segmentation.segment_cda_arrays,
+    homogeneous_segmentation.segment_agglomerative_merge_arrays,
+]:
+    segment_arrays(start, start + 0.01, values, (0.05, 0.3), group=group, return_segments=True)
+
+assert "pandas" not in sys.modules, "an array-level function imported pandas"
+"""
+
+
+def test_array_level_functions_do_not_import_pandas():
+    subprocess.run([sys.executable, "-c", _array_level_script], check=True)
+
+
+def test_polars_input_without_group_by_does_not_import_pandas():
+    pytest.importorskip("polars")
+    script = """
+import sys
+import polars
+import homogeneous_segmentation
+
+data = polars.DataFrame({"slk_from": [0.0, 0.1, 0.2], "slk_to": [0.1, 0.2, 0.3], "deflection": [1.0, None, 2.0]})
+segment_id = homogeneous_segmentation.segment_ids_to_maximize_spatial_heterogeneity(
+    data                  = data,
+    measure               = ("slk_from", "slk_to"),
+    variable_column_names = ["deflection"],
+)
+assert isinstance(segment_id, polars.Series)
+assert "pandas" not in sys.modules, "segmenting a polars DataFrame imported pandas"
+"""
+    subprocess.run([sys.executable, "-c", script], check=True)
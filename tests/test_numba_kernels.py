@@ -0,0 +1,62 @@
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+)
+from homogeneous_segmentation._prefix_sums import PrefixSums
+from homogeneous_segmentation._optimal_bisections import batched_optimal_bisections
+
+
+@pytest.mark.parametrize("split_statistic, goal", [
+    (PrefixSums.q_statistic, "max"),
+    (PrefixSums.p_statistic, "min"),
+])
+@pytest.mark.parametrize("n_variables", [1, 3])
+def test_numba_batched_optimal_bisections_matches_numpy(split_statistic, goal, n_variables):
+    pytest.importorskip("numba")
+    from homogeneous_segmentation._numba_kernels import numba_batched_optimal_bisections
+    rng    = np.random.default_rng(1)
+    values = rng.normal(100, 20, (2000, n_variables)) + np.repeat(rng.normal(0, 50, (20, n_variables)), 100, axis=0)
+    length = rng.choice([0.5, 1.0, 2.0], 2000)
+    boundaries  = np.unique(np.concatenate([[0, 2000], rng.integers(0, 2000, 20)]))
+    prefix_sums = PrefixSums(values, length)
+    expected_split_indices, expected_is_split = batched_optimal_bisections(
+        prefix_sums, boundaries[:-1], boundaries[1:], 20, split_statistic, goal
+    )
+    split_indices, is_split = numba_batched_optimal_bisections(
+        prefix_sums, boundaries[:-1], boundaries[1:], 20, split_statistic, goal
+    )
+    assert split_indices.tolist() == expected_split_indices.tolist()
+    assert is_split.tolist() == expected_is_split.tolist()
+
+
+@pytest.mark.parametrize("segmentation_function", [
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+])
+def test_engine_numba_matches_numpy(segmentation_function):
+    pytest.importorskip("numba")
+    data = pd.read_csv("./tests/r_outputs/df2_seg_test_out.csv").drop(columns="seg.id")
+    kwargs = dict(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.050, 0.200),
+    )
+    pd.testing.assert_series_equal(
+        segmentation_function(**kwargs, engine="numba"),
+        segmentation_function(**kwargs, engine="numpy"),
+    )
+
+
+def test_unknown_engine():
+    data = pd.read_csv("./tests/r_outputs/df2_seg_test_out.csv").drop(columns="seg.id")
+    with pytest.raises(ValueError):
+        segment_ids_to_maximize_spatial_heterogeneity(
+            data                  = data,
+            measure               = ("slk_from", "slk_to"),
+            variable_column_names = ["deflection"],
+            engine                = "fortran",
+        )
@@ -0,0 +1,170 @@
+import itertools
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import segment_ids_by_optimal_partition, segment_optimal_partition_arrays
+from homogeneous_segmentation._prefix_sums import PrefixSums
+from homogeneous_segmentation._optimal_partition import optimal_partition, segment_costs, variable_scale
+from util.test_datasets import road_network
+
+
+def _total_cost(values, length, split_boundaries, cost, segment_penalty):
+    prefix_sums = PrefixSums(values, length)
+    scale       = variable_scale(prefix_sums, 0, len(length), cost, None)
+    return sum(
+        segment_costs(prefix_sums, np.array([start]), end, cost, scale)[0] + segment_penalty
+        for start, end in zip(split_boundaries[:-1], split_boundaries[1:])
+    )
+
+
+def _brute_force_cost(values, length, minimum_segment_length, maximum_segment_length, cost, segment_penalty):
+    n_rows    = len(length)
+    best_cost = np.inf
+    for n_splits in range(n_rows):
+        for splits in itertools.combinations(range(1, n_rows), n_splits):
+            split_boundaries = [0, *splits, n_rows]
+            segment_length   = [
+                round(length[start:end].sum(), 10) for start, end in zip(split_boundaries[:-1], split_boundaries[1:])
+            ]
+            n_segment_rows   = np.diff(split_boundaries)
+            if all(
+                    (this_length >= minimum_segment_length or len(segment_length) == 1)
+                and (this_length <= maximum_segment_length or n == 1)
+                for this_length, n in zip(segment_length, n_segment_rows)
+            ):
+                best_cost = min(best_cost, _total_cost(values, length, split_boundaries, cost, segment_penalty))
+    return best_cost
+
+
+@pytest.mark.parametrize("cost", ["variance", "cv"])
+@pytest.mark.parametrize("segment_penalty", [0.0, 0.05])
+def test_optimal_partition_matches_brute_force(cost, segment_penalty):
+    rng = np.random.default_rng(0)
+    for _ in range(40):
+        n_rows = rng.integers(2, 10)
+        length = rng.choice([0.01, 0.02, 0.03], n_rows)
+        values = rng.normal(10, 3, (n_rows, 2))
+        minimum_segment_length = rng.choice([0.01, 0.03, 0.05])
+        maximum_segment_length = minimum_segment_length + rng.choice([0.02, 0.05, 0.1])
+        expected = _brute_force_cost(
+            values, length, minimum_segment_length, maximum_segment_length, cost, segment_penalty
+        )
+        if not np.isfinite(expected):
+            continue
+        split_boundaries = optimal_partition(
+            values                       = values,
+            length                       = length,
+            allowed_segment_length_range = (minimum_segment_length, maximum_segment_length),
+            cost                         = cost,
+            segment_penalty              = segment_penalty,
+        )
+        assert _total_cost(values, length, split_boundaries, cost, segment_penalty) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("cost", ["variance", "cv"])
+@pytest.mark.parametrize("segment_penalty", [0.001, None])
+def test_numba_engine_matches_numpy(cost, segment_penalty):
+    pytest.importorskip("numba")
+    rng    = np.random.default_rng(1)
+    n_rows = 3000
+    length = rng.choice([0.01, 0.02], n_rows)
+    values = rng.normal(100, 20, (n_rows, 2))
+    group_boundaries = np.array([0, 1000, 1001, 2500, n_rows])
+    kwargs = dict(
+        values                       = values,
+        length                       = length,
+        allowed_segment_length_range = (0.05, 0.3),
+        cost                         = cost,
+        initial_split_boundaries     = group_boundaries,
+        variable_weights             = [1.0, 3.0],
+        segment_penalty              = segment_penalty,
+    )
+    assert np.array_equal(optimal_partition(**kwargs), optimal_partition(**kwargs, engine="numba"))
+
+
+@pytest.mark.parametrize("cost", ["variance", "cv"])
+def test_segments_respect_allowed_segment_length_range(cost):
+    data = pd.read_csv("./tests/r_outputs/df2_seg_test_out.csv").drop(columns="seg.id")
+    data["length"] = data["slk_to"] - data["slk_from"]
+    data["segment_id"] = segment_ids_by_optimal_partition(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.050, 0.200),
+        cost                         = cost,
+    )
+    segment_length = data.groupby("segment_id")["length"].sum().round(10)
+    assert segment_length.between(0.050, 0.200).all()
+    assert (data["segment_id"].diff().dropna() >= 0).all()
+
+
+def test_segment_penalty_reduces_the_number_of_segments():
+    data = pd.read_csv("./tests/r_outputs/df2_seg_test_out.csv").drop(columns="seg.id")
+    kwargs = dict(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.050, 2.000),
+    )
+    n_segments = [
+        segment_ids_by_optimal_partition(**kwargs, segment_penalty=segment_penalty).nunique()
+        for segment_penalty in [0.0, 0.01, 0.1]
+    ]
+    assert n_segments[0] > n_segments[1] > n_segments[2]
+
+
+@pytest.mark.parametrize("cost", ["variance", "cv"])
+def test_default_segment_penalty_finds_the_changes_in_level(cost):
+    data   = road_network(1, 400)
+    values = data[["deflection"]].to_numpy()
+    length = np.full(len(data), 0.01)
+    kwargs = dict(length=length, allowed_segment_length_range=(0.05, 10.0), cost=cost)
+    # the four sections of the road, rather than the dozens of minimum length segments given by no penalty
+    assert np.array_equal(optimal_partition(values, **kwargs), [0, 100, 200, 300, 400])
+    assert len(optimal_partition(values, **kwargs, segment_penalty=0.0)) > 40
+    if cost == "variance":
+        # the default does not depend on the units of the variable
+        assert np.array_equal(optimal_partition(values * 1000.0 - 7.0, **kwargs), [0, 100, 200, 300, 400])
+
+
+def test_groups_unsorted_rows_and_missing_values():
+    rng    = np.random.default_rng(3)
+    n_rows = 400
+    data   = pd.DataFrame({
+        "road"       : np.repeat(["H001", "H002"], n_rows // 2),
+        "slk_from"   : np.tile(np.arange(n_rows // 2) * 0.01, 2),
+        "deflection" : rng.normal(200, 30, n_rows),
+    })
+    data["slk_to"] = data["slk_from"] + 0.01
+    data.loc[data.index[:5], "deflection"] = np.nan
+    shuffled = data.sample(frac=1, random_state=0)
+    kwargs   = dict(
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.03, 0.3),
+        group_by                     = ["road"],
+        cost                         = "cv",
+    )
+    segment_id = segment_ids_by_optimal_partition(data=data, **kwargs)
+    pd.testing.assert_series_equal(segment_ids_by_optimal_partition(data=shuffled, **kwargs), segment_id[shuffled.index])
+    assert segment_id.isna().sum() == 5
+    # segments never span two roads
+    assert data.loc[segment_id.notna()].groupby(segment_id)["road"].nunique().eq(1).all()
+
+    complete = data.dropna()
+    assert np.array_equal(
+        segment_optimal_partition_arrays(
+            start                        = complete["slk_from"],
+            end                          = complete["slk_to"],
+            values                       = complete["deflection"],
+            allowed_segment_length_range = (0.03, 0.3),
+            group                        = complete["road"],
+            cost                         = "cv",
+        ),
+        segment_id.dropna().to_numpy(),
+    )
+
+
+def test_invalid_cost():
+    with pytest.raises(ValueError):
+        segment_optimal_partition_arrays([0.0, 1.0], [1.0, 2.0], [1.0, 2.0], cost="median")
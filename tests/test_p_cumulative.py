@@ -16,3 +16,12 @@ def test_p_cumulative(input, expected):
     
     result = cumulative_p(np.array(input))
     assert np.allclose(result, np.array(expected), equal_nan=True)
+
+
+def test_p_cumulative_of_matrix_matches_each_column():
+    rng    = np.random.default_rng(0)
+    matrix = rng.normal(100, 20, (50, 4))
+    result = cumulative_p(matrix)
+    assert result.shape == (49, 4)
+    for column in range(matrix.shape[1]):
+        assert np.array_equal(result[:, column], cumulative_p(matrix[:, column]), equal_nan=True)
@@ -0,0 +1,156 @@
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+)
+from homogeneous_segmentation import _parallel
+from homogeneous_segmentation._parallel import _balanced_chunks, _group_tasks
+from homogeneous_segmentation._prefix_sums import PrefixSums
+from util.test_datasets import road_network
+
+
+@pytest.mark.parametrize("segmentation_function", [
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+])
+def test_n_jobs_matches_serial(segmentation_function):
+    data = road_network(30, n_rows_per_road=None)
+    kwargs = dict(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.050, 0.500),
+        group_by                     = ["road"],
+    )
+    pd.testing.assert_series_equal(
+        segmentation_function(**kwargs, n_jobs=2),
+        segmentation_function(**kwargs),
+    )
+
+
+def test_executor_matches_serial():
+    data = road_network(10, n_rows_per_road=None)
+    kwargs = dict(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.050, 0.500),
+        group_by                     = ["road"],
+    )
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        parallel_result = segment_ids_to_maximize_spatial_heterogeneity(**kwargs, executor=executor)
+    pd.testing.assert_series_equal(
+        parallel_result,
+        segment_ids_to_maximize_spatial_heterogeneity(**kwargs),
+    )
+
+
+def test_group_tasks_cover_every_group_largest_first():
+    group_boundaries = np.array([0, 3, 5, 100, 102, 104, 106, 300, 301])
+    tasks = _group_tasks(group_boundaries, n_tasks=4)
+    task_n_rows = [task[-1] - task[0] for task in tasks]
+    assert task_n_rows == sorted(task_n_rows, reverse=True)
+    assert sorted(np.unique(np.concatenate(tasks))) == group_boundaries.tolist()
+    assert sum(task_n_rows) == 301
+    # the two large groups are given tasks of their own
+    assert tasks[0].tolist() == [106, 300]
+    assert tasks[1].tolist() == [5, 100]
+
+
+@pytest.mark.parametrize("engine", ["numpy", "numba"])
+@pytest.mark.parametrize("segmentation_function", [
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+])
+def test_threads_match_serial(monkeypatch, segmentation_function, engine):
+    if engine == "numba":
+        pytest.importorskip("numba")
+    # divide even the smallest levels between the threads
+    monkeypatch.setattr(_parallel, "_MIN_ROWS_PER_THREAD", 1)
+    data = road_network(30, n_rows_per_road=None)
+    kwargs = dict(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.050, 0.500),
+        group_by                     = ["road"],
+        engine                       = engine,
+    )
+    expected = segmentation_function(**kwargs)
+    pd.testing.assert_series_equal(segmentation_function(**kwargs, n_jobs=4, backend="threads"), expected)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        pd.testing.assert_series_equal(segmentation_function(**kwargs, executor=executor), expected)
+
+
+def test_threads_split_a_single_group(monkeypatch):
+    monkeypatch.setattr(_parallel, "_MIN_ROWS_PER_THREAD", 1)
+    data = road_network(1, n_rows_per_road=None, seed=4)
+    kwargs = dict(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.020, 0.100),
+    )
+    pd.testing.assert_series_equal(
+        segment_ids_to_maximize_spatial_heterogeneity(**kwargs, n_jobs=4, backend="threads"),
+        segment_ids_to_maximize_spatial_heterogeneity(**kwargs),
+    )
+
+
+def test_numba_kernel_releases_the_gil():
+    # A Python thread that counts while the kernel runs can only make progress if the kernel has released the GIL.
+    # This holds on a single CPU, where the two threads take turns; it does not measure scaling across cores.
+    pytest.importorskip("numba")
+    from homogeneous_segmentation._numba_kernels import numba_batched_optimal_bisections
+    n_rows      = 2_000_000
+    prefix_sums = PrefixSums(np.random.default_rng(0).normal(size=(n_rows, 1)), np.full(n_rows, 0.01))
+    starts      = np.array([0])
+    ends        = np.array([n_rows])
+    numba_batched_optimal_bisections(prefix_sums, starts, ends, 0.05, PrefixSums.q_statistic)  # compile
+
+    stop  = threading.Event()
+    count = [0]
+    def counter():
+        while not stop.is_set():
+            count[0] += 1
+    thread = threading.Thread(target=counter)
+    thread.start()
+    try:
+        count_before, started = count[0], time.perf_counter()
+        time.sleep(0.05)
+        solo_rate = (count[0] - count_before) / (time.perf_counter() - started)
+        count_before, started = count[0], time.perf_counter()
+        numba_batched_optimal_bisections(prefix_sums, starts, ends, 0.05, PrefixSums.q_statistic)
+        kernel_rate = (count[0] - count_before) / (time.perf_counter() - started)
+    finally:
+        stop.set()
+        thread.join()
+    # while holding the GIL the counter would stall for the whole call; releasing it leaves about half the CPU
+    assert kernel_rate > 0.2 * solo_rate
+
+
+def test_balanced_chunks_cover_every_segment_in_order():
+    starts = np.array([0, 10, 12, 100, 101, 150])
+    ends   = np.array([10, 12, 100, 101, 150, 160])
+    chunks = _balanced_chunks(starts, ends, n_chunks=3)
+    assert np.concatenate([starts[chunk] for chunk in chunks]).tolist() == starts.tolist()
+    assert all(chunk.stop > chunk.start for chunk in chunks)
+    assert len(chunks) <= 3
+
+
+def test_invalid_backend():
+    with pytest.raises(ValueError):
+        segment_ids_to_maximize_spatial_heterogeneity(
+            data                         = road_network(2, n_rows_per_road=None),
+            measure                      = ("slk_from", "slk_to"),
+            variable_column_names        = ["deflection"],
+            allowed_segment_length_range = (0.050, 0.500),
+            group_by                     = ["road"],
+            n_jobs                       = 2,
+            backend                      = "fibers",
+        )
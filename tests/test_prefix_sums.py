@@ -0,0 +1,129 @@
+from io import StringIO
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation._prefix_sums import PrefixSums
+from homogeneous_segmentation._cumulative_q import cumulative_q
+from homogeneous_segmentation._cumulative_p import cumulative_p
+from homogeneous_segmentation._optimal_bisections import optimal_bisections, optimal_bisections_of_range
+
+data = pd.read_csv(StringIO("""road,slk_from,slk_to,cwy,deflection,dirn
+H001,0.00,0.01,L,179.37,L
+H001,0.01,0.02,L,177.12,L
+H001,0.02,0.03,L,179.06,L
+H001,0.03,0.04,L,212.65,L
+H001,0.04,0.05,L,175.35,L
+H001,0.05,0.06,L,188.66,L
+H001,0.06,0.07,L,188.31,L
+H001,0.07,0.08,L,174.48,L
+H001,0.08,0.09,L,210.28,L
+H001,0.09,0.10,L,260.05,L
+H001,0.10,0.11,L,228.83,L
+H001,0.11,0.12,L,226.33,L
+H001,0.12,0.13,L,245.53,L
+H001,0.13,0.14,L,315.77,L
+H001,0.14,0.15,L,373.86,L
+H001,0.15,0.16,L,333.56,L"""))
+length = (data["slk_to"] - data["slk_from"]).round(10).values
+values = np.stack([data["deflection"].values, data["deflection"].values[::-1]], axis=1)
+
+
+@pytest.mark.parametrize("start, end", [(0, 16), (0, 9), (3, 12), (9, 16)])
+def test_prefix_sums_cumulative_statistics_match_slices(start, end):
+    prefix_sums = PrefixSums(values, length)
+    q = prefix_sums.cumulative_q(start, end)
+    p = prefix_sums.cumulative_p(start, end)
+    assert q.shape == (end - start - 1, 2)
+    assert p.shape == (end - start - 1, 2)
+    for variable in range(values.shape[1]):
+        assert np.allclose(q[:, variable], cumulative_q(values[start:end, variable]), equal_nan=True)
+        assert np.allclose(p[:, variable], cumulative_p(values[start:end, variable]), equal_nan=True)
+
+
+@pytest.mark.parametrize("start, end", [(0, 16), (0, 9), (2, 16)])
+def test_prefix_sums_segment_length(start, end):
+    prefix_sums = PrefixSums(values, length)
+    assert prefix_sums.segment_length(start, end) == np.round(length[start:end].sum(), 10)
+    left, right = prefix_sums.cumulative_length(start, end)
+    assert np.allclose(left , np.cumsum(length[start:end]))
+    assert np.allclose(right, np.cumsum(length[start:end][::-1])[::-1])
+
+
+@pytest.mark.parametrize("start, end", [(0, 16), (0, 9), (2, 16)])
+@pytest.mark.parametrize("cumulative_split_statistic, split_statistic, goal", [
+    (cumulative_q, PrefixSums.q_statistic, "max"),
+    (cumulative_p, PrefixSums.p_statistic, "min"),
+])
+def test_optimal_bisections_of_range(start, end, cumulative_split_statistic, split_statistic, goal):
+    expected_result = optimal_bisections(
+        variables                  = values[start:end].transpose(),
+        length                     = length[start:end],
+        minimum_segment_length     = 0.030,
+        cumulative_split_statistic = cumulative_split_statistic,
+        goal                       = goal,
+    ) + start
+    actual_result = optimal_bisections_of_range(
+        prefix_sums                = PrefixSums(values, length),
+        start                      = start,
+        end                        = end,
+        minimum_segment_length     = 0.030,
+        split_statistic            = split_statistic,
+        goal                       = goal,
+    )
+    assert np.array_equal(actual_result, expected_result)
+    assert actual_result.dtype == np.int64
+
+
+def test_optimal_bisections_of_range_too_short_to_split():
+    actual_result = optimal_bisections_of_range(
+        prefix_sums                = PrefixSums(values, length),
+        start                      = 0,
+        end                        = 5,
+        minimum_segment_length     = 0.030,
+        split_statistic            = PrefixSums.q_statistic,
+        goal                       = "max",
+    )
+    assert len(actual_result) == 0
+
+
+@pytest.mark.parametrize("first_row", [0, 5, 15])
+def test_prefix_sums_update_matches_new_index(first_row):
+    updated_values = values.copy()
+    updated_values[first_row:first_row + 1] *= 1.5
+    prefix_sums = PrefixSums(values, length)
+    prefix_sums.update(first_row, updated_values)
+    expected = PrefixSums(updated_values, length)
+    assert np.array_equal(prefix_sums.sum, expected.sum)
+    assert np.array_equal(prefix_sums.sum_of_squares, expected.sum_of_squares)
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_prefix_sums_restart_at_each_group(dtype):
+    rng              = np.random.default_rng(0)
+    group_n_rows     = [3, 1, 70_000, 40, 2]
+    group_boundaries = np.concatenate([[0], np.cumsum(group_n_rows)])
+    network_values   = rng.normal(1e6, 20, (group_boundaries[-1], 2))
+    network_length   = rng.uniform(0.005, 0.02, group_boundaries[-1])
+    network = PrefixSums(network_values, network_length, dtype=dtype, group_boundaries=group_boundaries)
+    for start, end in zip(group_boundaries[:-1], group_boundaries[1:]):
+        alone = PrefixSums(network_values[start:end], network_length[start:end], dtype=dtype)
+        assert np.array_equal(network.sum           [start + 1 : end + 1], alone.sum           [1:])
+        assert np.array_equal(network.sum_of_squares[start + 1 : end + 1], alone.sum_of_squares[1:])
+        assert np.array_equal(network.length        [start + 1 : end + 1], alone.length        [1:])
+        assert np.array_equal(
+            network.q_statistic(*network._split_range(start, end)),
+            alone  .q_statistic(*alone  ._split_range(0, end - start)),
+            equal_nan = True,
+        )
+
+
+def test_prefix_sums_update_within_a_group_matches_new_index():
+    group_boundaries = np.array([0, 5, 9, 16])
+    updated_values   = values.copy()
+    updated_values[7:] *= 1.5
+    prefix_sums = PrefixSums(values, length, group_boundaries=group_boundaries)
+    prefix_sums.update(7, updated_values)
+    expected = PrefixSums(updated_values, length, group_boundaries=group_boundaries)
+    assert np.array_equal(prefix_sums.sum, expected.sum)
+    assert np.array_equal(prefix_sums.sum_of_squares, expected.sum_of_squares)
+    assert np.array_equal(prefix_sums.sum[:6], PrefixSums(values, length, group_boundaries=group_boundaries).sum[:6])
@@ -0,0 +1,72 @@
+import tracemalloc
+import pandas as pd
+import numpy as np
+from homogeneous_segmentation import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+    SegmentationProfile,
+)
+from util.test_datasets import road_network
+
+
+def test_profiler_records_every_level_without_changing_the_result():
+    data   = road_network(2, 300)
+    kwargs = dict(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.05, 0.3),
+        group_by                     = ["road"],
+    )
+    recorded = []
+    profiler = SegmentationProfile(on_iteration=recorded.append, trace_memory=True)
+    pd.testing.assert_series_equal(
+        segment_ids_to_maximize_spatial_heterogeneity(**kwargs, profiler=profiler),
+        segment_ids_to_maximize_spatial_heterogeneity(**kwargs),
+    )
+    assert recorded == profiler.iterations
+    assert [iteration.depth for iteration in profiler.iterations] == list(range(profiler.depth))
+    # both roads are bisected at the root of the split tree, and every row is scanned
+    assert profiler.iterations[0].n_bisections   == 2
+    assert profiler.iterations[0].n_rows_scanned == len(data)
+    assert all(iteration.peak_memory_bytes > 0 for iteration in profiler.iterations)
+    assert set(profiler.phase_seconds) == {"extract", "prepare", "bisect", "output"}
+
+
+def test_profiler_with_worker_processes():
+    data   = road_network(2, 300)
+    kwargs = dict(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.05, 0.3),
+        group_by                     = ["road"],
+    )
+    in_process = SegmentationProfile()
+    parallel   = SegmentationProfile()
+    segment_ids_to_minimize_coefficient_of_variation(**kwargs, profiler=in_process)
+    segment_ids_to_minimize_coefficient_of_variation(**kwargs, profiler=parallel, n_jobs=2)
+    assert parallel.n_bisections   == in_process.n_bisections
+    assert parallel.n_rows_scanned == in_process.n_rows_scanned
+
+
+def test_profiler_leaves_the_callers_memory_trace_alone():
+    kwargs = dict(
+        data                         = road_network(2, 300),
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.05, 0.3),
+        group_by                     = ["road"],
+    )
+    tracemalloc.start()
+    try:
+        block = np.ones(2**22)
+        del block
+        profiler = SegmentationProfile(trace_memory=True)
+        segment_ids_to_maximize_spatial_heterogeneity(**kwargs, profiler=profiler)
+        assert tracemalloc.is_tracing()
+        # the caller's peak still includes the block allocated before segmenting
+        assert tracemalloc.get_traced_memory()[1] >= 2**22 * 8
+    finally:
+        tracemalloc.stop()
+    assert all(iteration.peak_memory_bytes > 0 for iteration in profiler.iterations)
@@ -14,3 +14,12 @@ def test_q_cumulative():
     ])
     python_output = cumulative_q(input)
     assert np.allclose(python_output, r_output, atol=1e-8)
+
+
+def test_q_cumulative_of_matrix_matches_each_column():
+    rng    = np.random.default_rng(0)
+    matrix = rng.normal(100, 20, (50, 4))
+    result = cumulative_q(matrix)
+    assert result.shape == (49, 4)
+    for column in range(matrix.shape[1]):
+        assert np.array_equal(result[:, column], cumulative_q(matrix[:, column]), equal_nan=True)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from homogeneous_segmentation._prefix_sums import PrefixSums
+from homogeneous_segmentation._recursive_bisection import recursive_bisection, segment_ids_from_split_boundaries
+
+deflection = np.array([
+    179.37, 177.12, 179.06, 212.65, 175.35, 188.66, 188.31, 174.48,
+    210.28, 260.05, 228.83, 226.33, 245.53, 315.77, 373.86, 333.56,
+])
+length = np.full(16, 0.01)
+
+
+@pytest.mark.parametrize("split_statistic, goal", [
+    (PrefixSums.q_statistic, "max"),
+    (PrefixSums.p_statistic, "min"),
+])
+def test_recursive_bisection_readme_example(split_statistic, goal):
+    split_boundaries = recursive_bisection(
+        values                       = deflection[:, np.newaxis],
+        length                       = length,
+        allowed_segment_length_range = (0.030, 0.080),
+        split_statistic              = split_statistic,
+        goal                         = goal,
+    )
+    assert split_boundaries.tolist() == [0, 4, 9, 16]
+    assert segment_ids_from_split_boundaries(split_boundaries).tolist() == [1]*4 + [2]*5 + [3]*7
+
+
+def test_recursive_bisection_does_not_split_short_data():
+    split_boundaries = recursive_bisection(
+        values                       = deflection[:, np.newaxis],
+        length                       = length,
+        allowed_segment_length_range = (0.030, 0.160),
+        split_statistic              = PrefixSums.q_statistic,
+        goal                         = "max",
+    )
+    assert split_boundaries.tolist() == [0, 16]
+
+
+def test_recursive_bisection_stops_when_segments_cannot_be_split():
+    # a constant variable has no optimal split index, and the segment is left as it is rather than looping forever
+    split_boundaries = recursive_bisection(
+        values                       = np.ones((16, 1)),
+        length                       = length,
+        allowed_segment_length_range = (0.030, 0.080),
+        split_statistic              = PrefixSums.q_statistic,
+        goal                         = "max",
+    )
+    assert split_boundaries.tolist() == [0, 16]
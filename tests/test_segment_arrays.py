@@ -0,0 +1,58 @@
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+    segment_shs_arrays,
+    segment_mcv_arrays,
+)
+
+
+@pytest.mark.parametrize("data_frame_function, array_function", [
+    (segment_ids_to_maximize_spatial_heterogeneity,    segment_shs_arrays),
+    (segment_ids_to_minimize_coefficient_of_variation, segment_mcv_arrays),
+])
+def test_arrays_match_data_frame(data_frame_function, array_function):
+    data = pd.read_csv("./tests/r_outputs/df2_seg_test_out.csv").drop(columns="seg.id")
+    expected = data_frame_function(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.050, 0.200),
+    )
+    segment_id = array_function(
+        start                        = data["slk_from"].to_numpy(),
+        end                          = data["slk_to"].to_numpy(),
+        values                       = data["deflection"].to_numpy(),
+        allowed_segment_length_range = (0.050, 0.200),
+    )
+    assert segment_id.dtype == np.int64
+    assert segment_id.tolist() == expected.tolist()
+
+
+def test_unsorted_input_returns_ids_in_input_order():
+    rng    = np.random.default_rng(0)
+    n_rows = 300
+    group  = np.repeat([3, 1, 2], n_rows // 3)
+    start  = np.tile(np.arange(n_rows // 3) * 0.01, 3)
+    end    = start + 0.01
+    values = rng.normal(100, 20, (n_rows, 2))
+    kwargs = dict(allowed_segment_length_range=(0.05, 0.3))
+    expected = segment_shs_arrays(start, end, values, group=group, **kwargs)
+
+    shuffle    = rng.permutation(n_rows)
+    segment_id = segment_shs_arrays(start[shuffle], end[shuffle], values[shuffle], group=group[shuffle], **kwargs)
+    # the segmentation is the same, and each row keeps its segment id
+    assert segment_id.tolist() == expected[shuffle].tolist()
+
+
+def test_nan_values_raise():
+    values = np.array([1.0, 2.0, np.nan, 4.0])
+    with pytest.raises(ValueError):
+        segment_mcv_arrays(np.arange(4.0), np.arange(1.0, 5.0), values)
+
+
+def test_mismatched_lengths_raise():
+    with pytest.raises(ValueError):
+        segment_shs_arrays(np.arange(4.0), np.arange(1.0, 5.0), np.ones(3))
@@ -0,0 +1,173 @@
+import statistics
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import segment_ids_by_cumulative_difference, segment_cda_arrays
+from homogeneous_segmentation._cumulative_difference import cumulative_difference_approach
+from homogeneous_segmentation._optimal_bisections import batched_optimal_bisections
+from homogeneous_segmentation._prefix_sums import PrefixSums
+
+
+def _sequential_cda(values, length, minimum_segment_length, maximum_segment_length, threshold_constant=1.3):
+    """ A row by row reference implementation for a single group and variable. """
+    cumulative_length = np.concatenate([[0], np.cumsum(length)])
+    segment_length    = lambda start, end: round(cumulative_length[end] - cumulative_length[start], 10)
+    split_boundaries  = {0, len(length)}
+    to_split          = [(0, len(length))]
+    while to_split:
+        start, end = to_split.pop()
+        if end - start < 2:
+            continue
+        total     = segment_length(start, end)
+        mean      = np.sum(values[start:end] * length[start:end]) / np.sum(length[start:end])
+        best_row  = None
+        best      = -1.0
+        z         = 0.0
+        for row in range(start + 1, end):
+            z += (values[row - 1] - mean) * length[row - 1]
+            before = cumulative_length[row] - cumulative_length[start]
+            after  = cumulative_length[end] - cumulative_length[row]
+            # as in SHS and MCV, the rows after the split must be longer than the minimum even without the first
+            after_next = after if row == end - 1 else after - length[row]
+            if round(before, 10) <= minimum_segment_length or round(after_next, 10) <= minimum_segment_length:
+                continue
+            significance = abs(z) / np.sqrt(total / (end - start) * before * after / (before + after))
+            if significance > best:
+                best_row, best = row, significance
+        if best_row is None:
+            continue
+        noise = max(
+            statistics.median(abs(values[row + 1] - values[row]) for row in range(start, end - 1))
+            / (0.6745 * np.sqrt(2.0)),
+            1e-9 * abs(mean),
+        )
+        if best > threshold_constant * np.sqrt(2.0 * np.log(end - start)) * noise or total > maximum_segment_length:
+            split_boundaries.add(best_row)
+            to_split += [(start, best_row), (best_row, end)]
+    return np.array(sorted(split_boundaries))
+
+
+def test_splits_at_the_turning_points_of_a_step():
+    values = np.array([1.0, 1.0, 1.0, 1.0, 5.0, 5.0, 5.0, 5.0, 5.0, 1.0, 1.0, 1.0])
+    length = np.full(len(values), 0.01)
+    assert np.array_equal(
+        cumulative_difference_approach(values, length, (0.01, np.inf)),
+        [0, 4, 9, 12],
+    )
+    # no turning point leaves the minimum length on both sides
+    assert np.array_equal(
+        cumulative_difference_approach(values, length, (0.07, np.inf)),
+        [0, 12],
+    )
+    # a constant segment has no turning point
+    assert np.array_equal(
+        cumulative_difference_approach(np.full(50, 3.3), np.full(50, 0.01), (0.02, np.inf)),
+        [0, 50],
+    )
+
+
+@pytest.mark.parametrize("noise", [10.0, 30.0, 60.0])
+def test_noisy_steps_are_found(noise):
+    # crossings of the mean by noise are not turning points; only the steps between the five levels are
+    rng    = np.random.default_rng(0)
+    values = np.repeat([200.0, 260.0, 220.0, 300.0, 240.0], 400) + rng.normal(0, noise, 2000)
+    start  = np.arange(2000) * 0.01
+    segment_id = segment_cda_arrays(start, start + 0.01, values, (0.1, 5.0))
+    split_boundaries = np.flatnonzero(np.diff(segment_id)) + 1
+    assert len(split_boundaries) == 4
+    assert np.abs(split_boundaries - [400, 800, 1200, 1600]).max() <= (0 if noise == 10.0 else 5)
+
+
+@pytest.mark.parametrize("minimum_segment_length", [0.02, 0.03, 0.035, 0.04])
+def test_minimum_segment_length_allows_the_same_splits_as_bisection(minimum_segment_length):
+    # on a step at each row of ten rows, each method splits at the allowed index nearest the step
+    length = np.full(10, 0.01)
+    cda_splits, bisection_splits = set(), set()
+    for step in range(1, 10):
+        values = np.where(np.arange(10) < step, 1.0, 5.0)
+        cda_splits |= set(cumulative_difference_approach(values, length, (minimum_segment_length, np.inf))[1:-1])
+        split_indices, _ = batched_optimal_bisections(
+            PrefixSums(values, length), np.array([0]), np.array([10]), minimum_segment_length, PrefixSums.q_statistic
+        )
+        bisection_splits |= set(split_indices)
+    assert cda_splits == bisection_splits
+    # rows of exactly the minimum length are not enough on either side
+    assert cda_splits == {0.02: {3, 4, 5, 6}, 0.03: {4, 5}, 0.035: {4, 5}, 0.04: set()}[minimum_segment_length]
+
+
+def test_threshold_constant_trades_segments_against_noise():
+    rng    = np.random.default_rng(4)
+    values = np.repeat([200.0, 215.0, 200.0, 230.0], 250) + rng.normal(0, 20, 1000)
+    length = np.full(1000, 0.01)
+    n_segments = [
+        len(cumulative_difference_approach(values, length, (0.1, np.inf), threshold_constant=threshold_constant)) - 1
+        for threshold_constant in [0.5, 1.3, 3.0]
+    ]
+    assert n_segments[0] > n_segments[1] > n_segments[2]
+    assert np.array_equal(
+        cumulative_difference_approach(values, length, (0.1, np.inf), threshold_constant=0.5),
+        _sequential_cda(values, length, 0.1, np.inf, threshold_constant=0.5),
+    )
+
+
+def test_segments_longer_than_the_maximum_are_split():
+    rng    = np.random.default_rng(1)
+    length = np.full(1000, 0.01)
+    split_boundaries = cumulative_difference_approach(rng.normal(100, 10, 1000), length, (0.5, 2.0))
+    segment_length   = np.round(np.diff(np.concatenate([[0], np.cumsum(length)])[split_boundaries]), 10)
+    assert ((segment_length >= 0.5) & (segment_length <= 2.0)).all()
+
+
+@pytest.mark.parametrize("minimum_segment_length, maximum_segment_length", [
+    (0.00, np.inf),
+    (0.03, np.inf),
+    (0.05, 0.30),
+    (0.10, 0.15),
+])
+def test_matches_sequential_implementation(minimum_segment_length, maximum_segment_length):
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        n_rows = rng.integers(1, 200)
+        length = rng.choice([0.01, 0.02], n_rows)
+        values = np.repeat(rng.normal(100, 30, n_rows), rng.integers(1, 10, n_rows))[:n_rows]
+        values = values + rng.normal(0, 5, n_rows)
+        assert np.array_equal(
+            cumulative_difference_approach(values, length, (minimum_segment_length, maximum_segment_length)),
+            _sequential_cda(values, length, minimum_segment_length, maximum_segment_length),
+        )
+
+
+def test_groups_are_segmented_independently():
+    data = pd.read_csv("./tests/r_outputs/df2_seg_test_out.csv").drop(columns="seg.id")
+    data = pd.concat([data.assign(road="A"), data.assign(road="B", deflection=data["deflection"][::-1].to_numpy())])
+    data = data.reset_index(drop=True).sample(frac=1, random_state=0)
+    data.loc[data.index[:3], "deflection"] = np.nan
+    kwargs = dict(
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.050, 0.300),
+    )
+    segment_id = segment_ids_by_cumulative_difference(data=data, group_by=["road"], **kwargs)
+    assert segment_id.isna().sum() == 3
+    for road in ["A", "B"]:
+        road_data = data[data["road"] == road]
+        pd.testing.assert_series_equal(
+            segment_id[road_data.index].rank(method="dense"),
+            segment_ids_by_cumulative_difference(data=road_data, **kwargs).rank(method="dense"),
+        )
+
+
+def test_multiple_variables_and_weights():
+    rng    = np.random.default_rng(2)
+    n_rows = 300
+    step   = np.arange(n_rows) >= 100
+    values = np.stack([
+        np.where(step, 300.0, 200.0) + rng.normal(0, 5, n_rows),
+        rng.normal(3, 1, n_rows),
+    ], axis=1)
+    start  = np.arange(n_rows) * 0.01
+    # with all of the weight on the first variable, only its step is found
+    segment_id = segment_cda_arrays(start, start + 0.01, values, (0.5, 5.0), variable_weights=[1.0, 0.0])
+    assert np.array_equal(np.flatnonzero(np.diff(segment_id)) + 1, [100])
+    with pytest.raises(ValueError):
+        segment_cda_arrays(start, start + 0.01, values, (0.5, 5.0), variable_weights=[1.0])
@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+from homogeneous_segmentation import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+    segment_shs_file,
+    segment_mcv_file,
+)
+from util.test_datasets import road_network
+
+
+@pytest.mark.parametrize("segment_file, segment_ids", [
+    (segment_shs_file, segment_ids_to_maximize_spatial_heterogeneity),
+    (segment_mcv_file, segment_ids_to_minimize_coefficient_of_variation),
+])
+@pytest.mark.parametrize("chunk_size", [7, 100, 10_000])
+def test_segment_file_matches_data_frame(tmp_path, segment_file, segment_ids, chunk_size):
+    road_network(4, 75, carriageways=["L", "R"], n_missing=2).to_csv(tmp_path / "network.csv", index=False)
+    data   = pd.read_csv(tmp_path / "network.csv")
+    kwargs = dict(
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.05, 0.2),
+        group_by                     = ["road", "cwy"],
+    )
+    n_segments = segment_file(
+        input_path    = tmp_path / "network.csv",
+        output_path   = tmp_path / "segmented.csv",
+        segments_path = tmp_path / "segments.csv",
+        chunk_size    = chunk_size,
+        **kwargs,
+    )
+    segment_id, segments = segment_ids(data=data, **kwargs, return_segments=True)
+
+    result = pd.read_csv(tmp_path / "segmented.csv")
+    pd.testing.assert_frame_equal(result.drop(columns="segment_id"), data)
+    pd.testing.assert_series_equal(result["segment_id"].astype("Int64"), segment_id.astype("Int64"), check_names=False)
+    assert n_segments == len(segments)
+    pd.testing.assert_frame_equal(
+        pd.read_csv(tmp_path / "segments.csv", index_col="segment_id"),
+        segments,
+        check_dtype = False,
+    )
+
+
+def test_segment_file_requires_contiguous_groups(tmp_path):
+    data = road_network(4, 75, carriageways=["L", "R"], n_missing=2)
+    data.sample(frac=1, random_state=0).to_csv(tmp_path / "network.csv", index=False)
+    with pytest.raises(ValueError):
+        segment_shs_file(
+            input_path                   = tmp_path / "network.csv",
+            output_path                  = tmp_path / "segmented.csv",
+            measure                      = ("slk_from", "slk_to"),
+            variable_column_names        = ["deflection"],
+            allowed_segment_length_range = (0.05, 0.2),
+            group_by                     = ["road", "cwy"],
+            chunk_size                   = 50,
+        )
+
+
+def test_segment_parquet_file(tmp_path):
+    pytest.importorskip("pyarrow")
+    data = road_network(4, 75, carriageways=["L", "R"], n_missing=2)
+    data.to_parquet(tmp_path / "network.parquet", index=False)
+    kwargs = dict(
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection"],
+        allowed_segment_length_range = (0.05, 0.2),
+        group_by                     = ["road", "cwy"],
+    )
+    segment_shs_file(
+        input_path    = tmp_path / "network.parquet",
+        output_path   = tmp_path / "segmented.parquet",
+        segments_path = tmp_path / "segments.parquet",
+        chunk_size    = 64,
+        **kwargs,
+    )
+    segment_id, segments = segment_ids_to_maximize_spatial_heterogeneity(data=data, **kwargs, return_segments=True)
+    result = pd.read_parquet(tmp_path / "segmented.parquet")
+    pd.testing.assert_series_equal(result["segment_id"], segment_id.astype("Int64"), check_names=False)
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(tmp_path / "segments.parquet").set_index("segment_id"),
+        segments,
+        check_dtype = False,
+    )
@@ -2,7 +2,6 @@ from io import StringIO
 import pandas as pd
 import numpy as np
 from homogeneous_segmentation import segment_ids_to_minimize_coefficient_of_variation
-from homogeneous_segmentation._seg_shs import cumulative_q
 import pytest
 
 def test_mvc_df1():
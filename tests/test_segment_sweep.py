@@ -0,0 +1,65 @@
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+    segment_shs_sweep,
+    segment_mcv_sweep,
+)
+
+
+@pytest.mark.parametrize("segmentation_function, sweep_function", [
+    (segment_ids_to_maximize_spatial_heterogeneity,    segment_shs_sweep),
+    (segment_ids_to_minimize_coefficient_of_variation, segment_mcv_sweep),
+])
+def test_sweep_matches_direct_segmentation(segmentation_function, sweep_function):
+    data = pd.read_csv("./tests/r_outputs/df2_seg_test_out.csv").drop(columns="seg.id")
+    kwargs = dict(
+        data                  = data,
+        measure               = ("slk_from", "slk_to"),
+        variable_column_names = ["deflection"],
+    )
+    allowed_segment_length_ranges = [
+        (minimum, maximum)
+        for minimum in [0.100, 0.030, 0.050, 0.200]
+        for maximum in [0.200, 0.500, 2.000]
+    ]
+    result = sweep_function(**kwargs, allowed_segment_length_ranges=allowed_segment_length_ranges)
+    assert list(result.columns) == allowed_segment_length_ranges
+    for allowed_segment_length_range in allowed_segment_length_ranges:
+        pd.testing.assert_series_equal(
+            result[allowed_segment_length_range],
+            segmentation_function(**kwargs, allowed_segment_length_range=allowed_segment_length_range),
+            check_names = False,
+        )
+
+
+def test_sweep_with_groups_and_missing_values():
+    rng    = np.random.default_rng(5)
+    n_rows = 600
+    data   = pd.DataFrame({
+        "road"       : np.repeat(["H001", "H002", "H003"], n_rows // 3),
+        "slk_from"   : np.tile(np.arange(n_rows // 3) * 0.01, 3),
+        "deflection" : rng.normal(200, 30, n_rows),
+        "roughness"  : rng.normal(3, 0.5, n_rows),
+    }).sample(frac=1, random_state=0)
+    data["slk_to"] = data["slk_from"] + 0.01
+    data.loc[data.index[:5], "deflection"] = np.nan
+    kwargs = dict(
+        data                  = data,
+        measure               = ("slk_from", "slk_to"),
+        variable_column_names = ["deflection", "roughness"],
+        group_by              = ["road"],
+    )
+    allowed_segment_length_ranges = [(0.02, 0.1), (0.05, 0.1), (0.05, 0.3), (0.08, 0.2)]
+    result = segment_mcv_sweep(**kwargs, allowed_segment_length_ranges=allowed_segment_length_ranges)
+    for allowed_segment_length_range in allowed_segment_length_ranges:
+        pd.testing.assert_series_equal(
+            result[allowed_segment_length_range],
+            segment_ids_to_minimize_coefficient_of_variation(
+                **kwargs,
+                allowed_segment_length_range = allowed_segment_length_range,
+            ),
+            check_names = False,
+        )
@@ -0,0 +1,93 @@
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+    segment_ids_by_optimal_partition,
+    segment_ids_by_cumulative_difference,
+    segment_shs_arrays,
+)
+from homogeneous_segmentation._segment_table import segment_table
+from util.test_datasets import road_network
+
+
+@pytest.mark.parametrize("segment_ids", [
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+    segment_ids_by_optimal_partition,
+    segment_ids_by_cumulative_difference,
+])
+def test_segment_table_matches_groupby(segment_ids):
+    data   = road_network(3, 100, n_variables=2, n_missing=2, shuffle=True)
+    kwargs = dict(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        variable_column_names        = ["deflection", "roughness"],
+        allowed_segment_length_range = (0.05, 0.3),
+        group_by                     = ["road"],
+    )
+    segment_id, segments = segment_ids(**kwargs, return_segments=True, cv_threshold=0.2)
+    pd.testing.assert_series_equal(segment_id, segment_ids(**kwargs))
+
+    complete = data.assign(length=data["slk_to"] - data["slk_from"]).loc[segment_id.notna()]
+    grouped  = complete.groupby(segment_id[segment_id.notna()].astype("int64"))
+    assert segments.index.name == "segment_id"
+    assert np.array_equal(segments.index, grouped.size().index)
+    assert np.array_equal(segments["road"], grouped["road"].first())
+    assert np.allclose(segments["slk_from"], grouped["slk_from"].min())
+    assert np.allclose(segments["slk_to"], grouped["slk_to"].max())
+    assert np.allclose(segments["length"], grouped["length"].sum())
+    assert np.array_equal(segments["n_rows"], grouped.size())
+    for column_name in ["deflection", "roughness"]:
+        mean = grouped[column_name].mean()
+        std  = grouped[column_name].std()
+        assert np.allclose(segments[f"{column_name}_mean"], mean)
+        assert np.allclose(segments[f"{column_name}_std"], std, equal_nan=True)
+        assert np.allclose(segments[f"{column_name}_cv"], std / mean.abs(), equal_nan=True)
+    assert np.array_equal(
+        segments["fails_cv_threshold"],
+        ((segments["deflection_cv"] > 0.2) | (segments["roughness_cv"] > 0.2)).to_numpy(),
+    )
+
+
+def test_coefficient_of_variation_uses_the_absolute_mean():
+    start  = np.arange(9) * 0.01
+    values = np.array([-3.0, -2.0, -4.0, -1.0, 1.0, -1.0, 1.0, 5.0, 5.0])
+    segments = segment_table(
+        start            = start,
+        end              = start + 0.01,
+        values           = values[:, np.newaxis],
+        length           = np.full(9, 0.01),
+        split_boundaries = np.array([0, 3, 7, 9]),
+        order            = None,
+        cv_threshold     = 0.25,
+    )
+    coefficient_of_variation = segments["coefficient_of_variation"][:, 0]
+    # negative mean
+    assert coefficient_of_variation[0] == pytest.approx(1.0 / 3.0)
+    # zero mean; the rows vary, so the segment cannot pass any threshold
+    assert coefficient_of_variation[1] == np.inf
+    # no variation
+    assert coefficient_of_variation[2] == 0.0
+    assert np.array_equal(segments["fails_cv_threshold"], [True, True, False])
+
+
+def test_segment_table_arrays():
+    data = pd.read_csv("./tests/r_outputs/df2_seg_test_out.csv").drop(columns="seg.id")
+    segment_id, segments = segment_shs_arrays(
+        start                        = data["slk_from"],
+        end                          = data["slk_to"],
+        values                       = data["deflection"],
+        allowed_segment_length_range = (0.050, 0.200),
+        return_segments              = True,
+    )
+    n_segments = segment_id.max()
+    assert np.array_equal(segments["segment_id"], np.arange(1, n_segments + 1))
+    assert segments["n_rows"].sum() == len(data)
+    assert segments["mean"].shape == (n_segments, 1)
+    assert np.array_equal(segment_id[segments["first_row"]], segments["segment_id"])
+    assert np.array_equal(
+        segments["fails_cv_threshold"],
+        segments["coefficient_of_variation"][:, 0] > 0.25,
+    )
@@ -0,0 +1,54 @@
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+    SegmentationHierarchy,
+)
+
+
+@pytest.mark.parametrize("segmentation_function, build_hierarchy", [
+    (segment_ids_to_maximize_spatial_heterogeneity,    SegmentationHierarchy.maximize_spatial_heterogeneity),
+    (segment_ids_to_minimize_coefficient_of_variation, SegmentationHierarchy.minimize_coefficient_of_variation),
+])
+def test_hierarchy_cut_matches_direct_segmentation(segmentation_function, build_hierarchy):
+    data = pd.read_csv("./tests/r_outputs/df2_seg_test_out.csv").drop(columns="seg.id")
+    kwargs = dict(
+        data                  = data,
+        measure               = ("slk_from", "slk_to"),
+        variable_column_names = ["deflection"],
+    )
+    hierarchy = build_hierarchy(**kwargs, minimum_segment_length=0.050)
+    for maximum_segment_length in [0.100, 0.200, 0.500, 1.000, 2.000, 100.0]:
+        pd.testing.assert_series_equal(
+            hierarchy.segment_ids(maximum_segment_length),
+            segmentation_function(**kwargs, allowed_segment_length_range=(0.050, maximum_segment_length)),
+        )
+
+
+def test_hierarchy_with_groups_and_missing_values():
+    rng    = np.random.default_rng(3)
+    n_rows = 400
+    data   = pd.DataFrame({
+        "road"       : np.repeat(["H001", "H002"], n_rows // 2),
+        "slk_from"   : np.tile(np.arange(n_rows // 2) * 0.01, 2),
+        "deflection" : rng.normal(200, 30, n_rows),
+    }).sample(frac=1, random_state=0)
+    data["slk_to"] = data["slk_from"] + 0.01
+    data.loc[data.index[:5], "deflection"] = np.nan
+    kwargs = dict(
+        data                  = data,
+        measure               = ("slk_from", "slk_to"),
+        variable_column_names = ["deflection"],
+        group_by              = ["road"],
+    )
+    hierarchy = SegmentationHierarchy.minimize_coefficient_of_variation(**kwargs, minimum_segment_length=0.03)
+    for maximum_segment_length in [0.1, 0.3, 1.0]:
+        pd.testing.assert_series_equal(
+            hierarchy.segment_ids(maximum_segment_length),
+            segment_ids_to_minimize_coefficient_of_variation(
+                **kwargs,
+                allowed_segment_length_range = (0.03, maximum_segment_length),
+            ),
+        )
@@ -0,0 +1,62 @@
+import pandas as pd
+import numpy as np
+import pytest
+from homogeneous_segmentation import (
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+)
+from homogeneous_segmentation._optimal_bisections import optimal_bisections
+from homogeneous_segmentation._cumulative_q import cumulative_q
+
+rng  = np.random.default_rng(7)
+data = pd.DataFrame({
+    "slk_from"   : np.arange(500) * 0.01,
+    "deflection" : rng.normal(200, 30, 500) + np.repeat(rng.normal(0, 60, 10), 50),
+    "roughness"  : rng.normal(3, 0.4, 500) + np.repeat(rng.normal(0, 1, 25), 20),
+})
+data["slk_to"] = data["slk_from"] + 0.01
+
+
+@pytest.mark.parametrize("segmentation_function", [
+    segment_ids_to_maximize_spatial_heterogeneity,
+    segment_ids_to_minimize_coefficient_of_variation,
+])
+@pytest.mark.parametrize("engine", ["numpy", "numba"])
+def test_zero_weight_ignores_a_variable(segmentation_function, engine):
+    if engine == "numba":
+        pytest.importorskip("numba")
+    kwargs = dict(
+        data                         = data,
+        measure                      = ("slk_from", "slk_to"),
+        allowed_segment_length_range = (0.05, 0.5),
+        engine                       = engine,
+    )
+    pd.testing.assert_series_equal(
+        segmentation_function(**kwargs, variable_column_names=["deflection", "roughness"], variable_weights=[1, 0]),
+        segmentation_function(**kwargs, variable_column_names=["deflection"]),
+    )
+    pd.testing.assert_series_equal(
+        segmentation_function(**kwargs, variable_column_names=["deflection", "roughness"], variable_weights=[0, 3]),
+        segmentation_function(**kwargs, variable_column_names=["roughness"]),
+    )
+
+
+def test_equal_weights_match_unweighted_optimal_bisections():
+    variables = [data["deflection"].to_numpy(), data["roughness"].to_numpy()]
+    length    = (data["slk_to"] - data["slk_from"]).to_numpy()
+    kwargs    = dict(length=length, minimum_segment_length=0.05, cumulative_split_statistic=cumulative_q, goal="max")
+    assert (
+        optimal_bisections(variables, **kwargs).tolist()
+        == optimal_bisections(variables, **kwargs, variable_weights=[2.0, 2.0]).tolist()
+        == optimal_bisections(np.stack(variables), **kwargs).tolist()
+    )
+
+
+def test_invalid_weights():
+    with pytest.raises(ValueError):
+        segment_ids_to_maximize_spatial_heterogeneity(
+            data                  = data,
+            measure               = ("slk_from", "slk_to"),
+            variable_column_names = ["deflection", "roughness"],
+            variable_weights      = [1.0],
+        )
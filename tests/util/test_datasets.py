@@ -1,2 +1,43 @@
+from typing import Optional, Sequence
 import pandas as pd
+import numpy as np
 
+
+def road_network(
+        n_roads         : int                     = 3,
+        n_rows_per_road : Optional[int]           = 200,
+        carriageways    : Optional[Sequence[str]] = None,
+        n_variables     : int                     = 1,
+        n_missing       : int                     = 0,
+        shuffle         : bool                    = False,
+        seed            : int                     = 0,
+    ) -> pd.DataFrame:
+    """
+    A synthetic network of roads for the tests, sorted by road, carriageway and `slk_from` unless `shuffle` is set.
+
+    Each road (and carriageway) is 10 metre rows of a `deflection` made of four sections at different levels plus
+    noise, and of a `roughness` if `n_variables` is 2. `n_rows_per_road=None` gives each road a random number of rows
+    between 5 and 400. `n_missing` random rows have a missing `deflection`.
+    """
+    rng   = np.random.default_rng(seed)
+    roads = []
+    for road in range(n_roads):
+        for cwy in carriageways or [None]:
+            n_rows = int(rng.integers(5, 400)) if n_rows_per_road is None else n_rows_per_road
+            road_data = {"road": f"H{road + 1:03}"}
+            if cwy is not None:
+                road_data["cwy"] = cwy
+            road_data["slk_from"  ] = np.arange(n_rows) * 0.01
+            road_data["slk_to"    ] = np.arange(1, n_rows + 1) * 0.01
+            road_data["deflection"] = (
+                rng.normal(200, 20, n_rows) + np.repeat(rng.normal(0, 40, 4), -(-n_rows // 4))[:n_rows]
+            )
+            if n_variables > 1:
+                road_data["roughness"] = rng.normal(3, 0.5, n_rows)
+            roads.append(pd.DataFrame(road_data))
+    data = pd.concat(roads, ignore_index=True)
+    if n_missing:
+        data.loc[rng.choice(len(data), n_missing, replace=False), "deflection"] = np.nan
+    if shuffle:
+        data = data.sample(frac=1, random_state=seed)
+    return data